@@ -0,0 +1,102 @@
+"""add progress tracking
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 03:15:25.847938
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('user_progress',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('actions_completed', sa.Integer(), nullable=False),
+    sa.Column('minutes_worked', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'date', name='uq_user_progress_user_id_date')
+    )
+
+    # Adding a column doesn't create its enum type on PostgreSQL
+    action_status = sa.Enum('pending', 'in_progress', 'completed', name='actionstatus')
+    action_status.create(op.get_bind(), checkfirst=True)
+    with op.batch_alter_table('actions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('status', action_status, nullable=False, server_default='pending'))
+        batch_op.add_column(sa.Column('completed_at', sa.DateTime(), nullable=True))
+
+    with op.batch_alter_table('goals', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('subgoal_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('action_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('completed_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('last_activity_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('current_streak', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('longest_streak', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('last_active_date', sa.Date(), nullable=True))
+
+    with op.batch_alter_table('subgoals', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('action_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('completed_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('last_activity_at', sa.DateTime(), nullable=True))
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('current_streak', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('longest_streak', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('last_active_date', sa.Date(), nullable=True))
+
+    # Existing goals have no completed actions yet; only the sizes need filling in
+    op.execute(
+        "UPDATE subgoals SET action_count = "
+        "(SELECT count(*) FROM actions WHERE actions.subgoal_id = subgoals.id)"
+    )
+    op.execute(
+        "UPDATE goals SET "
+        "subgoal_count = (SELECT count(*) FROM subgoals WHERE subgoals.goal_id = goals.id), "
+        "action_count = (SELECT coalesce(sum(action_count), 0) FROM subgoals WHERE subgoals.goal_id = goals.id)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('last_active_date')
+        batch_op.drop_column('longest_streak')
+        batch_op.drop_column('current_streak')
+
+    with op.batch_alter_table('subgoals', schema=None) as batch_op:
+        batch_op.drop_column('last_activity_at')
+        batch_op.drop_column('completed_count')
+        batch_op.drop_column('action_count')
+
+    with op.batch_alter_table('goals', schema=None) as batch_op:
+        batch_op.drop_column('last_active_date')
+        batch_op.drop_column('longest_streak')
+        batch_op.drop_column('current_streak')
+        batch_op.drop_column('last_activity_at')
+        batch_op.drop_column('completed_count')
+        batch_op.drop_column('action_count')
+        batch_op.drop_column('subgoal_count')
+
+    with op.batch_alter_table('actions', schema=None) as batch_op:
+        batch_op.drop_column('completed_at')
+        batch_op.drop_column('status')
+
+    op.drop_table('user_progress')
+
+    # PostgreSQL keeps enum types after their columns are dropped
+    sa.Enum(name='actionstatus').drop(op.get_bind(), checkfirst=True)
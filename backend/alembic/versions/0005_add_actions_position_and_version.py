@@ -0,0 +1,39 @@
+"""add actions position and version
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 03:17:28.767767
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('actions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('position', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+    # Keep the existing order (by id) within each subgoal
+    op.execute(
+        "UPDATE actions SET position = "
+        "(SELECT count(*) FROM actions AS earlier "
+        "WHERE earlier.subgoal_id = actions.subgoal_id AND earlier.id < actions.id)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('actions', schema=None) as batch_op:
+        batch_op.drop_column('version')
+        batch_op.drop_column('position')
@@ -0,0 +1,106 @@
+"""add search entries
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 03:20:22.727087
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('search_entries',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('goal_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.Enum('goal', 'subgoal', 'action', name='searchkind'), nullable=False),
+    sa.Column('ref_id', sa.Integer(), nullable=False),
+    sa.Column('content', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['goal_id'], ['goals.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('kind', 'ref_id', name='uq_search_entries_kind_ref_id')
+    )
+    with op.batch_alter_table('search_entries', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_search_entries_goal_id'), ['goal_id'], unique=False)
+        batch_op.create_index('ix_search_entries_user_id', ['user_id'], unique=False)
+
+    # The full-text index itself is dialect specific
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(
+            "ALTER TABLE search_entries ADD COLUMN tsv tsvector "
+            "GENERATED ALWAYS AS (to_tsvector('english', content)) STORED"
+        )
+        op.execute("CREATE INDEX ix_search_entries_tsv ON search_entries USING gin (tsv)")
+        op.execute("CREATE INDEX ix_search_entries_content_trgm ON search_entries USING gin (content gin_trgm_ops)")
+    elif dialect == "sqlite":
+        op.execute(
+            "CREATE VIRTUAL TABLE search_entries_fts USING fts5("
+            "content, content='search_entries', content_rowid='id', tokenize='porter unicode61')"
+        )
+        op.execute(
+            "CREATE TRIGGER search_entries_ai AFTER INSERT ON search_entries BEGIN "
+            "INSERT INTO search_entries_fts(rowid, content) VALUES (new.id, new.content); END"
+        )
+        op.execute(
+            "CREATE TRIGGER search_entries_ad AFTER DELETE ON search_entries BEGIN "
+            "INSERT INTO search_entries_fts(search_entries_fts, rowid, content) "
+            "VALUES ('delete', old.id, old.content); END"
+        )
+        op.execute(
+            "CREATE TRIGGER search_entries_au AFTER UPDATE ON search_entries BEGIN "
+            "INSERT INTO search_entries_fts(search_entries_fts, rowid, content) "
+            "VALUES ('delete', old.id, old.content); "
+            "INSERT INTO search_entries_fts(rowid, content) VALUES (new.id, new.content); END"
+        )
+
+    # Index the existing goals, subgoals and actions (the triggers fill the FTS table)
+    op.execute(
+        "INSERT INTO search_entries (user_id, goal_id, kind, ref_id, content) "
+        "SELECT user_id, id, 'goal', id, "
+        "CASE WHEN description IS NULL OR description = title THEN title ELSE title || ' ' || description END "
+        "FROM goals"
+    )
+    op.execute(
+        "INSERT INTO search_entries (user_id, goal_id, kind, ref_id, content) "
+        "SELECT goals.user_id, goals.id, 'subgoal', subgoals.id, "
+        "CASE WHEN subgoals.description IS NULL OR subgoals.description = subgoals.title THEN subgoals.title "
+        "ELSE subgoals.title || ' ' || subgoals.description END "
+        "FROM subgoals JOIN goals ON goals.id = subgoals.goal_id"
+    )
+    op.execute(
+        "INSERT INTO search_entries (user_id, goal_id, kind, ref_id, content) "
+        "SELECT goals.user_id, goals.id, 'action', actions.id, actions.description "
+        "FROM actions JOIN subgoals ON subgoals.id = actions.subgoal_id "
+        "JOIN goals ON goals.id = subgoals.goal_id "
+        "WHERE actions.description IS NOT NULL"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        # Dropping search_entries takes its triggers with it, not the FTS table
+        op.execute("DROP TABLE IF EXISTS search_entries_fts")
+    with op.batch_alter_table('search_entries', schema=None) as batch_op:
+        batch_op.drop_index('ix_search_entries_user_id')
+        batch_op.drop_index(batch_op.f('ix_search_entries_goal_id'))
+
+    op.drop_table('search_entries')
+
+    # PostgreSQL keeps enum types after their tables are dropped
+    sa.Enum(name='searchkind').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,111 @@
+"""cascade goal deletes and add archive tables
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 03:24:47.495309
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The foreign keys were created unnamed; this matches PostgreSQL's default
+# names and lets SQLite's batch mode find the reflected ones
+FK_NAMING = {"fk": "%(table_name)s_%(column_0_name)s_fkey"}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The archive tables reuse the live tables' enum types, which already exist
+    op.create_table('archived_actions',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('subgoal_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('description', sa.String(), autoincrement=False, nullable=True),
+    sa.Column('estimated_minutes', sa.Integer(), autoincrement=False, nullable=True),
+    sa.Column('status', postgresql.ENUM('pending', 'in_progress', 'completed', name='actionstatus', create_type=False), autoincrement=False, nullable=False),
+    sa.Column('completed_at', sa.DateTime(), autoincrement=False, nullable=True),
+    sa.Column('position', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('version', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('archived_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('archived_actions', schema=None) as batch_op:
+        batch_op.create_index('ix_archived_actions_subgoal_id', ['subgoal_id'], unique=False)
+
+    op.create_table('archived_goals',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('title', sa.String(), autoincrement=False, nullable=False),
+    sa.Column('description', sa.String(), autoincrement=False, nullable=True),
+    sa.Column('created_at', sa.DateTime(), autoincrement=False, nullable=False),
+    sa.Column('updated_at', sa.DateTime(), autoincrement=False, nullable=False),
+    sa.Column('status', postgresql.ENUM('active', 'completed', name='goalstatus', create_type=False), autoincrement=False, nullable=False),
+    sa.Column('subgoal_count', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('action_count', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('completed_count', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('last_activity_at', sa.DateTime(), autoincrement=False, nullable=True),
+    sa.Column('current_streak', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('longest_streak', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('last_active_date', sa.Date(), autoincrement=False, nullable=True),
+    sa.Column('archived_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('archived_goals', schema=None) as batch_op:
+        batch_op.create_index('ix_archived_goals_user_id', ['user_id'], unique=False)
+
+    op.create_table('archived_subgoals',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('goal_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('title', sa.String(), autoincrement=False, nullable=False),
+    sa.Column('description', sa.String(), autoincrement=False, nullable=True),
+    sa.Column('category', postgresql.ENUM('skill', 'mental', 'communication', name='subgoalcategory', create_type=False), autoincrement=False, nullable=False),
+    sa.Column('action_count', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('completed_count', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('last_activity_at', sa.DateTime(), autoincrement=False, nullable=True),
+    sa.Column('archived_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('archived_subgoals', schema=None) as batch_op:
+        batch_op.create_index('ix_archived_subgoals_goal_id', ['goal_id'], unique=False)
+
+    with op.batch_alter_table('actions', schema=None, naming_convention=FK_NAMING) as batch_op:
+        batch_op.drop_constraint('actions_subgoal_id_fkey', type_='foreignkey')
+        batch_op.create_foreign_key('actions_subgoal_id_fkey', 'subgoals', ['subgoal_id'], ['id'], ondelete='CASCADE')
+
+    with op.batch_alter_table('subgoals', schema=None, naming_convention=FK_NAMING) as batch_op:
+        batch_op.drop_constraint('subgoals_goal_id_fkey', type_='foreignkey')
+        batch_op.create_foreign_key('subgoals_goal_id_fkey', 'goals', ['goal_id'], ['id'], ondelete='CASCADE')
+
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('subgoals', schema=None, naming_convention=FK_NAMING) as batch_op:
+        batch_op.drop_constraint('subgoals_goal_id_fkey', type_='foreignkey')
+        batch_op.create_foreign_key('subgoals_goal_id_fkey', 'goals', ['goal_id'], ['id'])
+
+    with op.batch_alter_table('actions', schema=None, naming_convention=FK_NAMING) as batch_op:
+        batch_op.drop_constraint('actions_subgoal_id_fkey', type_='foreignkey')
+        batch_op.create_foreign_key('actions_subgoal_id_fkey', 'subgoals', ['subgoal_id'], ['id'])
+
+    with op.batch_alter_table('archived_subgoals', schema=None) as batch_op:
+        batch_op.drop_index('ix_archived_subgoals_goal_id')
+
+    op.drop_table('archived_subgoals')
+    with op.batch_alter_table('archived_goals', schema=None) as batch_op:
+        batch_op.drop_index('ix_archived_goals_user_id')
+
+    op.drop_table('archived_goals')
+    with op.batch_alter_table('archived_actions', schema=None) as batch_op:
+        batch_op.drop_index('ix_archived_actions_subgoal_id')
+
+    op.drop_table('archived_actions')
@@ -0,0 +1,54 @@
+"""add micro steps
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 03:33:48.544977
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, Sequence[str], None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('micro_steps',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('action_id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['action_id'], ['actions.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('micro_steps', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_micro_steps_action_id'), ['action_id'], unique=False)
+
+    with op.batch_alter_table('actions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('micro_steps_generated_at', sa.DateTime(), nullable=True))
+
+    with op.batch_alter_table('archived_actions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('micro_steps_generated_at', sa.DateTime(), autoincrement=False, nullable=True))
+
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('archived_actions', schema=None) as batch_op:
+        batch_op.drop_column('micro_steps_generated_at')
+
+    with op.batch_alter_table('actions', schema=None) as batch_op:
+        batch_op.drop_column('micro_steps_generated_at')
+
+    with op.batch_alter_table('micro_steps', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_micro_steps_action_id'))
+
+    op.drop_table('micro_steps')
@@ -0,0 +1,36 @@
+"""add goals version
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 03:38:17.611909
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, Sequence[str], None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('goals', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+    with op.batch_alter_table('archived_goals', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), autoincrement=False, nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('archived_goals', schema=None) as batch_op:
+        batch_op.drop_column('version')
+
+    with op.batch_alter_table('goals', schema=None) as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,43 @@
+"""scope search indexes to the user
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18 04:24:34.707645
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0012'
+down_revision: Union[str, Sequence[str], None] = '0011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Only PostgreSQL has these indexes. Leading with user_id (through
+    # btree_gin) keeps a search from scanning every user's matches
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+    op.execute("CREATE INDEX ix_search_entries_user_id_tsv ON search_entries USING gin (user_id, tsv)")
+    op.execute(
+        "CREATE INDEX ix_search_entries_user_id_content_trgm ON search_entries "
+        "USING gin (user_id, content gin_trgm_ops)"
+    )
+    op.execute("DROP INDEX ix_search_entries_tsv")
+    op.execute("DROP INDEX ix_search_entries_content_trgm")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE INDEX ix_search_entries_tsv ON search_entries USING gin (tsv)")
+    op.execute("CREATE INDEX ix_search_entries_content_trgm ON search_entries USING gin (content gin_trgm_ops)")
+    op.execute("DROP INDEX ix_search_entries_user_id_tsv")
+    op.execute("DROP INDEX ix_search_entries_user_id_content_trgm")
@@ -0,0 +1,228 @@
+"""
+Admission control for expensive routes.
+
+Each route class (LLM generation, auth) has:
+
+- a token bucket per authenticated user and one per client IP, refilled at
+  a steady rate and allowing short bursts
+- a cap on requests of that class running at once in this process
+
+Requests over either limit are rejected immediately with 429 and a
+Retry-After header instead of queueing behind the work already in flight.
+Buckets live in process by default; set ADMISSION_REDIS_URL to share them
+between workers.
+
+Every class setting can be overridden with ADMISSION_<CLASS>_<NAME>,
+e.g. ADMISSION_LLM_USER_PER_MINUTE=20. A rate of 0 disables that bucket.
+"""
+import math
+import time
+from typing import Callable, Dict, Optional
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import register_collector
+
+ADMISSION_ENABLED = settings.admission_enabled
+ADMISSION_MAX_KEYS = settings.admission_max_keys
+ADMISSION_REDIS_URL = settings.admission_redis_url
+
+ROUTE_CLASSES = {
+    # Goal generation: each request is a full model call
+    "llm": {
+        "user_per_minute": 10,
+        "user_burst": 5,
+        "ip_per_minute": 30,
+        "ip_burst": 10,
+        "max_concurrency": 32,
+    },
+    # Register/login: each request is a bcrypt hash or verify
+    "auth": {
+        "user_per_minute": 0,
+        "user_burst": 0,
+        "ip_per_minute": 30,
+        "ip_burst": 10,
+        "max_concurrency": 64,
+    },
+}
+
+
+def load_route_class(name: str) -> Dict[str, int]:
+    """Return the named class's limits with ADMISSION_* overrides applied."""
+    limits = dict(ROUTE_CLASSES[name])
+    for key in limits:
+        value = getattr(settings, f"admission_{name}_{key}", None)
+        if value is not None:
+            limits[key] = value
+    return limits
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; `retry_after` is in seconds."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucketBackend:
+    """Interface for where bucket state lives."""
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        """Takes one token. Returns 0 if admitted, else seconds until a token is available."""
+        raise NotImplementedError
+
+
+class InMemoryTokenBucketBackend(TokenBucketBackend):
+    def __init__(self, max_keys: int = ADMISSION_MAX_KEYS):
+        # (tokens, last refill); a bucket left alone until full is the same as no bucket
+        self._buckets: TTLCache = TTLCache(max_keys, ttl=0)
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated_at) * rate)
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / rate
+        self._buckets.set(key, (tokens, now), ttl=burst / rate)
+        return retry_after
+
+
+class RedisTokenBucketBackend(TokenBucketBackend):
+    """Buckets shared between workers in Redis. Needs the optional `redis` package."""
+
+    # Refill and take atomically on the server
+    SCRIPT = """
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+    local retry_after = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        retry_after = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+    return tostring(retry_after)
+    """
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self._take = self._redis.register_script(self.SCRIPT)
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        result = await self._take(keys=[f"admission:{key}"], args=[rate, burst, time.time()])
+        return float(result)
+
+
+class RouteAdmission:
+    """Limits for one route class."""
+
+    def __init__(self, name: str, backend: TokenBucketBackend, limits: Dict[str, int]):
+        self.name = name
+        self.backend = backend
+        self.user_rate = limits["user_per_minute"] / 60
+        self.user_burst = max(limits["user_burst"], 1)
+        self.ip_rate = limits["ip_per_minute"] / 60
+        self.ip_burst = max(limits["ip_burst"], 1)
+        self.max_concurrency = limits["max_concurrency"]
+
+        # Metrics
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected_user = 0
+        self.rejected_ip = 0
+        self.rejected_concurrency = 0
+        self.backend_errors = 0
+
+    async def enter(self, ip: Optional[str], user_id: Optional[int]) -> Callable[[], None]:
+        """Admits a request or raises AdmissionRejected. Call the returned function when done."""
+        if self.max_concurrency and self.in_flight >= self.max_concurrency:
+            self.rejected_concurrency += 1
+            raise AdmissionRejected("concurrency", 1)
+        # Hold the slot while the buckets are checked so a burst can't overshoot the cap
+        self.in_flight += 1
+        try:
+            if user_id is not None and self.user_rate > 0:
+                retry_after = await self._take(f"{self.name}:user:{user_id}", self.user_rate, self.user_burst)
+                if retry_after:
+                    self.rejected_user += 1
+                    raise AdmissionRejected("user", retry_after)
+            if ip is not None and self.ip_rate > 0:
+                retry_after = await self._take(f"{self.name}:ip:{ip}", self.ip_rate, self.ip_burst)
+                if retry_after:
+                    self.rejected_ip += 1
+                    raise AdmissionRejected("ip", retry_after)
+        except BaseException:
+            self.in_flight -= 1
+            raise
+        self.admitted += 1
+
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self.in_flight -= 1
+
+        return release
+
+    async def _take(self, key: str, rate: float, burst: int) -> float:
+        try:
+            return await self.backend.take(key, rate, burst)
+        except Exception:
+            # A shared backend outage must not take the API down with it
+            self.backend_errors += 1
+            return 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "admitted": self.admitted,
+            "rejected_user": self.rejected_user,
+            "rejected_ip": self.rejected_ip,
+            "rejected_concurrency": self.rejected_concurrency,
+            "backend_errors": self.backend_errors,
+        }
+
+
+_routes: Dict[str, RouteAdmission] = {}
+_backend: Optional[TokenBucketBackend] = None
+
+
+def get_route_admission(name: str) -> RouteAdmission:
+    """Returns the process-wide admission state for a route class."""
+    global _backend
+    route = _routes.get(name)
+    if route is None:
+        if _backend is None:
+            _backend = (
+                RedisTokenBucketBackend(ADMISSION_REDIS_URL)
+                if ADMISSION_REDIS_URL else InMemoryTokenBucketBackend()
+            )
+        route = set_route_admission(RouteAdmission(name, _backend, load_route_class(name)))
+    return route
+
+
+def set_route_admission(route: RouteAdmission) -> RouteAdmission:
+    """Replaces the admission state for a route class."""
+    _routes[route.name] = route
+    register_collector(f"admission_{route.name}", route.stats)
+    return route
+
+
+def retry_after_header(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
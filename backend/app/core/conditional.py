@@ -0,0 +1,55 @@
+"""
+Conditional GET requests (RFC 9110 section 13) for versioned resources.
+
+Responses carry an ETag and Last-Modified; a client that sends them back in
+If-None-Match / If-Modified-Since gets an empty 304 Not Modified while the
+resource is unchanged, so polling costs a version lookup instead of a full
+read and response body.
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict
+
+from fastapi import Request, Response, status
+
+
+def make_etag(*parts) -> str:
+    """Strong entity tag made of the parts that identify a representation."""
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def http_date(value: datetime) -> str:
+    """Formats a naive UTC datetime as an HTTP date (whole seconds)."""
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def validator_headers(etag: str, last_modified: datetime) -> Dict[str, str]:
+    # Per-user data: browsers may keep it, but must revalidate before reuse
+    return {"ETag": etag, "Last-Modified": http_date(last_modified), "Cache-Control": "private, no-cache"}
+
+
+def is_conditional(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    """Whether the request's validators still match the current representation."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-Modified-Since is ignored when If-None-Match is present
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+    return False
+
+
+def not_modified(etag: str, last_modified: datetime) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(etag, last_modified))
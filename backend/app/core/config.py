@@ -0,0 +1,152 @@
+"""
+Application settings.
+
+Every setting is read once from the environment (or `backend/.env`) into a
+single `settings` object; environment variables win over the file. Field
+names map to upper-case variables, e.g. `llm_max_concurrency` is
+LLM_MAX_CONCURRENCY.
+"""
+from pathlib import Path
+from typing import Optional
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+ENV_FILE = Path(__file__).resolve().parent.parent.parent / ".env"
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_file=ENV_FILE, extra="ignore")
+
+    # Application
+    environment: str = "development"
+    # Create missing tables on startup instead of running migrations (local dev only)
+    auto_create_tables: bool = False
+
+    # Database
+    database_url: Optional[str] = None
+    # dev/test/prod; defaults from ENVIRONMENT
+    db_profile: Optional[str] = None
+    # Per-setting overrides of the engine profile
+    db_echo: Optional[bool] = None
+    db_pool_size: Optional[int] = None
+    db_max_overflow: Optional[int] = None
+    db_pool_timeout: Optional[int] = None
+    db_pool_recycle: Optional[int] = None
+    db_pool_pre_ping: Optional[bool] = None
+    db_statement_timeout_ms: Optional[int] = None
+    db_statement_cache_size: Optional[int] = None
+    db_slow_query_ms: Optional[int] = None
+    # Read replicas (comma-separated URLs); GET requests read from them
+    database_replica_urls: Optional[str] = None
+    # Replicas further behind than this are skipped until they catch up
+    db_replica_max_lag_seconds: float = 5
+    db_replica_check_interval_seconds: float = 5
+    db_replica_check_timeout_seconds: float = 2
+    # After a write, a user's reads go to the primary for this long
+    db_read_your_writes_seconds: float = 10
+
+    # JWT authentication
+    jwt_secret_key: Optional[str] = None
+    jwt_algorithm: str = "HS256"
+    jwt_access_token_expire_hours: int = 30
+
+    # Auth caches
+    auth_token_cache_size: int = 10000
+    auth_principal_cache_size: int = 10000
+    auth_principal_cache_ttl_seconds: float = 300
+
+    # Password hashing pool; 0 workers hashes inline on the event loop
+    password_hash_workers: int = 4
+    password_hash_max_pending: int = 64
+
+    # LLM client
+    gemini_api_key: Optional[str] = None
+    # Point the Gemini SDK at another host, e.g. a local fake model server
+    gemini_base_url: Optional[str] = None
+    llm_model: str = "gemini-3-pro-preview"
+    llm_max_concurrency: int = 16
+    llm_timeout_seconds: float = 120
+    llm_max_retries: int = 3
+    llm_backoff_base_seconds: float = 0.5
+    llm_backoff_max_seconds: float = 8
+    # Static system prompts at least this long are stored as Gemini cached
+    # content and referenced by name instead of being re-sent on every call
+    llm_prefix_cache_enabled: bool = True
+    llm_prefix_cache_min_tokens: int = 1024
+    llm_prefix_cache_ttl_seconds: float = 3600
+
+    # Plan cache
+    plan_cache_enabled: bool = True
+    plan_cache_max_entries: int = 1024
+    plan_cache_ttl_seconds: float = 86400
+    # Jaccard similarity (0-1) needed for a fuzzy hit; 0 disables the MinHash tier
+    plan_cache_similarity_threshold: float = 0
+    plan_cache_redis_url: Optional[str] = None
+
+    # Goal reads: keep serialized goal trees in memory by (goal_id, version).
+    # ETags and 304 responses work either way.
+    goal_tree_cache_enabled: bool = False
+    goal_tree_cache_size: int = 1024
+
+    # Goal export/import
+    # Rows fetched per round trip when exporting, rows per INSERT when importing
+    goal_transfer_batch_size: int = 1000
+    goal_import_max_bytes: int = 50_000_000
+
+    # Background generation jobs
+    job_store: str = "memory"
+    job_workers: int = 4
+    job_max_queued: int = 1000
+    job_max_attempts: int = 3
+    job_backoff_base_seconds: float = 2
+    job_backoff_max_seconds: float = 60
+    # How long finished jobs stay queryable in the in-memory store
+    job_retention_seconds: float = 3600
+    # A running job not heartbeated for this long is re-queued by any worker
+    job_lease_seconds: float = 60
+
+    # Mentor chat (token counts are estimates, ~4 characters per token)
+    chat_context_tokens: int = 8000
+    chat_response_tokens: int = 1024
+    chat_goal_context_tokens: int = 1500
+    chat_summary_tokens: int = 400
+    # Messages kept verbatim; older ones are folded into the rolling summary
+    chat_recent_messages: int = 20
+    chat_summary_batch: int = 20
+    chat_goal_context_cache_size: int = 1024
+
+    # Micro-steps, generated the first time an action is expanded
+    micro_step_cache_size: int = 10000
+    micro_step_cache_ttl_seconds: float = 3600
+    # Opening an action also generates its next sibling's micro-steps in the
+    # background, at most this many at a time per worker; 0 disables prefetch
+    micro_step_prefetch_max_concurrency: int = 4
+
+    # Admission control
+    admission_enabled: bool = True
+    admission_max_keys: int = 100000
+    admission_redis_url: Optional[str] = None
+    # Per route class overrides of the admission defaults
+    admission_llm_user_per_minute: Optional[int] = None
+    admission_llm_user_burst: Optional[int] = None
+    admission_llm_ip_per_minute: Optional[int] = None
+    admission_llm_ip_burst: Optional[int] = None
+    admission_llm_max_concurrency: Optional[int] = None
+    admission_auth_user_per_minute: Optional[int] = None
+    admission_auth_user_burst: Optional[int] = None
+    admission_auth_ip_per_minute: Optional[int] = None
+    admission_auth_ip_burst: Optional[int] = None
+    admission_auth_max_concurrency: Optional[int] = None
+
+    # Response compression (streamed NDJSON/SSE responses are never compressed)
+    gzip_enabled: bool = False
+    gzip_minimum_size: int = 1024
+    gzip_compresslevel: int = 5
+
+    # Request profiling
+    profiling_enabled: bool = False
+    profile_sample_rate: float = 0
+    profile_dir: Path = Path("profiles")
+
+
+settings = Settings()
@@ -0,0 +1,133 @@
+"""
+Password hashing on a bounded worker pool.
+
+bcrypt costs hundreds of milliseconds of CPU per call. Running it on the
+event loop stalls every other request on the worker, so hashes are computed
+on a small thread pool instead (bcrypt releases the GIL while hashing). When
+the pool and its queue are full, new work is rejected rather than queued
+without bound.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+from passlib.context import CryptContext
+
+from app.core.config import settings
+from app.core.metrics import record_span, register_collector
+
+# 0 hashes inline on the event loop (only useful as a benchmark baseline)
+PASSWORD_HASH_WORKERS = settings.password_hash_workers
+PASSWORD_HASH_MAX_PENDING = settings.password_hash_max_pending
+
+# Password hashing context
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+T = TypeVar("T")
+
+
+class HashingPoolSaturated(Exception):
+    """Raised when the hashing pool cannot accept more work."""
+
+
+class PasswordHasher:
+    def __init__(
+        self,
+        context: CryptContext = pwd_context,
+        max_workers: int = PASSWORD_HASH_WORKERS,
+        max_pending: int = PASSWORD_HASH_MAX_PENDING,
+    ):
+        self.context = context
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = (
+            ThreadPoolExecutor(max_workers, thread_name_prefix="password-hash")
+            if max_workers > 0 else None
+        )
+
+        # Metrics
+        self.pending = 0
+        self.rejected = 0
+        self.completed = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.hash_time_total = 0.0
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(self.context.verify, plain_password, hashed_password)
+
+    async def verify_and_update(
+        self, plain_password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        """Verifies the password and returns a new hash if the stored one is outdated."""
+        return await self._run(self.context.verify_and_update, plain_password, hashed_password)
+
+    async def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        if self._executor is None:
+            started_at = time.perf_counter()
+            result = fn(*args)
+            self._record(0.0, time.perf_counter() - started_at)
+            return result
+
+        if self.pending >= self.max_workers + self.max_pending:
+            self.rejected += 1
+            raise HashingPoolSaturated("Password hashing pool is saturated")
+
+        queued_at = time.perf_counter()
+
+        def timed() -> Tuple[T, float]:
+            started_at = time.perf_counter()
+            return fn(*args), started_at
+
+        self.pending += 1
+        try:
+            result, started_at = await asyncio.get_running_loop().run_in_executor(
+                self._executor, timed
+            )
+        finally:
+            self.pending -= 1
+        self._record(started_at - queued_at, time.perf_counter() - started_at)
+        return result
+
+    def _record(self, wait: float, duration: float) -> None:
+        self.completed += 1
+        record_span("hash", wait + duration)
+        self.queue_wait_total += wait
+        self.queue_wait_max = max(self.queue_wait_max, wait)
+        self.hash_time_total += duration
+
+    def stats(self) -> Dict[str, float]:
+        active = min(self.pending, self.max_workers)
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "active": active,
+            "queued": self.pending - active,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "queue_wait_seconds_total": self.queue_wait_total,
+            "queue_wait_seconds_max": self.queue_wait_max,
+            "hash_seconds_total": self.hash_time_total,
+        }
+
+
+_hasher: Optional[PasswordHasher] = None
+
+
+def get_password_hasher() -> PasswordHasher:
+    """Returns the process-wide password hasher, creating it on first use."""
+    if _hasher is None:
+        return set_password_hasher(PasswordHasher())
+    return _hasher
+
+
+def set_password_hasher(hasher: PasswordHasher) -> PasswordHasher:
+    """Replaces the process-wide password hasher."""
+    global _hasher
+    _hasher = hasher
+    register_collector("password_hasher", hasher.stats)
+    return hasher
@@ -0,0 +1,97 @@
+"""
+Request instrumentation middleware.
+
+Records per-route latency and the DB/LLM/hashing spans of every request,
+and optionally profiles sampled requests with cProfile. Profiling is
+opt-in: with PROFILING_ENABLED=true a request is profiled when it sends
+`X-Profile: 1` or is picked at PROFILE_SAMPLE_RATE. Profiles are written
+to PROFILE_DIR as .prof files (open with snakeviz or pstats).
+"""
+import cProfile
+import random
+import time
+from typing import Dict, Optional
+
+from fastapi import routing
+
+from app.core.config import settings
+from app.core.metrics import end_request, observe_request, start_request
+
+# Older FastAPI copies included routes onto the app with their full path
+iter_route_contexts = getattr(routing, "iter_route_contexts", None)
+
+PROFILING_ENABLED = settings.profiling_enabled
+PROFILE_SAMPLE_RATE = settings.profile_sample_rate
+PROFILE_DIR = settings.profile_dir
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streaming responses are timed to their last byte."""
+
+    def __init__(self, app):
+        self.app = app
+        # cProfile hooks the whole thread, so only one request is profiled at a time
+        self._profiling = False
+        # id(route) -> the route's full path template, prefixes included
+        self._route_paths: Dict[int, str] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        profiler = self._start_profiler(scope)
+        spans, token = start_request()
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started_at
+            end_request(token)
+            route = self._route_label(scope)
+            observe_request(scope["method"], route, status_code, elapsed, spans)
+            if profiler is not None:
+                self._dump_profile(profiler, scope["method"], route)
+
+    def _route_label(self, scope) -> str:
+        """
+        The matched route's path template, e.g. /api/goals/{goal_id}/tree.
+        The route in the scope only knows its path within its router, which
+        leaves out the prefix the router was included under.
+        """
+        route = scope.get("route")
+        if route is None:
+            return "unmatched"
+        path = self._route_paths.get(id(route))
+        if path is None:
+            if iter_route_contexts is not None:
+                for context in iter_route_contexts(scope["app"].routes):
+                    self._route_paths.setdefault(id(context.original_route), context.path)
+            path = self._route_paths.setdefault(id(route), route.path)
+        return path
+
+    def _start_profiler(self, scope) -> Optional[cProfile.Profile]:
+        if not PROFILING_ENABLED or self._profiling:
+            return None
+        requested = (b"x-profile", b"1") in scope.get("headers", [])
+        if not requested and random.random() >= PROFILE_SAMPLE_RATE:
+            return None
+        self._profiling = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def _dump_profile(self, profiler: cProfile.Profile, method: str, route: str) -> None:
+        profiler.disable()
+        self._profiling = False
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        slug = route.strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root"
+        profiler.dump_stats(PROFILE_DIR / f"{int(time.time() * 1000)}-{method}-{slug}.prof")
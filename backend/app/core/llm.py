@@ -0,0 +1,325 @@
+"""
+Shared async LLM client.
+
+One client per process bounds how many model calls run at once, applies a
+per-call timeout and retries rate-limit/server errors with jittered backoff.
+The backend is pluggable so tests and benchmarks can point it at a fake model.
+
+Long static system prompts can be stored once as Gemini cached content and
+referenced by name (see LLMClient.prefix_config), so they aren't re-sent and
+billed at the full input rate on every call.
+"""
+import asyncio
+import hashlib
+import random
+import time
+from abc import ABC, abstractmethod
+from contextlib import aclosing, asynccontextmanager
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, Optional
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import record_span, register_collector
+
+LLM_MODEL = settings.llm_model
+LLM_MAX_CONCURRENCY = settings.llm_max_concurrency
+LLM_TIMEOUT_SECONDS = settings.llm_timeout_seconds
+LLM_MAX_RETRIES = settings.llm_max_retries
+LLM_BACKOFF_BASE_SECONDS = settings.llm_backoff_base_seconds
+LLM_BACKOFF_MAX_SECONDS = settings.llm_backoff_max_seconds
+GEMINI_BASE_URL = settings.gemini_base_url
+LLM_PREFIX_CACHE_ENABLED = settings.llm_prefix_cache_enabled
+LLM_PREFIX_CACHE_MIN_TOKENS = settings.llm_prefix_cache_min_tokens
+LLM_PREFIX_CACHE_TTL_SECONDS = settings.llm_prefix_cache_ttl_seconds
+
+# How long a prefix that could not be cached is sent inline before retrying
+_PREFIX_RETRY_SECONDS = 300
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+class LLMError(Exception):
+    """Raised when the model could not produce a response."""
+
+
+class LLMTimeoutError(LLMError):
+    """Raised when a model call exceeds its timeout."""
+
+
+class LLMBackend(ABC):
+    """Interface for the transport that actually talks to a model."""
+
+    @abstractmethod
+    async def generate(self, model: str, contents: Any, config: Optional[Dict] = None) -> str:
+        ...
+
+    @abstractmethod
+    def stream(self, model: str, contents: Any, config: Optional[Dict] = None) -> AsyncGenerator[str, None]:
+        ...
+
+    @abstractmethod
+    async def cache_prefix(self, model: str, system_instruction: str, ttl_seconds: float) -> str:
+        """Stores a system prompt server-side and returns the name to reference it by."""
+
+
+class GeminiBackend(LLMBackend):
+    """Calls Gemini through the async surface of the google-genai SDK."""
+
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None):
+        # The SDK takes around a second to import, so only pay for it once a
+        # model is actually called
+        from google import genai
+        from google.genai import types
+
+        http_options = types.HttpOptions(base_url=base_url) if base_url else None
+        self._client = genai.Client(api_key=api_key, http_options=http_options)
+
+    async def generate(self, model: str, contents: Any, config: Optional[Dict] = None) -> str:
+        response = await self._client.aio.models.generate_content(
+            model=model, contents=contents, config=config  # type: ignore[arg-type]  # plain dicts are accepted
+        )
+        return response.text or ""
+
+    async def stream(self, model: str, contents: Any, config: Optional[Dict] = None) -> AsyncGenerator[str, None]:
+        responses = await self._client.aio.models.generate_content_stream(
+            model=model, contents=contents, config=config  # type: ignore[arg-type]  # plain dicts are accepted
+        )
+        async for response in responses:
+            if response.text:
+                yield response.text
+
+    async def cache_prefix(self, model: str, system_instruction: str, ttl_seconds: float) -> str:
+        cache = await self._client.aio.caches.create(
+            model=model,
+            config={"system_instruction": system_instruction, "ttl": f"{int(ttl_seconds)}s"},
+        )
+        # No name means nothing was cached; the caller sends the prompt inline
+        return cache.name or ""
+
+
+def _is_retryable(exc: Exception) -> bool:
+    """Rate limits (429) and server errors (5xx) are worth retrying."""
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    return isinstance(code, int) and (code == 429 or code >= 500)
+
+
+class LLMClient:
+    def __init__(
+        self,
+        backend: LLMBackend,
+        model: str = LLM_MODEL,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        timeout: float = LLM_TIMEOUT_SECONDS,
+        max_retries: int = LLM_MAX_RETRIES,
+        backoff_base: float = LLM_BACKOFF_BASE_SECONDS,
+        backoff_max: float = LLM_BACKOFF_MAX_SECONDS,
+        prefix_cache_enabled: bool = LLM_PREFIX_CACHE_ENABLED,
+        prefix_cache_min_tokens: int = LLM_PREFIX_CACHE_MIN_TOKENS,
+        prefix_cache_ttl: float = LLM_PREFIX_CACHE_TTL_SECONDS,
+    ):
+        self.backend = backend
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.prefix_cache_enabled = prefix_cache_enabled
+        self.prefix_cache_min_tokens = prefix_cache_min_tokens
+        self.prefix_cache_ttl = prefix_cache_ttl
+        # Prefix digest -> cached content name ("" when caching it failed).
+        # Entries expire a little before the server-side cache does.
+        self._prefixes: TTLCache[str] = TTLCache(maxsize=1024, ttl=prefix_cache_ttl * 0.9)
+        self._pending_prefixes: Dict[str, "asyncio.Future[str]"] = {}
+
+        # Metrics
+        self.waiting = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.call_time_total = 0.0
+        self.prefix_cache_created = 0
+        self.prefix_cache_failures = 0
+
+    async def generate(self, contents: Any, config: Optional[Dict] = None) -> str:
+        """Generates a response, retrying retryable errors with jittered backoff."""
+        self.requests += 1
+        attempt = 0
+        while True:
+            try:
+                return await self._call(contents, config)
+            except LLMTimeoutError:
+                self.failures += 1
+                raise
+            except Exception as exc:
+                if attempt >= self.max_retries or not _is_retryable(exc):
+                    self.failures += 1
+                    raise LLMError(f"LLM request failed: {exc}") from exc
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+
+    async def stream(self, contents: Any, config: Optional[Dict] = None) -> AsyncGenerator[str, None]:
+        """
+        Streams response text chunks. Retryable errors are only retried before
+        the first chunk is yielded; the timeout covers the whole stream.
+
+        The stream holds a concurrency slot until it ends, so a caller that
+        stops early must close it (e.g. with contextlib.aclosing) rather than
+        leave that to garbage collection.
+        """
+        self.requests += 1
+        attempt = 0
+        while True:
+            emitted = False
+            try:
+                async with aclosing(self._stream_call(contents, config)) as chunks:
+                    async for chunk in chunks:
+                        emitted = True
+                        yield chunk
+                return
+            except LLMTimeoutError:
+                self.failures += 1
+                raise
+            except Exception as exc:
+                if emitted or attempt >= self.max_retries or not _is_retryable(exc):
+                    self.failures += 1
+                    raise LLMError(f"LLM stream failed: {exc}") from exc
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+
+    async def prefix_config(self, system_instruction: str) -> Dict:
+        """
+        Returns a config carrying a static system prompt. Prompts long enough
+        to be worth caching are replaced by a reference to cached content;
+        short ones are sent inline, where the API's implicit prefix caching
+        still applies. Callers add their own keys to the returned dict.
+        """
+        if not self.prefix_cache_enabled or estimate_tokens(system_instruction) < self.prefix_cache_min_tokens:
+            return {"system_instruction": system_instruction}
+        key = hashlib.sha256(f"{self.model}\n{system_instruction}".encode()).hexdigest()
+        name = self._prefixes.get(key)
+        if name is None:
+            pending = self._pending_prefixes.get(key)
+            if pending is None:
+                # Single-flight: concurrent turns on the same goal share one create call
+                pending = asyncio.ensure_future(self._cache_prefix(key, system_instruction))
+                self._pending_prefixes[key] = pending
+                pending.add_done_callback(lambda _: self._pending_prefixes.pop(key, None))
+            name = await asyncio.shield(pending)
+        if not name:
+            return {"system_instruction": system_instruction}
+        return {"cached_content": name}
+
+    async def _cache_prefix(self, key: str, system_instruction: str) -> str:
+        try:
+            name = await asyncio.wait_for(
+                self.backend.cache_prefix(self.model, system_instruction, self.prefix_cache_ttl),
+                self.timeout,
+            )
+        except Exception:
+            # E.g. below the model's minimum cacheable size; send it inline for a while
+            self.prefix_cache_failures += 1
+            self._prefixes.set(key, "", ttl=_PREFIX_RETRY_SECONDS)
+            return ""
+        self.prefix_cache_created += 1
+        self._prefixes.set(key, name)
+        return name
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    @asynccontextmanager
+    async def _slot(self) -> AsyncIterator[None]:
+        """Holds one of the pool's concurrency slots, recording queue wait."""
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        started_at = time.perf_counter()
+        wait = started_at - queued_at
+        self.queue_wait_total += wait
+        self.queue_wait_max = max(self.queue_wait_max, wait)
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            finished_at = time.perf_counter()
+            self.in_flight -= 1
+            self.call_time_total += finished_at - started_at
+            self._semaphore.release()
+            record_span("llm", finished_at - queued_at)
+
+    async def _call(self, contents: Any, config: Optional[Dict]) -> str:
+        async with self._slot():
+            try:
+                return await asyncio.wait_for(
+                    self.backend.generate(self.model, contents, config), self.timeout
+                )
+            except asyncio.TimeoutError as exc:
+                self.timeouts += 1
+                raise LLMTimeoutError(f"LLM request timed out after {self.timeout}s") from exc
+
+    async def _stream_call(self, contents: Any, config: Optional[Dict]) -> AsyncGenerator[str, None]:
+        async with self._slot(), aclosing(self.backend.stream(self.model, contents, config)) as chunks:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.timeout
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(
+                        chunks.__anext__(), max(deadline - loop.time(), 0)
+                    )
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError as exc:
+                    self.timeouts += 1
+                    raise LLMTimeoutError(f"LLM stream timed out after {self.timeout}s") from exc
+                yield chunk
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "requests": self.requests,
+            "failures": self.failures,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "queue_wait_seconds_total": self.queue_wait_total,
+            "queue_wait_seconds_max": self.queue_wait_max,
+            "call_seconds_total": self.call_time_total,
+            "prefix_cache_size": len(self._prefixes),
+            "prefix_cache_hits": self._prefixes.hits,
+            "prefix_cache_created": self.prefix_cache_created,
+            "prefix_cache_failures": self.prefix_cache_failures,
+        }
+
+
+_client: Optional[LLMClient] = None
+
+
+def get_llm_client() -> LLMClient:
+    """Returns the process-wide LLM client, creating it on first use."""
+    if _client is None:
+        return set_llm_client(LLMClient(GeminiBackend(base_url=GEMINI_BASE_URL, api_key=settings.gemini_api_key)))
+    return _client
+
+
+def set_llm_client(client: LLMClient) -> LLMClient:
+    """Replaces the process-wide LLM client (e.g. with a fake backend in tests)."""
+    global _client
+    _client = client
+    register_collector("llm", client.stats)
+    return client
@@ -0,0 +1,149 @@
+"""
+Process-wide metrics.
+
+- Components register `stats()` collectors (LLM pool, caches, DB pools, ...)
+- Request latency and per-request spans (DB, LLM, hashing) are recorded into
+  histograms by the metrics middleware
+- Everything can be rendered in the Prometheus text exposition format
+"""
+import bisect
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+Collector = Callable[[], Dict[str, float]]
+
+_collectors: Dict[str, Collector] = {}
+
+METRIC_PREFIX = "apollo"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def register_collector(name: str, collector: Collector) -> None:
+    """Registers (or replaces) a callable returning a component's current stats."""
+    _collectors[name] = collector
+
+
+def collect() -> Dict[str, Dict[str, float]]:
+    """Returns a snapshot of every registered component's stats."""
+    return {name: collector() for name, collector in _collectors.items()}
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets, partitioned by label values."""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> (bucket counts, sum, count)
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = ([0] * len(self.buckets), [0.0, 0.0])
+        counts, totals = series
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(counts):
+            counts[index] += 1
+        totals[0] += value
+        totals[1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, (total, count)) in sorted(self._series.items()):
+            labels = ",".join(
+                f'{key}="{_escape(value)}"' for key, value in zip(self.labels, label_values, strict=True)
+            )
+            prefix = f"{labels}," if labels else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts, strict=True):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {int(count)}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {int(count)}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+request_duration = Histogram(
+    f"{METRIC_PREFIX}_http_request_duration_seconds",
+    "HTTP request latency by route",
+    ("method", "route", "status"),
+    LATENCY_BUCKETS,
+)
+span_duration = Histogram(
+    f"{METRIC_PREFIX}_http_request_span_seconds",
+    "Time spent per request in DB, LLM and password hashing spans",
+    ("route", "span"),
+    LATENCY_BUCKETS,
+)
+db_queries = Histogram(
+    f"{METRIC_PREFIX}_http_request_db_queries",
+    "Database statements issued per request",
+    ("route",),
+    COUNT_BUCKETS,
+)
+
+
+class RequestSpans:
+    """Time accumulated by the current request in each instrumented span."""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self.db_queries = 0
+
+    def add(self, name: str, seconds: float) -> None:
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+
+_current_spans: ContextVar[Optional[RequestSpans]] = ContextVar("request_spans", default=None)
+
+
+def start_request() -> Tuple[RequestSpans, object]:
+    spans = RequestSpans()
+    return spans, _current_spans.set(spans)
+
+
+def end_request(token) -> None:
+    _current_spans.reset(token)
+
+
+def record_span(name: str, seconds: float) -> None:
+    """Adds time to a span of the request being handled (no-op outside requests)."""
+    spans = _current_spans.get()
+    if spans is not None:
+        spans.add(name, seconds)
+
+
+def record_query(seconds: float) -> None:
+    spans = _current_spans.get()
+    if spans is not None:
+        spans.add("db", seconds)
+        spans.db_queries += 1
+
+
+def observe_request(method: str, route: str, status: int, seconds: float, spans: RequestSpans) -> None:
+    request_duration.observe(seconds, method, route, str(status))
+    for name, span_seconds in spans.seconds.items():
+        span_duration.observe(span_seconds, route, name)
+    db_queries.observe(spans.db_queries, route)
+
+
+def render_prometheus() -> str:
+    """Renders histograms and component stats in Prometheus text format."""
+    lines: List[str] = []
+    for histogram in (request_duration, span_duration, db_queries):
+        lines.extend(histogram.render())
+    for component, stats in sorted(collect().items()):
+        for key, value in stats.items():
+            name = f"{METRIC_PREFIX}_{component}_{key}"
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {float(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,131 @@
+"""
+Connection pool and query instrumentation for SQLAlchemy engines.
+
+Tracks, per engine:
+- connections checked out and overflow in use (read live from the pool)
+- time spent waiting to acquire a connection
+- how long each connection is held before it is returned
+- statements slower than a threshold, which are also logged
+"""
+import logging
+import time
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.metrics import record_query, register_collector
+
+logger = logging.getLogger(__name__)
+
+
+class PoolMetrics:
+    def __init__(self, name: str):
+        self.name = name
+        self.pool: QueuePool | None = None
+        self.acquisitions = 0
+        self.acquire_wait_total = 0.0
+        self.acquire_wait_max = 0.0
+        self.acquire_timeouts = 0
+        self.releases = 0
+        self.hold_total = 0.0
+        self.hold_max = 0.0
+        self.queries = 0
+        self.slow_queries = 0
+
+    def record_acquire(self, wait: float) -> None:
+        self.acquisitions += 1
+        self.acquire_wait_total += wait
+        self.acquire_wait_max = max(self.acquire_wait_max, wait)
+
+    def record_release(self, held: float) -> None:
+        self.releases += 1
+        self.hold_total += held
+        self.hold_max = max(self.hold_max, held)
+
+    def stats(self) -> Dict[str, float]:
+        pool = self.pool
+        return {
+            "size": pool.size() if pool else 0,
+            "checked_out": pool.checkedout() if pool else 0,
+            "overflow": max(pool.overflow(), 0) if pool else 0,
+            "acquisitions": self.acquisitions,
+            "acquire_wait_seconds_total": self.acquire_wait_total,
+            "acquire_wait_seconds_max": self.acquire_wait_max,
+            "acquire_timeouts": self.acquire_timeouts,
+            "releases": self.releases,
+            "hold_seconds_total": self.hold_total,
+            "hold_seconds_max": self.hold_max,
+            "queries": self.queries,
+            "slow_queries": self.slow_queries,
+        }
+
+
+_pool_metrics: Dict[str, PoolMetrics] = {}
+
+
+def get_pool_metrics(name: str) -> PoolMetrics:
+    """Returns the metrics for the pool with the given logging name."""
+    metrics = _pool_metrics.get(name)
+    if metrics is None:
+        metrics = _pool_metrics[name] = PoolMetrics(name)
+        register_collector(f"db_pool_{name}", metrics.stats)
+    return metrics
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records how long callers wait for a connection. Metrics
+    are looked up by the pool's logging name so they survive pool recreation.
+    """
+
+    def connect(self):
+        metrics = get_pool_metrics(self._orig_logging_name or "default")
+        metrics.pool = self
+        started_at = time.perf_counter()
+        try:
+            connection = super().connect()
+        except Exception:
+            metrics.acquire_timeouts += 1
+            raise
+        metrics.record_acquire(time.perf_counter() - started_at)
+        return connection
+
+
+def instrument_engine(engine: Engine, name: str, slow_query_ms: float) -> None:
+    """Attaches hold-time tracking and the slow-query log to a (sync) engine."""
+    metrics = get_pool_metrics(name)
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            metrics.record_release(time.perf_counter() - checked_out_at)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("query_started_at")
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        elapsed_ms = elapsed * 1000
+        metrics.queries += 1
+        record_query(elapsed)
+        if slow_query_ms and elapsed_ms >= slow_query_ms:
+            metrics.slow_queries += 1
+            logger.warning("Slow query on %s (%.0f ms): %s", name, elapsed_ms, statement[:1000])
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(context):
+        connection = context.connection
+        if connection is not None and connection.info.get("query_started_at"):
+            connection.info["query_started_at"].pop()
@@ -0,0 +1,39 @@
+"""
+Caches for authenticating requests without repeated work.
+
+- Decoded JWT claims, keyed by a hash of the token, until the token expires
+- User principals (the public user fields), keyed by user ID, for a short TTL
+
+Both caches are per process. User updates and deletes invalidate the
+principal locally; other workers pick up changes when the TTL runs out.
+"""
+import hashlib
+from typing import Dict
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import register_collector
+from app.schemas.auth import UserResponse
+
+AUTH_TOKEN_CACHE_SIZE = settings.auth_token_cache_size
+AUTH_PRINCIPAL_CACHE_SIZE = settings.auth_principal_cache_size
+AUTH_PRINCIPAL_CACHE_TTL_SECONDS = settings.auth_principal_cache_ttl_seconds
+
+# Entries are stored with a TTL matching the token's own expiry
+token_cache: TTLCache[Dict] = TTLCache(AUTH_TOKEN_CACHE_SIZE, ttl=0)
+principal_cache: TTLCache[UserResponse] = TTLCache(
+    AUTH_PRINCIPAL_CACHE_SIZE, ttl=AUTH_PRINCIPAL_CACHE_TTL_SECONDS
+)
+
+register_collector("auth_token_cache", token_cache.stats)
+register_collector("auth_principal_cache", principal_cache.stats)
+
+
+def token_key(token: str) -> str:
+    """Tokens are cached by digest so raw credentials are never kept as keys."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def invalidate_user(user_id: int) -> None:
+    """Drops the cached principal for a user after it changes."""
+    principal_cache.delete(user_id)
@@ -1,27 +1,128 @@
+import asyncio
+import logging
+import math
+import time
+from typing import AsyncIterator, List, Optional
+from fastapi import Request, Response
+from sqlalchemy import event, text
+from sqlalchemy.exc import InvalidRequestError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import declarative_base
-from dotenv import load_dotenv
-import os
-from pathlib import Path
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from app.core.cache import TTLCache
+from app.core.metrics import register_collector
+from app.core.pool_metrics import InstrumentedQueuePool, instrument_engine
+from app.core.config import settings
+from app.core.security import token_cache, token_key
 
-# Load environment variables
-env_path = Path(__file__).resolve().parent.parent / '.env'
-load_dotenv(dotenv_path=env_path)
+logger = logging.getLogger(__name__)
 
-# Get database URL from environment
-DATABASE_URL = os.getenv("DATABASE_URL")
+DATABASE_URL = settings.database_url
 if not DATABASE_URL:
-    raise ValueError("DATABASE_URL not found in .env file")
+    raise ValueError("DATABASE_URL not found in environment or .env file")
 
-# Create async engine
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=True,  
-    future=True,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20
+DATABASE_REPLICA_URLS = [
+    url.strip() for url in (settings.database_replica_urls or "").split(",") if url.strip()
+]
+REPLICA_MAX_LAG_SECONDS = settings.db_replica_max_lag_seconds
+REPLICA_CHECK_INTERVAL_SECONDS = settings.db_replica_check_interval_seconds
+REPLICA_CHECK_TIMEOUT_SECONDS = settings.db_replica_check_timeout_seconds
+READ_YOUR_WRITES_SECONDS = settings.db_read_your_writes_seconds
+
+# Engine tuning profiles. Every value can be overridden with the matching
+# DB_* setting (e.g. DB_POOL_SIZE=30).
+ENGINE_PROFILES = {
+    "dev": {
+        "echo": True,
+        "pool_size": 5,
+        "max_overflow": 10,
+        "pool_timeout": 30,
+        "pool_recycle": -1,
+        "pool_pre_ping": True,
+        "statement_timeout_ms": 0,
+        "statement_cache_size": 100,
+        "slow_query_ms": 200,
+    },
+    "test": {
+        "echo": False,
+        "pool_size": 5,
+        "max_overflow": 5,
+        "pool_timeout": 10,
+        "pool_recycle": -1,
+        "pool_pre_ping": False,
+        "statement_timeout_ms": 10000,
+        "statement_cache_size": 100,
+        "slow_query_ms": 0,
+    },
+    "prod": {
+        "echo": False,
+        "pool_size": 10,
+        "max_overflow": 20,
+        "pool_timeout": 30,
+        # Recycle before the server/load balancer drops idle connections,
+        # instead of paying a pre-ping round trip on every checkout
+        "pool_recycle": 1800,
+        "pool_pre_ping": False,
+        "statement_timeout_ms": 30000,
+        "statement_cache_size": 500,
+        "slow_query_ms": 500,
+    },
+}
+
+_ENVIRONMENT_PROFILES = {"development": "dev", "production": "prod", "test": "test"}
+
+
+def load_engine_settings(profile: str) -> dict:
+    """Return the named profile with DB_* overrides applied."""
+    values = dict(ENGINE_PROFILES[profile])
+    for key in values:
+        override = getattr(settings, f"db_{key}")
+        if override is not None:
+            values[key] = override
+    return values
+
+
+DB_PROFILE = settings.db_profile or _ENVIRONMENT_PROFILES.get(
+    settings.environment.lower(), "dev"
 )
+engine_settings = load_engine_settings(DB_PROFILE)
+
+
+def build_engine(url: str, settings: dict, name: str = "primary"):
+    """Create an instrumented async engine for the given tuning settings."""
+    url_obj = make_url(url)
+    kwargs = {"echo": settings["echo"], "future": True}
+    connect_args = {}
+
+    if url_obj.get_backend_name() == "sqlite" and url_obj.database in (None, "", ":memory:"):
+        # In-memory SQLite lives on a single connection; pool settings don't apply
+        pass
+    else:
+        kwargs.update(
+            poolclass=InstrumentedQueuePool,
+            pool_logging_name=name,
+            pool_size=settings["pool_size"],
+            max_overflow=settings["max_overflow"],
+            pool_timeout=settings["pool_timeout"],
+            pool_recycle=settings["pool_recycle"],
+            pool_pre_ping=settings["pool_pre_ping"],
+        )
+
+    if url_obj.get_driver_name() == "asyncpg":
+        # 0 disables the prepared statement cache (required behind PgBouncer)
+        connect_args["prepared_statement_cache_size"] = settings["statement_cache_size"]
+        if settings["statement_timeout_ms"]:
+            connect_args["server_settings"] = {
+                "statement_timeout": str(settings["statement_timeout_ms"])
+            }
+
+    engine = create_async_engine(url, connect_args=connect_args, **kwargs)
+    instrument_engine(engine.sync_engine, name, settings["slow_query_ms"])
+    return engine
+
+
+# Create async engine
+engine = build_engine(DATABASE_URL, engine_settings)
 
 # Create async session factory
 async_session_maker = async_sessionmaker(
@@ -32,20 +133,231 @@ async_session_maker = async_sessionmaker(
     autoflush=False
 )
 
+# Replication delay reported by a replica; 0 when it has replayed everything
+# it received (an idle primary makes the last replay timestamp look old)
+_LAG_QUERIES = {
+    "postgresql": (
+        "SELECT CASE WHEN NOT pg_is_in_recovery() "
+        "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+    ),
+}
+# Other databases (e.g. a second SQLite file for local testing) only get a liveness check
+_DEFAULT_LAG_QUERY = "SELECT 0"
+
+# Methods whose requests only read, and are served by replicas
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+# Set on write responses so the browser's next reads go to the primary on any worker
+READ_PRIMARY_COOKIE = "apollo_read_primary"
+_RECENT_WRITERS_MAX = 100000
+
+
+class ReadOnlySession(Session):
+    """Session class behind replica sessions; refuses to write."""
+
+
+@event.listens_for(ReadOnlySession, "before_flush")
+def _reject_flush(session, flush_context, instances):
+    raise InvalidRequestError("Replica sessions are read-only")
+
+
+@event.listens_for(ReadOnlySession, "do_orm_execute")
+def _reject_dml(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        raise InvalidRequestError("Replica sessions are read-only")
+
+
+class Replica:
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.engine = build_engine(url, engine_settings, name)
+        self.session_maker = async_sessionmaker(
+            self.engine,
+            class_=AsyncSession,
+            sync_session_class=ReadOnlySession,
+            expire_on_commit=False,
+            autoflush=False
+        )
+        self.healthy = False
+        self.lag: Optional[float] = None
+        self.checked_at = 0.0
+        self.failures = 0
+        self.reads = 0
+
+    async def measure_lag(self, timeout: float) -> float:
+        query = _LAG_QUERIES.get(self.engine.dialect.name, _DEFAULT_LAG_QUERY)
+        async with self.engine.connect() as conn:
+            lag = await asyncio.wait_for(conn.scalar(text(query)), timeout)
+        return float(lag or 0)
+
+
+class SessionRouter:
+    """
+    Chooses the database for each session: the primary for writes, a
+    replica (round robin) for reads.
+
+    Replicas are checked in the background; one that fails its check, lags
+    more than `max_lag` or hasn't been checked recently is skipped, and reads
+    fall back to the primary when none is usable. A user's reads also go to
+    the primary for `read_your_writes` seconds after they write, so they
+    always see their own changes. That window is per process; the
+    READ_PRIMARY_COOKIE carries it across workers for browsers.
+    """
+
+    def __init__(
+        self,
+        primary: async_sessionmaker,
+        replicas: List[Replica],
+        max_lag: float,
+        check_interval: float,
+        check_timeout: float,
+        read_your_writes: float,
+    ):
+        self.primary = primary
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self.read_your_writes = read_your_writes
+        self.recent_writers: TTLCache[bool] = TTLCache(_RECENT_WRITERS_MAX, ttl=read_your_writes)
+        self._next = 0
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.read_your_writes_reads = 0
+        self.fallback_reads = 0
+
+    def usable_replicas(self) -> List[Replica]:
+        # Three missed checks and a replica's last result is no longer trusted
+        oldest = time.monotonic() - 3 * self.check_interval
+        return [replica for replica in self.replicas if replica.healthy and replica.checked_at >= oldest]
+
+    def for_read(self, user_id: Optional[int] = None, wrote_recently: bool = False) -> async_sessionmaker:
+        """Session factory for a read by `user_id` (if known)."""
+        if not self.replicas:
+            return self.primary
+        if wrote_recently or (user_id is not None and user_id in self.recent_writers):
+            self.read_your_writes_reads += 1
+            return self.primary
+        usable = self.usable_replicas()
+        if not usable:
+            self.fallback_reads += 1
+            return self.primary
+        replica = usable[self._next % len(usable)]
+        self._next += 1
+        replica.reads += 1
+        return replica.session_maker
+
+    def record_write(self, user_id: Optional[int]) -> None:
+        if self.replicas and user_id is not None:
+            self.recent_writers.set(user_id, True)
+
+    async def check_replicas(self) -> None:
+        await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+
+    async def _check(self, replica: Replica) -> None:
+        try:
+            lag = await replica.measure_lag(self.check_timeout)
+        except Exception as e:
+            if replica.healthy or not replica.failures:
+                logger.warning("Replica %s failed its health check: %r", replica.name, e)
+            replica.healthy = False
+            replica.lag = None
+            replica.failures += 1
+        else:
+            healthy = lag <= self.max_lag
+            if healthy != replica.healthy:
+                logger.warning("Replica %s is %s (lag %.1f s)", replica.name, "usable" if healthy else "lagging", lag)
+            replica.healthy = healthy
+            replica.lag = lag
+        replica.checked_at = time.monotonic()
+
+    async def start(self) -> None:
+        """Checks the replicas once, then keeps checking them in the background."""
+        if not self.replicas:
+            return
+        await self.check_replicas()
+        self._task = asyncio.create_task(self._monitor())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _monitor(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.check_replicas()
+
+    def stats(self):
+        stats = {
+            "replicas": len(self.replicas),
+            "usable": len(self.usable_replicas()),
+            "read_your_writes_reads": self.read_your_writes_reads,
+            "fallback_reads": self.fallback_reads,
+            "recent_writers": len(self.recent_writers),
+        }
+        for replica in self.replicas:
+            stats[f"{replica.name}_healthy"] = int(replica.healthy)
+            stats[f"{replica.name}_lag_seconds"] = replica.lag if replica.lag is not None else -1
+            stats[f"{replica.name}_reads"] = replica.reads
+            stats[f"{replica.name}_check_failures"] = replica.failures
+        return stats
+
+
+session_router = SessionRouter(
+    async_session_maker,
+    [Replica(f"replica{i}", url) for i, url in enumerate(DATABASE_REPLICA_URLS, 1)],
+    REPLICA_MAX_LAG_SECONDS,
+    REPLICA_CHECK_INTERVAL_SECONDS,
+    REPLICA_CHECK_TIMEOUT_SECONDS,
+    READ_YOUR_WRITES_SECONDS,
+)
+if DATABASE_REPLICA_URLS:
+    register_collector("db_replicas", session_router.stats)
+
+
+def _request_user_id(request: Request) -> Optional[int]:
+    """The caller's user ID if their token has already been verified by this process."""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    claims = token_cache.get(token_key(token))
+    return claims["user_id"] if claims else None
+
+
 # Dependency for FastAPI
-async def get_db() -> AsyncSession:
-    """Dependency to get database session"""
-    async with async_session_maker() as session:
+async def get_db(request: Request, response: Response) -> AsyncIterator[AsyncSession]:
+    """
+    Dependency to get database session. Reads (GET/HEAD) use a replica when
+    one is configured and usable; everything else uses the primary.
+    """
+    user_id = _request_user_id(request)
+    is_read = request.method in READ_METHODS
+    if is_read:
+        session_maker = session_router.for_read(user_id, READ_PRIMARY_COOKIE in request.cookies)
+    else:
+        session_maker = session_router.primary
+        if session_router.replicas:
+            session_router.record_write(user_id)
+            response.set_cookie(
+                READ_PRIMARY_COOKIE, "1", max_age=math.ceil(session_router.read_your_writes),
+                httponly=True, samesite="lax"
+            )
+    async with session_maker() as session:
         try:
             yield session
         finally:
             await session.close()
+            if not is_read:
+                # Restart the window from the end of the write; the token is verified by now
+                session_router.record_write(_request_user_id(request))
 
 # Function to create tables
 async def create_tables():
     """Create all tables in the database"""
-    from app.models.base import Base
-    from app.models.user import User  
+    from app.models import Base
     
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
@@ -53,7 +365,7 @@ async def create_tables():
 # Function to drop tables 
 async def drop_tables():
     """Drop all tables in the database"""
-    from app.models.base import Base
+    from app.models import Base
     
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
@@ -0,0 +1,68 @@
+"""Shared FastAPI dependencies"""
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.admission import (
+    ADMISSION_ENABLED,
+    AdmissionRejected,
+    get_route_admission,
+    retry_after_header,
+)
+from app.database import get_db
+from app.schemas.auth import UserResponse
+from app.services.auth import AuthService
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login", auto_error=False)
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
+) -> UserResponse:
+    """
+    Resolve the authenticated user. Decoded tokens and user principals are
+    cached, so repeat requests usually skip both jwt.decode and the database.
+    """
+    return await AuthService(db).get_current_user(token)
+
+
+def admit(route_class: str):
+    """
+    Dependency factory applying admission control for a route class. The
+    concurrency slot is held until the response (including any stream) ends.
+    """
+    async def dependency(
+        request: Request,
+        token: Optional[str] = Depends(optional_oauth2_scheme),
+        db: AsyncSession = Depends(get_db),
+    ):
+        if not ADMISSION_ENABLED:
+            yield
+            return
+
+        user_id = None
+        if token:
+            try:
+                user_id = (await AuthService(db).verify_token(token))["user_id"]
+            except HTTPException:
+                # Bad tokens are rejected by the route itself; limit by IP only
+                pass
+        ip = request.client.host if request.client else None
+
+        try:
+            release = await get_route_admission(route_class).enter(ip, user_id)
+        except AdmissionRejected as e:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, try again later",
+                headers={"Retry-After": retry_after_header(e.retry_after)}
+            ) from e
+        try:
+            yield
+        finally:
+            release()
+
+    return dependency
@@ -3,16 +3,34 @@ Apollo Backend - FastAPI Application Entry Point
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES
 from contextlib import asynccontextmanager
-from app.database import create_tables
+from app.core.config import settings
+from app.database import create_tables, session_router
+from app.core.metrics import collect, render_prometheus
+from app.core.instrumentation import MetricsMiddleware
+from app.services.jobs import get_job_queue
 from app.routers import auth
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Create tables
-    await create_tables()
+    # Schema is managed by Alembic (alembic upgrade head); create_all is
+    # only a shortcut for throwaway local databases
+    if settings.auto_create_tables:
+        await create_tables()
+    await session_router.start()
+    job_queue = get_job_queue()
+    await job_queue.start()
     yield
+    await job_queue.stop()
+    await session_router.stop()
 
+# No default_response_class (e.g. ORJSONResponse) on purpose: routes declare
+# a response_model, and with the default class FastAPI serializes those
+# through Pydantic's Rust core straight to JSON bytes. Setting any custom
+# class app-wide turns that fast path off (and ORJSONResponse is deprecated).
 app = FastAPI(
     title="Apollo API",
     description="AI-Powered Socratic Goal Mentor Platform",
@@ -35,6 +53,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Goal trees compress well; streamed responses are left alone so events
+# reach the client as they are produced
+if settings.gzip_enabled:
+    app.add_middleware(
+        GZipMiddleware,
+        minimum_size=settings.gzip_minimum_size,
+        compresslevel=settings.gzip_compresslevel,
+        exclude_content_types=DEFAULT_EXCLUDED_CONTENT_TYPES + ("application/x-ndjson",),
+    )
+
+# Per-route latency, DB/LLM/hashing spans and opt-in profiling
+app.add_middleware(MetricsMiddleware)
+
 
 @app.get("/")
 async def root():
@@ -55,10 +86,24 @@ async def health_check():
     }
 
 
+@app.get("/stats")
+async def stats():
+    """Runtime statistics reported by shared components (LLM pool, caches, ...)"""
+    return collect()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics: request latency histograms, spans and component stats"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
 # TODO: Register routers when implemented
-from app.routers import auth, goals
+from app.routers import auth, goals, ai, progress, search
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(goals.router, prefix="/api/goals", tags=["Goals"])
-# app.include_router(ai.router, prefix="/api/chat", tags=["AI Mentor"])
+app.include_router(ai.router, prefix="/api/chat", tags=["AI Mentor"])
+app.include_router(progress.router, prefix="/api/progress", tags=["Progress"])
+app.include_router(search.router, prefix="/api/search", tags=["Search"])
 # app.include_router(community.router, prefix="/api/forums", tags=["Community"])
 # app.include_router(notes.router, prefix="/api/notes", tags=["Notes"])
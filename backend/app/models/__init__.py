@@ -1 +1,11 @@
 """SQLAlchemy ORM Models"""
+# Importing the package registers every table on Base.metadata (used by
+# create_tables and Alembic autogenerate)
+from app.models.archive import archived_actions, archived_goals, archived_subgoals
+from app.models.base import Base
+from app.models.chat import ChatMessage, Conversation
+from app.models.goals import Actions, Goal, MicroStep, SubGoal
+from app.models.jobs import GenerationJob
+from app.models.progress import UserProgress
+from app.models.search import SearchEntry
+from app.models.user import User
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, DateTime, Index, Table, func
+
+from app.models.base import Base
+from app.models.goals import Actions, Goal, SubGoal
+
+
+def _archive_table(source: Table, *indexes: Index) -> Table:
+    """
+    Copy of a goal-tree table for archived rows: the same columns and IDs,
+    without foreign keys, plus archived_at.
+    """
+    columns = [
+        Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable, autoincrement=False)
+        for column in source.columns
+    ]
+    return Table(
+        f"archived_{source.name}",
+        Base.metadata,
+        *columns,
+        Column("archived_at", DateTime, nullable=False, server_default=func.now()),
+        *indexes,
+    )
+
+
+# Archived goal trees, moved out of the live tables by app.services.archive so
+# their rows and index entries stop weighing on everyday queries
+archived_goals = _archive_table(Goal.__table__, Index("ix_archived_goals_user_id", "user_id"))
+archived_subgoals = _archive_table(SubGoal.__table__, Index("ix_archived_subgoals_goal_id", "goal_id"))
+archived_actions = _archive_table(Actions.__table__, Index("ix_archived_actions_subgoal_id", "subgoal_id"))
@@ -0,0 +1,54 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from sqlalchemy import Boolean, DateTime, ForeignKey, Index, Integer, String
+from sqlalchemy import Enum as SQLAlchemyEnum
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class ChatRole(Enum):
+    user = "User"
+    mentor = "Mentor"
+    emotional_support = "EmotionalSupport"
+
+class Conversation(Base):
+    """
+    One mentor conversation. Messages older than the recent window are folded
+    into `summary`; `summarized_through_id` is the last message folded in.
+    """
+    __tablename__ = "conversations"
+    __table_args__ = (Index("ix_conversations_user_id_updated_at", "user_id", "updated_at"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
+    goal_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("goals.id", ondelete="CASCADE"), index=True)
+    summary: Mapped[Optional[str]] = mapped_column(String)
+    summarized_through_id: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    summarized_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    message_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+class ChatMessage(Base):
+    __tablename__ = "chat_messages"
+    # Recent-window and history reads are range scans over (conversation_id, id)
+    __table_args__ = (Index("ix_chat_messages_conversation_id_id", "conversation_id", "id"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    conversation_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False
+    )
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
+    goal_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("goals.id", ondelete="CASCADE"))
+    action_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("actions.id", ondelete="SET NULL"))
+    role: Mapped[ChatRole] = mapped_column(SQLAlchemyEnum(ChatRole), nullable=False)
+    content: Mapped[str] = mapped_column(String, nullable=False)
+    # Estimated once on insert so assembling a context never re-counts history
+    token_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    triggered_micro_stepping: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
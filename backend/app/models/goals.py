@@ -1,12 +1,19 @@
 from enum import Enum
+from typing import Optional
 from app.models.base import Base 
-from sqlalchemy import Column, Integer, String, DateTime, Enum as SQLAlchemyEnum 
-from datetime import datetime
+from sqlalchemy import Integer, String, Date, DateTime, ForeignKey, Index, Enum as SQLAlchemyEnum
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from datetime import date, datetime
 
 class GoalStatus(Enum):
     active = "Active"
     completed = "Completed"
 
+class ActionStatus(Enum):
+    pending = "Pending"
+    in_progress = "InProgress"
+    completed = "Completed"
+
 class SubgoalCategory(Enum):
     skill = "Skill"
     mental = "Mental"
@@ -14,28 +21,72 @@ class SubgoalCategory(Enum):
 
 class Goal(Base):
     __tablename__ = "goals"
+    # Serves per-user lookups and keyset pagination over (created_at, id)
+    __table_args__ = (Index("ix_goals_user_id_created_at_id", "user_id", "created_at", "id"),)
     
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    user_id = Column(Integer, nullable=False)  # foreign key referencing users table 
-    title = Column(String, nullable=False) 
-    description = Column(String)
-    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
-    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
-    status = Column(SQLAlchemyEnum(GoalStatus), nullable=False, default=GoalStatus.completed)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
+    title: Mapped[str] = mapped_column(String, nullable=False)
+    description: Mapped[Optional[str]] = mapped_column(String)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    status: Mapped[GoalStatus] = mapped_column(SQLAlchemyEnum(GoalStatus), nullable=False, default=GoalStatus.completed)
+    # Bumped (with updated_at) by every change to the goal or its subgoals and
+    # actions; the goal's ETags and cached responses are keyed by it
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
+
+    # Progress counters, updated in the same transaction as every action
+    # status change (see ProgressService) so reads never aggregate actions
+    subgoal_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    action_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    completed_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_activity_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    current_streak: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    longest_streak: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_active_date: Mapped[Optional[date]] = mapped_column(Date)
+
+    # Relationships never lazy-load; load them explicitly (e.g. selectinload)
+    subgoals = relationship("SubGoal", back_populates="goal", order_by="SubGoal.id", lazy="raise", passive_deletes=True)
 
 class SubGoal(Base):
     __tablename__ = "subgoals"
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    goal_id = Column(Integer, nullable=False)  # foreign key referencing goals table 
-    title = Column(String, nullable=False) 
-    description = Column(String)
-    category = Column(SQLAlchemyEnum(SubgoalCategory), nullable=False)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    goal_id: Mapped[int] = mapped_column(Integer, ForeignKey("goals.id", ondelete="CASCADE"), nullable=False, index=True)
+    title: Mapped[str] = mapped_column(String, nullable=False)
+    description: Mapped[Optional[str]] = mapped_column(String)
+    category: Mapped[SubgoalCategory] = mapped_column(SQLAlchemyEnum(SubgoalCategory), nullable=False)
+    action_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    completed_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_activity_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+    goal = relationship("Goal", back_populates="subgoals", lazy="raise")
+    actions = relationship("Actions", back_populates="subgoal", order_by="[Actions.position, Actions.id]", lazy="raise", passive_deletes=True)
 
 class Actions(Base):
     __tablename__ = "actions"
 
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    subgoal_id = Column(Integer, nullable=False) # foreign key referencing subgoals table 
-    description = Column(String)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    subgoal_id: Mapped[int] = mapped_column(Integer, ForeignKey("subgoals.id", ondelete="CASCADE"), nullable=False, index=True)
+    description: Mapped[Optional[str]] = mapped_column(String)
+    estimated_minutes: Mapped[Optional[int]] = mapped_column(Integer)
+    status: Mapped[ActionStatus] = mapped_column(SQLAlchemyEnum(ActionStatus), nullable=False, default=ActionStatus.pending)
+    completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    # Order within the subgoal
+    position: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Bumped on every change; clients send the version they saw (optimistic locking)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
+    # Set once micro-steps have been generated (see MicroStepService)
+    micro_steps_generated_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+    subgoal = relationship("SubGoal", back_populates="actions", lazy="raise")
 
+class MicroStep(Base):
+    """A 5-10 minute step of an action, generated on demand."""
+    __tablename__ = "micro_steps"
 
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    action_id: Mapped[int] = mapped_column(Integer, ForeignKey("actions.id", ondelete="CASCADE"), nullable=False, index=True)
+    title: Mapped[str] = mapped_column(String, nullable=False)
+    # Order within the action
+    position: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,40 @@
+from datetime import datetime
+from enum import Enum
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String
+from sqlalchemy import Enum as SQLAlchemyEnum
+
+from app.models.base import Base
+
+
+class JobStatus(Enum):
+    queued = "Queued"
+    running = "Running"
+    succeeded = "Succeeded"
+    dead = "Dead"
+
+class GenerationJob(Base):
+    """Goal generation job, used when JOB_STORE=db."""
+    __tablename__ = "generation_jobs"
+    # Finds the in-flight job for a (user, prompt) and unfinished jobs on restart
+    __table_args__ = (
+        Index("ix_generation_jobs_dedup_key_status", "dedup_key", "status"),
+        # Finds queued jobs left behind by a process that died
+        Index("ix_generation_jobs_status_run_after", "status", "run_after"),
+    )
+
+    id = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    prompt = Column(String, nullable=False)
+    dedup_key = Column(String(64), nullable=False)
+    status = Column(SQLAlchemyEnum(JobStatus), nullable=False, default=JobStatus.queued)
+    attempts = Column(Integer, nullable=False, default=0)
+    goal_id = Column(Integer, ForeignKey("goals.id", ondelete="SET NULL"))
+    error = Column(String)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    # Renewed while a worker runs the job; a stale one means the worker died
+    heartbeat_at = Column(DateTime)
+    # A queued job is not due before this (set while a retry backs off)
+    run_after = Column(DateTime)
@@ -0,0 +1,20 @@
+import datetime as dt
+
+from sqlalchemy import Date, DateTime, ForeignKey, Integer, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class UserProgress(Base):
+    """Actions completed per user per day (UTC)."""
+    __tablename__ = "user_progress"
+    __table_args__ = (UniqueConstraint("user_id", "date", name="uq_user_progress_user_id_date"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
+    date: Mapped[dt.date] = mapped_column(Date, nullable=False)
+    actions_completed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    minutes_worked: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[dt.datetime] = mapped_column(DateTime, nullable=False, default=dt.datetime.utcnow)
+    updated_at: Mapped[dt.datetime] = mapped_column(DateTime, nullable=False, default=dt.datetime.utcnow, onupdate=dt.datetime.utcnow)
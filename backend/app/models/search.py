@@ -0,0 +1,75 @@
+from enum import Enum
+
+from sqlalchemy import DDL, ForeignKey, Index, Integer, String, UniqueConstraint, event
+from sqlalchemy import Enum as SQLAlchemyEnum
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class SearchKind(Enum):
+    goal = "Goal"
+    subgoal = "SubGoal"
+    action = "Action"
+
+class SearchEntry(Base):
+    """
+    Searchable text of one goal, subgoal or action, denormalized with its
+    owner so a search never joins the goal tree.
+
+    The full-text index lives outside the ORM because it is dialect specific:
+    on PostgreSQL a generated `tsv` tsvector column and pg_trgm trigrams of
+    `content`, both in GIN indexes that lead with `user_id` (btree_gin) so a
+    search only reads the user's own entries; on SQLite the
+    `search_entries_fts` FTS5 table kept in sync by triggers.
+    """
+    __tablename__ = "search_entries"
+    __table_args__ = (
+        UniqueConstraint("kind", "ref_id", name="uq_search_entries_kind_ref_id"),
+        Index("ix_search_entries_user_id", "user_id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
+    goal_id: Mapped[int] = mapped_column(Integer, ForeignKey("goals.id", ondelete="CASCADE"), nullable=False, index=True)
+    kind: Mapped[SearchKind] = mapped_column(SQLAlchemyEnum(SearchKind), nullable=False)
+    # ID of the goal, subgoal or action
+    ref_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    content: Mapped[str] = mapped_column(String, nullable=False)
+
+
+# Objects managed by these statements, ignored by Alembic autogenerate
+SEARCH_INDEX_OBJECTS = {"tsv", "ix_search_entries_user_id_tsv", "ix_search_entries_user_id_content_trgm"}
+SEARCH_FTS_TABLE = "search_entries_fts"
+
+POSTGRES_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # Lets the GIN indexes lead with the plain integer user_id
+    "CREATE EXTENSION IF NOT EXISTS btree_gin",
+    "ALTER TABLE search_entries ADD COLUMN tsv tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('english', content)) STORED",
+    "CREATE INDEX ix_search_entries_user_id_tsv ON search_entries USING gin (user_id, tsv)",
+    "CREATE INDEX ix_search_entries_user_id_content_trgm ON search_entries USING gin (user_id, content gin_trgm_ops)",
+]
+
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE search_entries_fts USING fts5("
+    "content, content='search_entries', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER search_entries_ai AFTER INSERT ON search_entries BEGIN "
+    "INSERT INTO search_entries_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER search_entries_ad AFTER DELETE ON search_entries BEGIN "
+    "INSERT INTO search_entries_fts(search_entries_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER search_entries_au AFTER UPDATE ON search_entries BEGIN "
+    "INSERT INTO search_entries_fts(search_entries_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+    "INSERT INTO search_entries_fts(rowid, content) VALUES (new.id, new.content); END",
+]
+
+# Also build the index when tables are created with create_all
+for statement in POSTGRES_SEARCH_DDL:
+    event.listen(SearchEntry.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(SearchEntry.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(
+    SearchEntry.__table__, "before_drop",
+    DDL(f"DROP TABLE IF EXISTS {SEARCH_FTS_TABLE}").execute_if(dialect="sqlite"),
+)
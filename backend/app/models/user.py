@@ -1,12 +1,18 @@
+from typing import Optional
 from app.models.base import Base 
-from sqlalchemy import Column, Integer, String, DateTime
-from datetime import datetime
+from sqlalchemy import Integer, String, Date, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import date, datetime
 
 class User(Base):
     __tablename__ = "users"
     
-    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    user_name = Column(String, unique=True, nullable=False) 
-    email = Column(String, unique=True, index=True, nullable=False) 
-    hashed_password = Column(String, nullable=False)  
-    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True, autoincrement=True)
+    user_name: Mapped[str] = mapped_column(String, unique=True, nullable=False)
+    email: Mapped[str] = mapped_column(String, unique=True, index=True, nullable=False)
+    hashed_password: Mapped[str] = mapped_column(String, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    # Days in a row with at least one completed action, kept up to date by ProgressService
+    current_streak: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    longest_streak: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_active_date: Mapped[Optional[date]] = mapped_column(Date)
@@ -1,4 +1,4 @@
-from typing import Generic, TypeVar, Type, Optional
+from typing import Any, Dict, Generic, TypeVar, Type, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select 
 from app.models.base import Base
@@ -17,6 +17,19 @@ class BaseRepository(Generic[ModelType]):
         await self.db.refresh(obj_in)
         return obj_in
 
+    async def update(self, obj: ModelType, values: Dict[str, Any]) -> ModelType:
+        """Applies attribute changes to a record, commits, and refreshes it."""
+        for field, value in values.items():
+            setattr(obj, field, value)
+        await self.db.commit()
+        await self.db.refresh(obj)
+        return obj
+
+    async def delete(self, obj: ModelType) -> None:
+        """Deletes a record and commits."""
+        await self.db.delete(obj)
+        await self.db.commit()
+
     async def get_by_id(self, id: int) -> Optional[ModelType]:
         """Fetches a single record by ID."""
         query = select(self.model).where(self.model.id == id)
@@ -0,0 +1,101 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.chat import ChatMessage, Conversation
+from app.models.goals import Actions, SubGoal
+from app.repositories.base import BaseRepository
+
+
+class ConversationRepository(BaseRepository[Conversation]):
+    def __init__(self, db: AsyncSession):
+        super().__init__(Conversation, db)
+
+    async def insert(self, conversation: Conversation) -> Conversation:
+        """Adds a conversation and flushes it to obtain its ID without committing."""
+        self.db.add(conversation)
+        await self.db.flush()
+        return conversation
+
+    async def add_messages(self, conversation_id: int, count: int) -> Tuple[int, int]:
+        """Bumps the message count atomically; returns (message_count, summarized_count)."""
+        result = await self.db.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation_id)
+            .values(message_count=Conversation.message_count + count, updated_at=datetime.utcnow())
+            .returning(Conversation.message_count, Conversation.summarized_count)
+        )
+        message_count, summarized_count = result.one()
+        return message_count, summarized_count
+
+    async def save_summary(
+        self, conversation_id: int, expected_through_id: int, summary: str, through_id: int, folded: int
+    ) -> bool:
+        """
+        Stores a new rolling summary, unless another worker already moved the
+        summary past `expected_through_id`. Returns whether it was stored.
+        """
+        result = await self.db.execute(
+            update(Conversation)
+            .where(
+                Conversation.id == conversation_id,
+                Conversation.summarized_through_id == expected_through_id,
+            )
+            .values(
+                summary=summary,
+                summarized_through_id=through_id,
+                summarized_count=Conversation.summarized_count + folded,
+            )
+            .returning(Conversation.id)
+        )
+        stored = result.scalar_one_or_none() is not None
+        await self.db.commit()
+        return stored
+
+
+class ChatMessageRepository(BaseRepository[ChatMessage]):
+    def __init__(self, db: AsyncSession):
+        super().__init__(ChatMessage, db)
+
+    async def recent(self, conversation_id: int, after_id: int, limit: int) -> List[ChatMessage]:
+        """Newest messages after `after_id`, newest first; one index range scan."""
+        query = (
+            select(ChatMessage)
+            .where(ChatMessage.conversation_id == conversation_id, ChatMessage.id > after_id)
+            .order_by(ChatMessage.id.desc())
+            .limit(limit)
+        )
+        result = await self.db.execute(query)
+        return list(result.scalars().all())
+
+    async def oldest(self, conversation_id: int, after_id: int, limit: int) -> List[ChatMessage]:
+        """Oldest messages after `after_id`, oldest first (the next ones to summarize)."""
+        query = (
+            select(ChatMessage)
+            .where(ChatMessage.conversation_id == conversation_id, ChatMessage.id > after_id)
+            .order_by(ChatMessage.id)
+            .limit(limit)
+        )
+        result = await self.db.execute(query)
+        return list(result.scalars().all())
+
+    async def history(self, conversation_id: int, limit: int, before: Optional[int] = None) -> List[ChatMessage]:
+        """A page of messages newest first, keyset-paginated on id."""
+        query = select(ChatMessage).where(ChatMessage.conversation_id == conversation_id)
+        if before is not None:
+            query = query.where(ChatMessage.id < before)
+        query = query.order_by(ChatMessage.id.desc()).limit(limit)
+        result = await self.db.execute(query)
+        return list(result.scalars().all())
+
+    async def get_goal_action(self, action_id: int, goal_id: int) -> Optional[Actions]:
+        """Fetches an action only if it belongs to the given goal."""
+        query = (
+            select(Actions)
+            .join(SubGoal, SubGoal.id == Actions.subgoal_id)
+            .where(Actions.id == action_id, SubGoal.goal_id == goal_id)
+        )
+        result = await self.db.execute(query)
+        return result.scalars().first()
@@ -1,11 +1,244 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from app.models.goals import Goal, SubGoal, Actions 
+from sqlalchemy import select, insert, update, delete, case, func, literal, or_, tuple_
+from sqlalchemy.orm import selectinload
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from app.models.goals import Goal, SubGoal, Actions, MicroStep, GoalStatus
+from app.models.archive import archived_goals, archived_subgoals, archived_actions
+from app.models.chat import Conversation, ChatMessage
+from app.models.jobs import GenerationJob
+from app.models.search import SearchEntry
 from app.repositories.base import BaseRepository
+from app.repositories.search import SearchRepository
 
 class GoalRepository(BaseRepository[Goal]):
+    # Columns of a flattened goal tree row, as streamed by stream_trees
+    TREE_COLUMNS = (
+        Goal.id.label("goal_id"), Goal.title.label("goal_title"), Goal.description.label("goal_description"),
+        Goal.status.label("goal_status"), Goal.created_at.label("goal_created_at"),
+        SubGoal.id.label("subgoal_id"), SubGoal.title.label("subgoal_title"),
+        SubGoal.description.label("subgoal_description"), SubGoal.category.label("subgoal_category"),
+        Actions.id.label("action_id"), Actions.description.label("action_description"),
+        Actions.estimated_minutes.label("action_estimated_minutes"), Actions.status.label("action_status"),
+        Actions.completed_at.label("action_completed_at"), Actions.position.label("action_position"),
+    )
+
     def __init__(self, db:AsyncSession):
-        super().__init__(Goal, db) 
+        super().__init__(Goal, db)
+
+    async def get_tree(self, goal_id: int) -> Optional[Goal]:
+        """Fetches a goal with its subgoals and their actions in three queries."""
+        query = (
+            select(Goal)
+            .where(Goal.id == goal_id)
+            .options(selectinload(Goal.subgoals).selectinload(SubGoal.actions))
+        )
+        result = await self.db.execute(query)
+        return result.scalars().first()
+
+    async def get_version(self, goal_id: int) -> Optional[Any]:
+        """A goal's owner, version and updated_at, without loading anything else."""
+        query = select(Goal.user_id, Goal.version, Goal.updated_at).where(Goal.id == goal_id)
+        result = await self.db.execute(query)
+        return result.first()
+
+    async def bump_version(self, goal_id: int) -> None:
+        """Records a change to a goal's tree (new version and updated_at). Does not commit."""
+        await self.db.execute(
+            update(Goal).where(Goal.id == goal_id)
+            .values(version=Goal.version + 1, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+
+    async def list_for_user(
+        self,
+        user_id: int,
+        limit: int,
+        status: Optional[GoalStatus] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+    ) -> List[Goal]:
+        """
+        Lists a user's goals newest first using keyset pagination.
+
+        `after` is the (created_at, id) of the last goal on the previous page, so
+        every page is an index range scan no matter how deep it is.
+        """
+        query = select(Goal).where(Goal.user_id == user_id)
+        if status is not None:
+            query = query.where(Goal.status == status)
+        if after is not None:
+            query = query.where(tuple_(Goal.created_at, Goal.id) < tuple_(*after))
+        query = query.order_by(Goal.created_at.desc(), Goal.id.desc()).limit(limit)
+        result = await self.db.execute(query)
+        return list(result.scalars().all())
+
+    async def insert_goal(self, goal: Goal) -> Goal:
+        """Adds a goal and flushes it to obtain its ID without committing."""
+        self.db.add(goal)
+        await self.db.flush()
+        return goal
+
+    async def insert_goals(self, goals: List[Dict]) -> List[int]:
+        """Inserts goal rows with one multi-row INSERT ... RETURNING, preserving order."""
+        if not goals:
+            return []
+        query = insert(Goal).returning(Goal.id, sort_by_parameter_order=True)
+        result = await self.db.execute(query, goals)
+        return list(result.scalars().all())
+
+    async def insert_subgoals(self, goal_id: int, subgoals: List[Dict]) -> List[int]:
+        """Inserts subgoals with one multi-row INSERT ... RETURNING, preserving order."""
+        return await self.insert_subgoal_rows([{**subgoal, "goal_id": goal_id} for subgoal in subgoals])
+
+    async def insert_subgoal_rows(self, subgoals: List[Dict]) -> List[int]:
+        """Like insert_subgoals, for rows that each carry their goal_id."""
+        if not subgoals:
+            return []
+        query = insert(SubGoal).returning(SubGoal.id, sort_by_parameter_order=True)
+        result = await self.db.execute(query, subgoals)
+        return list(result.scalars().all())
+
+    async def insert_actions(self, actions: List[Dict]) -> None:
+        """Inserts action rows (each carrying its subgoal_id) as one batch."""
+        if actions:
+            await self.db.execute(insert(Actions), actions)
+
+    async def create_tree(
+        self, goal: Goal, subgoals: List[Dict], actions: List[List[Dict]]
+    ) -> Goal:
+        """
+        Creates a goal with all of its subgoals and actions in one transaction.
+
+        `actions[i]` holds the action rows belonging to `subgoals[i]`. Nothing is
+        committed unless every insert succeeds. The progress counters start out
+        matching the inserted rows, and the search index is filled in the same
+        transaction.
+        """
+        try:
+            goal.subgoal_count = len(subgoals)
+            goal.action_count = sum(len(subgoal_actions) for subgoal_actions in actions)
+            goal = await self.insert_goal(goal)
+            subgoal_ids = await self.insert_subgoals(goal.id, [
+                {**subgoal, "action_count": len(subgoal_actions)}
+                for subgoal, subgoal_actions in zip(subgoals, actions, strict=True)
+            ])
+            await self.insert_actions([
+                {**action, "subgoal_id": subgoal_id, "position": position}
+                for subgoal_id, subgoal_actions in zip(subgoal_ids, actions, strict=True)
+                for position, action in enumerate(subgoal_actions)
+            ])
+            await SearchRepository(self.db).index_goals([goal.id])
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+        return goal
+
+    async def stream_trees(self, user_id: int, batch_size: int) -> AsyncIterator[Any]:
+        """
+        Streams a user's goal trees as flattened rows (TREE_COLUMNS) in tree
+        order, through a server-side cursor fetching `batch_size` rows at a
+        time. Goals without subgoals and subgoals without actions come
+        through once, with NULLs for the missing levels.
+        """
+        query = (
+            select(*self.TREE_COLUMNS)
+            .select_from(Goal)
+            .outerjoin(SubGoal, SubGoal.goal_id == Goal.id)
+            .outerjoin(Actions, Actions.subgoal_id == SubGoal.id)
+            .where(Goal.user_id == user_id)
+            .order_by(Goal.id, SubGoal.id, Actions.position, Actions.id)
+            .execution_options(yield_per=batch_size)
+        )
+        result = await self.db.stream(query)
+        async for row in result:
+            yield row
+
+    async def delete_trees(self, goal_ids: List[int]) -> int:
+        """
+        Deletes goals with their subgoals, actions, micro-steps, search entries
+        and chats using one set-based DELETE per table; returns the goals deleted.
+
+        The foreign keys cascade on PostgreSQL, but SQLite doesn't enforce
+        them, so the children are deleted explicitly. Does not commit.
+        """
+        if not goal_ids:
+            return 0
+        subgoal_ids = select(SubGoal.id).where(SubGoal.goal_id.in_(goal_ids))
+        action_ids = select(Actions.id).where(Actions.subgoal_id.in_(subgoal_ids))
+        await self.db.execute(
+            update(GenerationJob).where(GenerationJob.goal_id.in_(goal_ids)).values(goal_id=None)
+            .execution_options(synchronize_session=False)
+        )
+        for model in (ChatMessage, Conversation, SearchEntry):
+            await self.db.execute(
+                delete(model).where(model.goal_id.in_(goal_ids)).execution_options(synchronize_session=False)
+            )
+        await self.db.execute(
+            delete(MicroStep).where(MicroStep.action_id.in_(action_ids)).execution_options(synchronize_session=False)
+        )
+        await self.db.execute(
+            delete(Actions).where(Actions.subgoal_id.in_(subgoal_ids)).execution_options(synchronize_session=False)
+        )
+        await self.db.execute(
+            delete(SubGoal).where(SubGoal.goal_id.in_(goal_ids)).execution_options(synchronize_session=False)
+        )
+        result = await self.db.execute(
+            delete(Goal).where(Goal.id.in_(goal_ids)).execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+    async def archive_trees(self, goal_ids: List[int]) -> int:
+        """
+        Moves goals with their subgoals and actions into the archive tables
+        with INSERT ... SELECT, then deletes them; returns the goals moved.
+        Conversations about the goals are kept, detached from them; micro-steps
+        can be generated again and are dropped. Does not commit.
+        """
+        if not goal_ids:
+            return 0
+        now = datetime.utcnow()
+        subgoal_ids = select(SubGoal.id).where(SubGoal.goal_id.in_(goal_ids))
+        for archive, model, condition in (
+            (archived_goals, Goal, Goal.id.in_(goal_ids)),
+            (archived_subgoals, SubGoal, SubGoal.goal_id.in_(goal_ids)),
+            (archived_actions, Actions, Actions.subgoal_id.in_(subgoal_ids)),
+        ):
+            columns = [column.name for column in model.__table__.columns]
+            await self.db.execute(insert(archive).from_select(
+                columns + ["archived_at"],
+                select(*model.__table__.columns, literal(now, archive.c.archived_at.type)).where(condition),
+            ))
+        await self.db.execute(
+            update(ChatMessage).where(ChatMessage.goal_id.in_(goal_ids)).values(goal_id=None, action_id=None)
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.execute(
+            update(Conversation).where(Conversation.goal_id.in_(goal_ids)).values(goal_id=None)
+            .execution_options(synchronize_session=False)
+        )
+        return await self.delete_trees(goal_ids)
+
+    async def archivable_ids(
+        self,
+        limit: int,
+        completed: bool = False,
+        inactive_before: Optional[datetime] = None,
+        user_id: Optional[int] = None,
+    ) -> List[int]:
+        """IDs of up to `limit` goals that are completed and/or have had no activity since `inactive_before`."""
+        conditions = []
+        if completed:
+            conditions.append(Goal.status == GoalStatus.completed)
+        if inactive_before is not None:
+            conditions.append(func.coalesce(Goal.last_activity_at, Goal.updated_at) < inactive_before)
+        if not conditions:
+            return []
+        query = select(Goal.id).where(or_(*conditions))
+        if user_id is not None:
+            query = query.where(Goal.user_id == user_id)
+        result = await self.db.execute(query.order_by(Goal.id).limit(limit))
+        return list(result.scalars().all())
 
 
 class SubgoalRepository(BaseRepository[SubGoal]):
@@ -13,5 +246,110 @@ class SubgoalRepository(BaseRepository[SubGoal]):
         super().__init__(SubGoal, db)
 
 class ActionRepository(BaseRepository[Actions]):
+    # Columns a batch update may set, and the ones it returns
+    BATCH_COLUMNS = ("description", "status", "completed_at", "position")
+    RETURNED_COLUMNS = (
+        Actions.id, Actions.subgoal_id, Actions.description, Actions.estimated_minutes,
+        Actions.status, Actions.completed_at, Actions.position, Actions.version,
+    )
+
     def __init__(self, db:AsyncSession):
-        super().__init__(Actions, db) 
+        super().__init__(Actions, db)
+
+    async def get_for_goal(self, goal_id: int, action_ids: List[int]) -> List[Actions]:
+        """Fetches the given actions that belong to a goal."""
+        query = (
+            select(Actions)
+            .join(SubGoal, SubGoal.id == Actions.subgoal_id)
+            .where(SubGoal.goal_id == goal_id, Actions.id.in_(action_ids))
+        )
+        result = await self.db.execute(query)
+        return list(result.scalars().all())
+
+    async def update_batch(self, changes: List[Dict[str, Any]]) -> List[Any]:
+        """
+        Applies per-action changes with a single UPDATE ... SET col = CASE id
+        ... END and returns the updated rows.
+
+        Each change has the action's `id`, the `version` the client last saw
+        and any of BATCH_COLUMNS. Rows whose version has moved on are left
+        alone and are missing from the result. Does not commit.
+        """
+        ids = [change["id"] for change in changes]
+        values: Dict[str, Any] = {"version": Actions.version + 1}
+        for name in self.BATCH_COLUMNS:
+            column = getattr(Actions, name)
+            whens = {
+                change["id"]: literal(change[name], column.type)
+                for change in changes if name in change
+            }
+            if whens:
+                values[name] = case(whens, value=Actions.id, else_=column)
+        expected_version = case({change["id"]: change["version"] for change in changes}, value=Actions.id)
+        query = (
+            update(Actions)
+            .where(Actions.id.in_(ids), Actions.version == expected_version)
+            .values(values)
+            .returning(*self.RETURNED_COLUMNS)
+            .execution_options(synchronize_session=False)
+        )
+        result = await self.db.execute(query)
+        return list(result.all())
+
+    async def get_with_context(self, action_id: int) -> Optional[Any]:
+        """An action with its goal's ID and title and its subgoal's title."""
+        query = (
+            select(Actions, Goal.id.label("goal_id"), Goal.title.label("goal_title"), SubGoal.title.label("subgoal_title"))
+            .join(SubGoal, SubGoal.id == Actions.subgoal_id)
+            .join(Goal, Goal.id == SubGoal.goal_id)
+            .where(Actions.id == action_id)
+        )
+        result = await self.db.execute(query)
+        return result.first()
+
+    async def next_sibling(self, action: Actions) -> Optional[Actions]:
+        """The action after this one in its subgoal, if any."""
+        query = (
+            select(Actions)
+            .where(
+                Actions.subgoal_id == action.subgoal_id,
+                tuple_(Actions.position, Actions.id) > tuple_(action.position, action.id),
+            )
+            .order_by(Actions.position, Actions.id)
+            .limit(1)
+        )
+        result = await self.db.execute(query)
+        return result.scalar_one_or_none()
+
+    async def claim_micro_steps(self, action_id: int, now: datetime) -> bool:
+        """
+        Marks an action's micro-steps as generated, unless another request got
+        there first; only the request that claims the action inserts them.
+        Does not commit.
+        """
+        query = (
+            update(Actions)
+            .where(Actions.id == action_id, Actions.micro_steps_generated_at.is_(None))
+            .values(micro_steps_generated_at=now)
+            .returning(Actions.id)
+            .execution_options(synchronize_session=False)
+        )
+        result = await self.db.execute(query)
+        return result.scalar_one_or_none() is not None
+
+
+class MicroStepRepository(BaseRepository[MicroStep]):
+    def __init__(self, db:AsyncSession):
+        super().__init__(MicroStep, db)
+
+    async def list_for_action(self, action_id: int) -> List[MicroStep]:
+        query = select(MicroStep).where(MicroStep.action_id == action_id).order_by(MicroStep.position, MicroStep.id)
+        result = await self.db.execute(query)
+        return list(result.scalars().all())
+
+    async def insert_for_action(self, action_id: int, titles: List[str]) -> List[MicroStep]:
+        """Adds an action's micro-steps in the given order. Does not commit."""
+        steps = [MicroStep(action_id=action_id, title=title, position=position) for position, title in enumerate(titles)]
+        self.db.add_all(steps)
+        await self.db.flush()
+        return steps
@@ -0,0 +1,230 @@
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.goals import Actions, ActionStatus, Goal, SubGoal
+from app.models.progress import UserProgress
+from app.models.user import User
+
+# Counter updates use SQL expressions, so there is nothing for the session to sync
+_NO_SYNC = {"synchronize_session": False}
+
+
+def _streak_values(model, today: date) -> Dict:
+    """SET clause extending a streak when `today` follows the last active day."""
+    current = case(
+        (model.last_active_date == today, model.current_streak),
+        (model.last_active_date == today - timedelta(days=1), model.current_streak + 1),
+        else_=1,
+    )
+    return {
+        "current_streak": current,
+        "longest_streak": case((current > model.longest_streak, current), else_=model.longest_streak),
+        "last_active_date": today,
+    }
+
+
+def _as_date(value) -> date:
+    # func.date() comes back as a string on SQLite
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+class ProgressRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_goal_action(self, action_id: int, goal_id: int) -> Optional[Tuple[Actions, int]]:
+        """Fetches an action of a goal with the goal's owner, or None."""
+        query = (
+            select(Actions, Goal.user_id)
+            .join(SubGoal, SubGoal.id == Actions.subgoal_id)
+            .join(Goal, Goal.id == SubGoal.goal_id)
+            .where(Actions.id == action_id, SubGoal.goal_id == goal_id)
+        )
+        result = await self.db.execute(query)
+        row = result.first()
+        if row is None:
+            return None
+        action, owner_id = row
+        return action, owner_id
+
+    async def set_action_status(
+        self, action_id: int, expected: ActionStatus, status: ActionStatus, completed_at: Optional[datetime]
+    ) -> bool:
+        """
+        Changes an action's status only if it still has the `expected` status,
+        so concurrent toggles can't both apply a counter delta.
+        """
+        result = await self.db.execute(
+            update(Actions)
+            .where(Actions.id == action_id, Actions.status == expected)
+            .values(status=status, completed_at=completed_at, version=Actions.version + 1)
+            .returning(Actions.id)
+            .execution_options(**_NO_SYNC)
+        )
+        return result.scalar_one_or_none() is not None
+
+    async def add_completed(self, goal_id: int, deltas: Dict[int, int], completed: bool, now: datetime) -> None:
+        """
+        Applies completed-count deltas ({subgoal_id: delta}) to a goal's
+        subgoals in one UPDATE and their sum to the goal. When anything was
+        `completed`, last activity moves to `now` and the goal's streak extends.
+        """
+        if not deltas:
+            return
+        subgoal_values: Dict[str, Any] = {
+            "completed_count": SubGoal.completed_count + case(deltas, value=SubGoal.id, else_=0)
+        }
+        goal_values: Dict[str, Any] = {"completed_count": Goal.completed_count + sum(deltas.values())}
+        if completed:
+            completed_ids = [subgoal_id for subgoal_id, delta in deltas.items() if delta > 0]
+            subgoal_values["last_activity_at"] = case(
+                (SubGoal.id.in_(completed_ids), now), else_=SubGoal.last_activity_at
+            )
+            goal_values.update(last_activity_at=now, **_streak_values(Goal, now.date()))
+        await self.db.execute(
+            update(SubGoal)
+            .where(SubGoal.id.in_(list(deltas)))
+            .values(subgoal_values)
+            .execution_options(**_NO_SYNC)
+        )
+        await self.db.execute(
+            update(Goal).where(Goal.id == goal_id).values(goal_values).execution_options(**_NO_SYNC)
+        )
+
+    async def add_daily_progress(self, user_id: int, day: date, delta: int, minutes: int) -> None:
+        """Applies a completion delta to the user's day, creating the row on a first completion."""
+        values = {
+            "actions_completed": UserProgress.actions_completed + delta,
+            "minutes_worked": UserProgress.minutes_worked + delta * minutes,
+            "updated_at": datetime.utcnow(),
+        }
+        query = (
+            update(UserProgress)
+            .where(UserProgress.user_id == user_id, UserProgress.date == day)
+            .values(values)
+            .returning(UserProgress.id)
+            .execution_options(**_NO_SYNC)
+        )
+        result = await self.db.execute(query)
+        if result.first() is not None or delta < 0:
+            return
+        try:
+            async with self.db.begin_nested():
+                await self.db.execute(insert(UserProgress).values(
+                    user_id=user_id, date=day, actions_completed=delta, minutes_worked=delta * minutes
+                ))
+        except IntegrityError:
+            # Another request created today's row first
+            await self.db.execute(query)
+
+    async def extend_user_streak(self, user_id: int, today: date) -> None:
+        await self.db.execute(
+            update(User).where(User.id == user_id).values(_streak_values(User, today)).execution_options(**_NO_SYNC)
+        )
+
+    async def get_progress(self, goal_id: int) -> Optional[Tuple[Goal, List[SubGoal]]]:
+        """A goal and its subgoals, counters only; never touches actions."""
+        goal = (await self.db.execute(select(Goal).where(Goal.id == goal_id))).scalars().first()
+        if goal is None:
+            return None
+        subgoals = await self.db.execute(select(SubGoal).where(SubGoal.goal_id == goal_id).order_by(SubGoal.id))
+        return goal, list(subgoals.scalars().all())
+
+    async def get_day(self, user_id: int, day: date) -> Optional[UserProgress]:
+        result = await self.db.execute(
+            select(UserProgress).where(UserProgress.user_id == user_id, UserProgress.date == day)
+        )
+        return result.scalars().first()
+
+    async def rebuild_counters(self, user_id: int, goal_ids: Optional[List[int]] = None) -> None:
+        """
+        Recomputes the subgoal and goal counters of a user's goals (or just
+        `goal_ids`) from their actions, bumping those goals' versions.
+        """
+        goals = Goal.user_id == user_id
+        if goal_ids is not None:
+            goals = goals & Goal.id.in_(goal_ids)
+        subgoal_actions = select(func.count(Actions.id)).where(Actions.subgoal_id == SubGoal.id)
+        await self.db.execute(
+            update(SubGoal)
+            .where(SubGoal.goal_id.in_(select(Goal.id).where(goals)))
+            .values(
+                action_count=subgoal_actions.scalar_subquery(),
+                completed_count=subgoal_actions.where(Actions.status == ActionStatus.completed).scalar_subquery(),
+                last_activity_at=select(func.max(Actions.completed_at))
+                .where(Actions.subgoal_id == SubGoal.id)
+                .scalar_subquery(),
+            )
+            .execution_options(**_NO_SYNC)
+        )
+
+        def from_subgoals(column):
+            return select(column).where(SubGoal.goal_id == Goal.id).scalar_subquery()
+
+        await self.db.execute(
+            update(Goal)
+            .where(goals)
+            .values(
+                subgoal_count=from_subgoals(func.count(SubGoal.id)),
+                action_count=from_subgoals(func.coalesce(func.sum(SubGoal.action_count), 0)),
+                completed_count=from_subgoals(func.coalesce(func.sum(SubGoal.completed_count), 0)),
+                last_activity_at=from_subgoals(func.max(SubGoal.last_activity_at)),
+                version=Goal.version + 1,
+                updated_at=datetime.utcnow(),
+            )
+            .execution_options(**_NO_SYNC)
+        )
+
+    async def completion_days_by_goal(
+        self, user_id: int, goal_ids: Optional[List[int]] = None
+    ) -> Dict[int, List[date]]:
+        """{goal_id: sorted distinct days with a completed action} for every goal of the user, or `goal_ids`."""
+        goals = Goal.user_id == user_id
+        if goal_ids is not None:
+            goals = goals & Goal.id.in_(goal_ids)
+        days: Dict[int, List[date]] = {
+            goal_id: [] for goal_id in (await self.db.execute(select(Goal.id).where(goals))).scalars().all()
+        }
+        result = await self.db.execute(
+            select(SubGoal.goal_id, func.date(Actions.completed_at))
+            .join(SubGoal, SubGoal.id == Actions.subgoal_id)
+            .join(Goal, Goal.id == SubGoal.goal_id)
+            .where(goals, Actions.completed_at.is_not(None))
+            .distinct()
+        )
+        for goal_id, day in result.all():
+            days[goal_id].append(_as_date(day))
+        for goal_days in days.values():
+            goal_days.sort()
+        return days
+
+    async def rebuild_daily_progress(self, user_id: int) -> List[date]:
+        """Replaces the user's daily rows with totals from completed actions; returns the active days."""
+        result = await self.db.execute(
+            select(
+                func.date(Actions.completed_at),
+                func.count(Actions.id),
+                func.coalesce(func.sum(Actions.estimated_minutes), 0),
+            )
+            .join(SubGoal, SubGoal.id == Actions.subgoal_id)
+            .join(Goal, Goal.id == SubGoal.goal_id)
+            .where(Goal.user_id == user_id, Actions.completed_at.is_not(None))
+            .group_by(func.date(Actions.completed_at))
+        )
+        rows = [
+            {"user_id": user_id, "date": _as_date(day), "actions_completed": count, "minutes_worked": minutes}
+            for day, count, minutes in result.all()
+        ]
+        await self.db.execute(delete(UserProgress).where(UserProgress.user_id == user_id))
+        if rows:
+            await self.db.execute(insert(UserProgress), rows)
+        return sorted(row["date"] for row in rows)
+
+    async def set_streaks(self, model, rows: List[Dict]) -> None:
+        """Bulk UPDATE by primary key of current_streak/longest_streak/last_active_date."""
+        if rows:
+            await self.db.execute(update(model), rows)
@@ -0,0 +1,161 @@
+import re
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import (
+    ColumnClause,
+    case,
+    cast,
+    column,
+    delete,
+    func,
+    insert,
+    literal,
+    literal_column,
+    or_,
+    select,
+    table,
+    tuple_,
+    union_all,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.goals import Actions, Goal, SubGoal
+from app.models.search import SEARCH_FTS_TABLE, SearchEntry, SearchKind
+
+_WORDS = re.compile(r"\w+", re.UNICODE)
+
+_COLUMNS = ["user_id", "goal_id", "kind", "ref_id", "content"]
+
+# The FTS5 table (SQLite only); its name doubles as the column for MATCH and bm25()
+_fts = table(SEARCH_FTS_TABLE, column("rowid"))
+_fts_column: ColumnClause[Any] = literal_column(SEARCH_FTS_TABLE)
+
+
+def _content(title, description):
+    """Title plus description, without repeating a description that just copies the title."""
+    return case(
+        (or_(description.is_(None), description == title), title),
+        else_=title + " " + description,
+    )
+
+
+def _kind(kind: SearchKind):
+    # Cast, since PostgreSQL would otherwise type the parameter as text in a UNION
+    return cast(literal(kind, SearchEntry.kind.type), SearchEntry.kind.type)
+
+
+def _fts_query(query: str) -> Optional[str]:
+    """FTS5 query matching every word of `query` as a prefix, with user input quoted."""
+    words = _WORDS.findall(query)
+    return " ".join(f'"{word}"*' for word in words) if words else None
+
+
+class SearchRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    @property
+    def dialect(self) -> str:
+        return self.db.get_bind().dialect.name
+
+    async def index_goals(self, goal_ids: List[int]) -> None:
+        """
+        Adds the entries of new goals and everything under them, with a
+        single INSERT ... SELECT over the three tables. The goals must not
+        have entries yet.
+        """
+        if not goal_ids:
+            return
+        in_goals = Goal.id.in_(goal_ids)
+        await self.db.execute(insert(SearchEntry).from_select(_COLUMNS, union_all(
+            select(
+                Goal.user_id, Goal.id, _kind(SearchKind.goal), Goal.id,
+                _content(Goal.title, Goal.description),
+            ).where(in_goals),
+            select(
+                Goal.user_id, Goal.id, _kind(SearchKind.subgoal), SubGoal.id,
+                _content(SubGoal.title, SubGoal.description),
+            ).join(Goal, Goal.id == SubGoal.goal_id).where(in_goals),
+            self._action_entries(in_goals),
+        )))
+
+    async def reindex_actions(self, action_ids: List[int]) -> None:
+        """Refreshes the entries of edited actions."""
+        if not action_ids:
+            return
+        await self.db.execute(delete(SearchEntry).where(
+            SearchEntry.kind == SearchKind.action, SearchEntry.ref_id.in_(action_ids)
+        ))
+        await self.db.execute(insert(SearchEntry).from_select(
+            _COLUMNS, self._action_entries(Actions.id.in_(action_ids))
+        ))
+
+    def _action_entries(self, condition):
+        return (
+            select(
+                Goal.user_id, Goal.id, _kind(SearchKind.action), Actions.id,
+                Actions.description,
+            )
+            .join(SubGoal, SubGoal.id == Actions.subgoal_id)
+            .join(Goal, Goal.id == SubGoal.goal_id)
+            .where(condition, Actions.description.is_not(None))
+        )
+
+    async def search(
+        self, user_id: int, query: str, limit: int, after: Optional[Tuple[float, int]] = None
+    ) -> List[Any]:
+        """
+        A user's entries matching `query`, best first, as rows of
+        (id, kind, ref_id, goal_id, content, rank). `after` is the (rank, id)
+        of the last row of the previous page.
+        """
+        if self.dialect == "postgresql":
+            ranked = self._postgres_matches(user_id, query)
+        elif self.dialect == "sqlite":
+            ranked = self._sqlite_matches(user_id, query)
+        else:
+            ranked = self._like_matches(user_id, query)
+        if ranked is None:
+            return []
+        ranked = ranked.subquery()
+        page = select(ranked)
+        if after is not None:
+            page = page.where(tuple_(ranked.c.rank, ranked.c.id) < tuple_(*after))
+        page = page.order_by(ranked.c.rank.desc(), ranked.c.id.desc()).limit(limit)
+        result = await self.db.execute(page)
+        return list(result.all())
+
+    def _entry_columns(self):
+        return SearchEntry.id, SearchEntry.kind, SearchEntry.ref_id, SearchEntry.goal_id, SearchEntry.content
+
+    def _postgres_matches(self, user_id: int, query: str):
+        # Full-text matches through the (user_id, tsv) GIN index, typo-tolerant
+        # ones through the (user_id, trigram) one; both scans stay within the
+        # user's entries. Rank by whichever scores higher
+        tsquery = func.websearch_to_tsquery("english", query)
+        tsv: ColumnClause[Any] = literal_column("search_entries.tsv")
+        rank = func.greatest(func.ts_rank_cd(tsv, tsquery), func.similarity(SearchEntry.content, query))
+        return select(*self._entry_columns(), rank.label("rank")).where(
+            SearchEntry.user_id == user_id,
+            or_(tsv.op("@@")(tsquery), SearchEntry.content.op("%")(query)),
+        )
+
+    def _sqlite_matches(self, user_id: int, query: str):
+        match = _fts_query(query)
+        if match is None:
+            return None
+        # bm25() is lower for better matches
+        rank = (-func.bm25(_fts_column)).label("rank")
+        return (
+            select(*self._entry_columns(), rank)
+            .select_from(_fts)
+            .join(SearchEntry, SearchEntry.id == _fts.c.rowid)
+            .where(_fts_column.op("MATCH")(match), SearchEntry.user_id == user_id)
+        )
+
+    def _like_matches(self, user_id: int, query: str):
+        # Unindexed fallback for other databases
+        return select(*self._entry_columns(), literal(1.0).label("rank")).where(
+            SearchEntry.user_id == user_id, SearchEntry.content.ilike(f"%{query}%")
+        )
+
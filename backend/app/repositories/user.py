@@ -1,8 +1,10 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from typing import Any, Dict
 from app.models.user import User
 from app.repositories.base import BaseRepository
 from app.schemas.auth import UserCreate
+from app.core.security import invalidate_user
 
 class UserRepository(BaseRepository[User]):
     def __init__(self, db: AsyncSession):
@@ -22,3 +24,15 @@ class UserRepository(BaseRepository[User]):
             hashed_password=user_data.password
         )
         return await super().create(user)
+
+    async def update(self, user: User, values: Dict[str, Any]) -> User:
+        """Update a user and drop their cached principal."""
+        user = await super().update(user, values)
+        invalidate_user(user.id)
+        return user
+
+    async def delete(self, user: User) -> None:
+        """Delete a user and drop their cached principal."""
+        user_id = user.id
+        await super().delete(user)
+        invalidate_user(user_id)
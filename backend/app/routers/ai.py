@@ -0,0 +1,39 @@
+from typing import Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.dependencies import admit, get_current_user
+from app.schemas.auth import UserResponse
+from app.schemas.chat import ChatHistoryResponse, ChatRequest, ChatResponse
+from app.services.chat import ChatService, summarize_conversation
+
+router = APIRouter()
+
+@router.post("", response_model=ChatResponse, dependencies=[Depends(admit("llm"))])
+async def send_message(
+    data: ChatRequest,
+    background_tasks: BackgroundTasks,
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Send a message to the mentor. Omit conversation_id to start a new conversation."""
+    service = ChatService(db)
+    response, needs_summary = await service.send_message(current_user.id, data)
+    if needs_summary:
+        # Runs after the response is sent, so it never adds to the turn's latency
+        background_tasks.add_task(summarize_conversation, response.conversation_id)
+    return response
+
+@router.get("/conversations/{conversation_id}/messages", response_model=ChatHistoryResponse)
+async def get_history(
+    conversation_id: int,
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[int] = None,
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """A conversation's messages, newest first. Pass `next_before` as `before` for older ones."""
+    service = ChatService(db)
+    return await service.get_history(conversation_id, current_user.id, limit, before)
@@ -1,25 +1,22 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.schemas.auth import UserCreate, UserLogin, UserResponse
+from app.schemas.auth import UserCreate, UserLogin, UserResponse, TokenResponse
 from app.services.auth import AuthService
 from app.database import get_db
-from fastapi.security import OAuth2PasswordBearer
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
+from app.dependencies import get_current_user, admit
 
 router = APIRouter()
 
-@router.post("/register")
+@router.post("/register", response_model=TokenResponse, dependencies=[Depends(admit("auth"))])
 async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     service = AuthService(db)
     return await service.register_user(user_data)
 
-@router.post("/login")
+@router.post("/login", response_model=TokenResponse, dependencies=[Depends(admit("auth"))])
 async def login(user_data: UserLogin, db: AsyncSession = Depends(get_db)):
     service = AuthService(db)
     return await service.login(user_data)
 
 @router.get("/me", response_model=UserResponse)
-async def get_me(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
-    service = AuthService(db)
-    return await service.get_current_user(token)
+async def get_me(current_user: UserResponse = Depends(get_current_user)):
+    return current_user
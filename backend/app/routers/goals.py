@@ -1,13 +1,242 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.services.goals import GoalService
-from app.schemas.goal import GoalCreate
-from app.database import get_db
+from app.services.jobs import get_job_queue, JobQueueFull
+from app.services.progress import ProgressService, progress_validators
+from app.services.goal_transfer import GoalTransferService
+from app.services.micro_steps import MicroStepService, prefetch_next_micro_steps
+from app.schemas.goal import ActionResponse, ActionBatchUpdate, ActionBatchResponse, MicroStepListResponse, GoalResponse, GoalTreeResponse, GoalListResponse, GoalJobCreate, GoalJobResponse
+from app.schemas.progress import ActionStatusUpdate, GoalProgressResponse
+from app.schemas.transfer import ImportResponse
+from app.models.goals import GoalStatus
+from app.schemas.auth import UserResponse
+from app.core.conditional import is_conditional, is_not_modified, make_etag, not_modified, validator_headers
+from app.database import get_db, async_session_maker, session_router
+from app.dependencies import get_current_user, admit
+from typing import Literal, Optional
+from contextlib import aclosing
+import json
 
 router = APIRouter()
 
-@router.post("/create")
-async def create(data: GoalCreate, db: AsyncSession = Depends(get_db)):
+@router.post("/create", response_model=GoalResponse, dependencies=[Depends(admit("llm"))])
+async def create(
+    data: GoalJobCreate,
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Generate a goal for the current user and return it once saved."""
     service = GoalService(db)
-    return await service.create_goal(data.prompt, data.user_id)
+    return await service.create_goal(data.prompt, current_user.id)
 
+@router.post("/create/stream", dependencies=[Depends(admit("llm"))])
+async def create_stream(data: GoalJobCreate, current_user: UserResponse = Depends(get_current_user)):
+    """Generate a goal for the current user, streaming NDJSON events as each subgoal is saved."""
+    async def events():
+        # The session must live as long as the stream, not just the handler
+        async with async_session_maker() as db:
+            service = GoalService(db)
+            # Closed explicitly so a disconnect frees the LLM slot right away
+            async with aclosing(service.create_goal_stream(data.prompt, current_user.id)) as stream:
+                async for event in stream:
+                    yield json.dumps(event) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@router.post(
+    "/jobs",
+    response_model=GoalJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(admit("llm"))],
+)
+async def create_job(
+    data: GoalJobCreate,
+    response: Response,
+    current_user: UserResponse = Depends(get_current_user),
+):
+    """Queue goal generation and return immediately. Poll the job (or its events) for the result."""
+    try:
+        job, _ = await get_job_queue().submit(current_user.id, data.prompt)
+    except JobQueueFull as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many goals are being generated, try again shortly",
+            headers={"Retry-After": "5"}
+        ) from e
+    response.headers["Location"] = f"/api/goals/jobs/{job.id}"
+    return job
+
+async def _get_own_job(job_id: str, user_id: int):
+    job = await get_job_queue().get(job_id)
+    if job is None or job.user_id != user_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+@router.get("/jobs/{job_id}", response_model=GoalJobResponse)
+async def get_job(job_id: str, current_user: UserResponse = Depends(get_current_user)):
+    """Return a generation job's status; goal_id is set once it has succeeded."""
+    return await _get_own_job(job_id, current_user.id)
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, current_user: UserResponse = Depends(get_current_user)):
+    """Server-sent events with the job's status on every change, until it finishes."""
+    await _get_own_job(job_id, current_user.id)
+
+    async def events():
+        async for job in get_job_queue().subscribe(job_id):
+            yield f"event: status\ndata: {GoalJobResponse.model_validate(job).model_dump_json()}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@router.get("", response_model=GoalListResponse)
+async def list_goals(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    status: Optional[GoalStatus] = None,
+    include_counts: bool = False,
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """List the current user's goals, newest first. Pass `next_cursor` to get the next page."""
+    service = GoalService(db)
+    return await service.list_goals(current_user.id, limit, cursor, status, include_counts)
+
+@router.get("/export")
+async def export_goals(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    current_user: UserResponse = Depends(get_current_user),
+):
+    """
+    Download all of the current user's goals, subgoals and actions, streamed
+    as NDJSON records (the import format) or as CSV with one row per action.
+    """
+    async def body():
+        # The session must live as long as the stream, not just the handler
+        async with session_router.for_read(current_user.id)() as db:
+            service = GoalTransferService(db)
+            chunks = service.export_csv(current_user.id) if format == "csv" else service.export_ndjson(current_user.id)
+            async for chunk in chunks:
+                yield chunk
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="goals.{format}"'},
+    )
+
+@router.post("/import", response_model=ImportResponse)
+async def import_goals(
+    request: Request,
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Import goals from an NDJSON export sent as the request body. They are
+    added as new goals; if any line is invalid nothing is imported.
+    """
+    service = GoalTransferService(db)
+    return await service.import_ndjson(current_user.id, request.stream())
+
+@router.get("/{goal_id}/tree", response_model=GoalTreeResponse)
+async def get_tree(
+    goal_id: int,
+    request: Request,
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Return a goal with its subgoals and actions. Send the response's ETag back
+    in If-None-Match to get 304 Not Modified while the tree is unchanged.
+    """
+    service = GoalService(db)
+    version = None
+    if is_conditional(request):
+        # Only the goal's version is read to answer 304
+        version = await service.get_goal_version(goal_id, current_user.id)
+        etag = make_etag(goal_id, version[0])
+        if is_not_modified(request, etag, version[1]):
+            return not_modified(etag, version[1])
+    body, current, updated_at = await service.get_goal_tree_json(goal_id, current_user.id, version)
+    return Response(body, media_type="application/json", headers=validator_headers(make_etag(goal_id, current), updated_at))
+
+@router.get("/{goal_id}/progress", response_model=GoalProgressResponse)
+async def get_progress(
+    goal_id: int,
+    request: Request,
+    response: Response,
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Return a goal's completion, streak and per-subgoal progress. Supports If-None-Match like the tree."""
+    if is_conditional(request):
+        version, updated_at = await GoalService(db).get_goal_version(goal_id, current_user.id)
+        etag, last_modified = progress_validators(goal_id, version, updated_at)
+        if is_not_modified(request, etag, last_modified):
+            return not_modified(etag, last_modified)
+    service = ProgressService(db)
+    progress = await service.get_goal_progress(goal_id, current_user.id)
+    response.headers.update(validator_headers(*progress_validators(goal_id, progress.version, progress.updated_at)))
+    return progress
+
+@router.patch("/{goal_id}/actions/{action_id}", response_model=ActionResponse)
+async def update_action_status(
+    goal_id: int,
+    action_id: int,
+    data: ActionStatusUpdate,
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Set an action's status; completing one updates the goal's progress and streaks."""
+    service = ProgressService(db)
+    return await service.set_action_status(current_user.id, goal_id, action_id, data.status)
+
+@router.patch("/{goal_id}/actions", response_model=ActionBatchResponse)
+async def update_actions(
+    goal_id: int,
+    data: ActionBatchUpdate,
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Apply several action changes (status, description, position) at once.
+    Each change carries the action's `version`; if any is out of date nothing
+    is applied and 409 is returned.
+    """
+    service = GoalService(db)
+    return await service.update_actions(goal_id, current_user.id, data.changes)
+
+@router.get("/{goal_id}/actions/{action_id}/micro-steps", response_model=MicroStepListResponse)
+async def get_micro_steps(
+    goal_id: int,
+    action_id: int,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    An action broken down into 5-10 minute micro-steps. They are generated
+    the first time an action is opened and stored from then on; only that
+    first open counts against the LLM admission limits.
+    """
+    service = MicroStepService(db)
+    ip = request.client.host if request.client else None
+    response, prefetch = await service.get_micro_steps(goal_id, action_id, current_user.id, ip)
+    if prefetch:
+        # Runs after the response is sent; the next action is likely opened next
+        background_tasks.add_task(prefetch_next_micro_steps, action_id)
+    return response
+
+@router.delete("/{goal_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_goal(
+    goal_id: int,
+    archive: bool = False,
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Delete a goal with its subgoals and actions. With `archive=true` they are moved to the archive instead."""
+    service = GoalService(db)
+    await service.delete_goal(goal_id, current_user.id, archive)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
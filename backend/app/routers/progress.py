@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.dependencies import get_current_user
+from app.schemas.auth import UserResponse
+from app.schemas.progress import StreakResponse
+from app.services.progress import ProgressService
+
+router = APIRouter()
+
+@router.get("/streak", response_model=StreakResponse)
+async def get_streak(
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Return the current user's streak and today's completed actions."""
+    service = ProgressService(db)
+    return await service.get_streak(current_user.id)
@@ -0,0 +1,24 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.dependencies import get_current_user
+from app.schemas.auth import UserResponse
+from app.schemas.search import SearchResponse
+from app.services.search import SearchService
+
+router = APIRouter()
+
+@router.get("", response_model=SearchResponse)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Search the current user's goals, subgoals and actions, best match first. Pass `next_cursor` to get the next page."""
+    service = SearchService(db)
+    return await service.search(current_user.id, q, limit, cursor)
@@ -0,0 +1,36 @@
+import datetime
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from app.models.chat import ChatRole
+
+
+class ChatRequest(BaseModel):
+    message: str = Field(min_length=1, max_length=4000)
+    # Omit to start a new conversation, optionally about a goal/action step
+    conversation_id: Optional[int] = None
+    goal_id: Optional[int] = None
+    action_id: Optional[int] = None
+    mode: Literal["mentor", "emotional_support"] = "mentor"
+
+class ChatMessageResponse(BaseModel):
+    id: int
+    conversation_id: int
+    role: ChatRole
+    content: str
+    goal_id: Optional[int] = None
+    action_id: Optional[int] = None
+    created_at: datetime.datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class ChatResponse(BaseModel):
+    conversation_id: int
+    message: ChatMessageResponse
+    reply: ChatMessageResponse
+
+class ChatHistoryResponse(BaseModel):
+    items: List[ChatMessageResponse]
+    # Pass as `before` to fetch older messages; null on the last page
+    next_before: Optional[int] = None
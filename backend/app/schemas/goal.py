@@ -1,7 +1,105 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Optional
+from app.models.goals import GoalStatus, SubgoalCategory, ActionStatus
+from app.models.jobs import JobStatus
 import datetime
 
 class GoalCreate(BaseModel):
     user_id: int  
     prompt: str
 
+class ActionResponse(BaseModel):
+    id: int
+    description: Optional[str] = None
+    estimated_minutes: Optional[int] = None
+    status: ActionStatus = ActionStatus.pending
+    completed_at: Optional[datetime.datetime] = None
+    position: int = 0
+    version: int = 1
+
+    model_config = ConfigDict(from_attributes=True)
+
+class MicroStepResponse(BaseModel):
+    id: int
+    title: str
+    position: int = 0
+
+    model_config = ConfigDict(from_attributes=True)
+
+class MicroStepListResponse(BaseModel):
+    action_id: int
+    items: List[MicroStepResponse]
+
+class ActionChange(BaseModel):
+    id: int
+    # The version the client last saw; the change is rejected if it moved on
+    version: int
+    status: Optional[ActionStatus] = None
+    description: Optional[str] = Field(default=None, min_length=1)
+    position: Optional[int] = Field(default=None, ge=0)
+
+class ActionBatchUpdate(BaseModel):
+    changes: List[ActionChange] = Field(min_length=1, max_length=200)
+
+class ActionBatchResponse(BaseModel):
+    items: List[ActionResponse]
+
+class SubGoalResponse(BaseModel):
+    id: int
+    title: str
+    description: Optional[str] = None
+    category: SubgoalCategory
+    action_count: int = 0
+    completed_count: int = 0
+    actions: List[ActionResponse] = []
+
+    model_config = ConfigDict(from_attributes=True)
+
+class GoalResponse(BaseModel):
+    id: int
+    user_id: int
+    title: str
+    description: Optional[str] = None
+    status: GoalStatus
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+    # Bumped by every change to the goal, its subgoals or actions
+    version: int = 1
+
+    model_config = ConfigDict(from_attributes=True)
+
+class GoalTreeResponse(GoalResponse):
+    subgoals: List[SubGoalResponse] = []
+
+class GoalSummary(BaseModel):
+    id: int
+    title: str
+    description: Optional[str] = None
+    status: GoalStatus
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+    subgoal_count: Optional[int] = None
+    action_count: Optional[int] = None
+    completed_count: Optional[int] = None
+    last_activity_at: Optional[datetime.datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class GoalListResponse(BaseModel):
+    items: List[GoalSummary]
+    next_cursor: Optional[str] = None
+
+class GoalJobCreate(BaseModel):
+    prompt: str
+
+class GoalJobResponse(BaseModel):
+    id: str
+    status: JobStatus
+    attempts: int
+    goal_id: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime.datetime
+    started_at: Optional[datetime.datetime] = None
+    finished_at: Optional[datetime.datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
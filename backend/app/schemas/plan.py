@@ -0,0 +1,37 @@
+"""Structure of the plan the model returns for SYS_PROMPT, and of MICRO_STEP_PROMPT's breakdown."""
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class PlanActionStep(BaseModel):
+    title: str = ""
+    description: str = ""
+    estimated_minutes: Optional[int] = Field(default=None, alias="estimatedMinutes", ge=0)
+
+    model_config = ConfigDict(populate_by_name=True)
+
+class PlanSubGoal(BaseModel):
+    title: str = ""
+    action_steps: List[PlanActionStep] = Field(default_factory=list, alias="actionSteps")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+class Plan(BaseModel):
+    goal: str = Field(default="Untitled Goal", alias="Goal")
+    sub_goals: List[PlanSubGoal] = Field(alias="subGoals", min_length=1)
+
+    model_config = ConfigDict(populate_by_name=True)
+
+# JSON schema sent with the request so the model returns structured output
+PLAN_JSON_SCHEMA = Plan.model_json_schema(by_alias=True)
+
+class PlanMicroStep(BaseModel):
+    title: str = Field(min_length=1)
+
+class MicroStepPlan(BaseModel):
+    micro_steps: List[PlanMicroStep] = Field(alias="microSteps", min_length=1, max_length=10)
+
+    model_config = ConfigDict(populate_by_name=True)
+
+MICRO_STEP_JSON_SCHEMA = MicroStepPlan.model_json_schema(by_alias=True)
@@ -0,0 +1,41 @@
+import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from app.models.goals import ActionStatus
+
+
+class ActionStatusUpdate(BaseModel):
+    status: ActionStatus
+
+class SubGoalProgress(BaseModel):
+    id: int
+    title: str
+    action_count: int
+    completed_count: int
+    percent_complete: float
+    last_activity_at: Optional[datetime.datetime] = None
+
+class GoalProgressResponse(BaseModel):
+    goal_id: int
+    # The goal's version and last change (see Goal.version)
+    version: int
+    updated_at: datetime.datetime
+    subgoal_count: int
+    action_count: int
+    completed_count: int
+    percent_complete: float
+    # Zero once a day has passed without a completed action
+    current_streak: int
+    longest_streak: int
+    last_active_date: Optional[datetime.date] = None
+    last_activity_at: Optional[datetime.datetime] = None
+    subgoals: List[SubGoalProgress] = []
+
+class StreakResponse(BaseModel):
+    current_streak: int
+    longest_streak: int
+    last_active_date: Optional[datetime.date] = None
+    actions_completed_today: int = 0
+    minutes_worked_today: int = 0
@@ -0,0 +1,18 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from app.models.search import SearchKind
+
+
+class SearchHit(BaseModel):
+    kind: SearchKind
+    # ID of the goal, subgoal or action
+    id: int
+    goal_id: int
+    content: str
+    rank: float
+
+class SearchResponse(BaseModel):
+    items: List[SearchHit]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,43 @@
+import datetime
+from typing import Annotated, Literal, Optional, Union
+
+from pydantic import BaseModel, Field
+
+from app.models.goals import ActionStatus, GoalStatus, SubgoalCategory
+
+# One line of a goal export (NDJSON). Records come in tree order: a goal,
+# then each of its subgoals followed by that subgoal's actions. IDs are the
+# exporting database's; an import assigns new ones.
+
+class GoalRecord(BaseModel):
+    type: Literal["goal"]
+    id: int
+    title: str = Field(min_length=1)
+    description: Optional[str] = None
+    status: GoalStatus = GoalStatus.active
+    created_at: Optional[datetime.datetime] = None
+
+class SubGoalRecord(BaseModel):
+    type: Literal["subgoal"]
+    id: int
+    goal_id: int
+    title: str = Field(min_length=1)
+    description: Optional[str] = None
+    category: SubgoalCategory
+
+class ActionRecord(BaseModel):
+    type: Literal["action"]
+    id: int
+    subgoal_id: int
+    description: Optional[str] = None
+    estimated_minutes: Optional[int] = Field(default=None, ge=0)
+    status: ActionStatus = ActionStatus.pending
+    completed_at: Optional[datetime.datetime] = None
+    position: int = Field(default=0, ge=0)
+
+TreeRecord = Annotated[Union[GoalRecord, SubGoalRecord, ActionRecord], Field(discriminator="type")]
+
+class ImportResponse(BaseModel):
+    goals: int
+    subgoals: int
+    actions: int
@@ -0,0 +1,54 @@
+"""
+Archival of finished or abandoned goal trees.
+
+Completed goals, and goals without activity for a while, are moved with
+their subgoals and actions into the archived_* tables, one transaction per
+batch, so the live tables and their indexes only hold goals in use:
+
+    python -m app.services.archive --completed --inactive-days 180 [--user-id ID] [--batch-size 500]
+
+A goal's conversations stay with the user, detached from the goal.
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+
+from app.database import async_session_maker
+from app.repositories.goals import GoalRepository
+
+
+async def archive_goals(
+    completed: bool = False,
+    inactive_days: Optional[int] = None,
+    user_id: Optional[int] = None,
+    batch_size: int = 500,
+) -> int:
+    """Archives every goal that is completed and/or inactive for `inactive_days`. Returns the count."""
+    inactive_before = datetime.utcnow() - timedelta(days=inactive_days) if inactive_days is not None else None
+    archived = 0
+    while True:
+        async with async_session_maker() as db:
+            goal_repo = GoalRepository(db)
+            goal_ids = await goal_repo.archivable_ids(batch_size, completed, inactive_before, user_id)
+            if not goal_ids:
+                return archived
+            try:
+                archived += await goal_repo.archive_trees(goal_ids)
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move completed or inactive goal trees to the archive tables")
+    parser.add_argument("--completed", action="store_true", help="archive completed goals")
+    parser.add_argument("--inactive-days", type=int, help="archive goals without activity for this many days")
+    parser.add_argument("--user-id", type=int)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    if not args.completed and args.inactive_days is None:
+        parser.error("pass --completed and/or --inactive-days")
+    count = asyncio.run(archive_goals(args.completed, args.inactive_days, args.user_id, args.batch_size))
+    print(f"Archived {count} goal(s)")
@@ -3,39 +3,48 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from email_validator import validate_email, EmailNotValidError
 from password_validator import PasswordValidator
 from app.repositories.user import UserRepository
-from passlib.context import CryptContext
+from app.schemas.auth import UserResponse, TokenResponse
+from app.core.security import token_cache, token_key, principal_cache
+from app.core.hashing import get_password_hasher, HashingPoolSaturated
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from fastapi import HTTPException, status
-from typing import Optional
-from dotenv import load_dotenv
-import os
-from pathlib import Path
-
-# Load environment variables from .env file
-env_path = Path(__file__).resolve().parent.parent.parent / '.env'
-load_dotenv(dotenv_path=env_path)
+from typing import Optional, Tuple
+from app.core.config import settings
+import time
 
 # Configuration
-SECRET_KEY = os.getenv("JWT_SECRET_KEY")
+SECRET_KEY = settings.jwt_secret_key
 if not SECRET_KEY:
-    raise ValueError("SECRET_KEY not found in .env file")
-ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRE_HOURS", "30")) * 60
-
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    raise ValueError("JWT_SECRET_KEY not found in environment or .env file")
+ALGORITHM = settings.jwt_algorithm
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.jwt_access_token_expire_hours * 60
 
 class AuthService:
     def __init__(self, db: AsyncSession):
         self.user_repo = UserRepository(db) 
         self.db = db
+        self.hasher = get_password_hasher()
     
-    def _hash_password(self, password: str) -> str:
-        return pwd_context.hash(password)
+    async def _hash_password(self, password: str) -> str:
+        try:
+            return await self.hasher.hash(password)
+        except HashingPoolSaturated as e:
+            raise self._busy() from e
     
-    def _verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        return pwd_context.verify(plain_password, hashed_password)
+    async def _verify_password(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify a password, returning a replacement hash if the stored one is outdated."""
+        try:
+            return await self.hasher.verify_and_update(plain_password, hashed_password)
+        except HashingPoolSaturated as e:
+            raise self._busy() from e
+
+    def _busy(self) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
     
     def _create_access_token(self, data: dict, expires_delta: Optional[timedelta] = None) -> str:
         """Create a JWT access token"""
@@ -49,7 +58,7 @@ class AuthService:
         encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
         return encoded_jwt
     
-    async def register_user(self, user_data: UserCreate) -> dict:
+    async def register_user(self, user_data: UserCreate) -> TokenResponse:
         """Register a new user"""
         # Validate email
         try:
@@ -84,7 +93,7 @@ class AuthService:
             )
         
         # Hash password
-        hashed_password = self._hash_password(user_data.password)
+        hashed_password = await self._hash_password(user_data.password)
         user_data.password = hashed_password
         
         # Create user record
@@ -98,29 +107,32 @@ class AuthService:
         )
         
         # Return user info and token
-        return {
-            "user": {
-                "id": created_user.id,
-                "email": created_user.email,
-                "created_at": created_user.created_at
-            },
-            "access_token": access_token,
-            "token_type": "bearer"
-        }
+        return TokenResponse(
+            access_token=access_token,
+            user=UserResponse.model_validate(created_user)
+        )
     
-    async def login(self, user_data: UserLogin) -> dict:
+    async def login(self, user_data: UserLogin) -> TokenResponse:
         """Authenticate user and return JWT token"""
         # Get user by email
         user = await self.user_repo.get_by_email(user_data.email)
         
         # Check if user exists and password matches
-        if not user or not self._verify_password(user_data.password, user.hashed_password):
+        verified, new_hash = (
+            await self._verify_password(user_data.password, user.hashed_password)
+            if user else (False, None)
+        )
+        if user is None or not verified:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
+        # Rehash transparently when the hashing policy (e.g. bcrypt cost) changed
+        if new_hash:
+            user = await self.user_repo.update(user, {"hashed_password": new_hash})
+
         # Create access token
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = self._create_access_token(
@@ -129,17 +141,18 @@ class AuthService:
         )
         
         # Return token
-        return {
-            "access_token": access_token,
-            "token_type": "bearer",
-            "user": {
-                "id": user.id,
-                "email": user.email
-            }
-        }
+        return TokenResponse(
+            access_token=access_token,
+            user=UserResponse.model_validate(user)
+        )
     
     async def verify_token(self, token: str) -> dict:
-        """Verify and decode JWT token"""
+        """Verify and decode JWT token (cached until the token expires)"""
+        key = token_key(token)
+        claims = token_cache.get(key)
+        if claims is not None:
+            return claims
+
         try:
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
             email: str = payload.get("sub")
@@ -150,23 +163,32 @@ class AuthService:
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Could not validate credentials"
                 )
-            
-            return {"email": email, "user_id": user_id}
         except JWTError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials"
             )
 
-    async def get_current_user(self, token: str):
+        claims = {"email": email, "user_id": user_id}
+        expires_in = payload.get("exp", 0) - time.time()
+        if expires_in > 0:
+            token_cache.set(key, claims, ttl=expires_in)
+        return claims
+
+    async def get_current_user(self, token: str) -> UserResponse:
         """Get the current user from the JWT token"""
         payload = await self.verify_token(token)
         user_id = payload.get("user_id")
+        principal = principal_cache.get(user_id)
+        if principal is not None:
+            return principal
+
         user = await self.user_repo.get_by_id(user_id)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found"
             )
-        return user
-
+        principal = UserResponse.model_validate(user)
+        principal_cache.set(user_id, principal)
+        return principal
@@ -0,0 +1,230 @@
+"""
+Mentor chat: persisted conversations answered by the LLM.
+
+Each turn reads a constant amount of state (the conversation row, the
+cached goal context and the recent window of messages) no matter how long
+the conversation is. Messages that fall out of the recent window are folded
+into a rolling summary by summarize_conversation, which runs after the
+response has been sent.
+"""
+import logging
+from typing import Optional, Set, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.llm import (
+    LLMClient,
+    LLMError,
+    LLMTimeoutError,
+    estimate_tokens,
+    get_llm_client,
+)
+from app.database import async_session_maker
+from app.models.chat import ChatMessage, ChatRole, Conversation
+from app.prompts.system import SUMMARY_PROMPT
+from app.repositories.chat import ChatMessageRepository, ConversationRepository
+from app.repositories.goals import GoalRepository
+from app.schemas.chat import (
+    ChatHistoryResponse,
+    ChatMessageResponse,
+    ChatRequest,
+    ChatResponse,
+)
+from app.services.chat_context import (
+    CHAT_RESPONSE_TOKENS,
+    CHAT_SUMMARY_TOKENS,
+    assemble_contents,
+    goal_contexts,
+    render_goal_context,
+    system_prefix,
+    truncate_to_tokens,
+)
+
+CHAT_RECENT_MESSAGES = settings.chat_recent_messages
+CHAT_SUMMARY_BATCH = settings.chat_summary_batch
+
+logger = logging.getLogger(__name__)
+
+
+class ChatService:
+    def __init__(self, db: AsyncSession):
+        self.conversation_repo = ConversationRepository(db)
+        self.message_repo = ChatMessageRepository(db)
+        self.goal_repo = GoalRepository(db)
+        self.db = db
+
+    @property
+    def llm(self) -> LLMClient:
+        return get_llm_client()
+
+    async def send_message(self, user_id: int, data: ChatRequest) -> Tuple[ChatResponse, bool]:
+        """
+        Answers one user message. Returns the stored messages and whether the
+        conversation has grown enough to need its summary updated.
+        """
+        conversation = await self._get_conversation(user_id, data)
+        goal_id = conversation.goal_id if conversation is not None else data.goal_id
+        goal_context = await self._goal_context(goal_id, user_id) if goal_id else None
+        action = None
+        if data.action_id is not None:
+            action = await self.message_repo.get_goal_action(data.action_id, goal_id) if goal_id else None
+            if action is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Action not found")
+
+        recent = []
+        if conversation is not None:
+            recent = await self.message_repo.recent(
+                conversation.id, conversation.summarized_through_id, CHAT_RECENT_MESSAGES
+            )
+        role = ChatRole[data.mode]
+        prefix = system_prefix(role, goal_context)
+        contents = assemble_contents(
+            prefix, conversation.summary if conversation is not None else None, recent, data.message, action
+        )
+        # End the read transaction so no connection is held while the model replies
+        await self.db.commit()
+
+        config = {**await self.llm.prefix_config(prefix), "max_output_tokens": CHAT_RESPONSE_TOKENS}
+        reply_text = await self._generate(contents, config)
+
+        if conversation is None:
+            conversation = await self.conversation_repo.insert(Conversation(user_id=user_id, goal_id=goal_id))
+        message = ChatMessage(
+            conversation_id=conversation.id,
+            user_id=user_id,
+            goal_id=goal_id,
+            action_id=data.action_id,
+            role=ChatRole.user,
+            content=data.message,
+            token_count=estimate_tokens(data.message),
+        )
+        reply = ChatMessage(
+            conversation_id=conversation.id,
+            user_id=user_id,
+            goal_id=goal_id,
+            action_id=data.action_id,
+            role=role,
+            content=reply_text,
+            token_count=estimate_tokens(reply_text),
+        )
+        self.db.add_all([message, reply])
+        await self.db.flush()
+        message_count, summarized_count = await self.conversation_repo.add_messages(conversation.id, 2)
+        await self.db.commit()
+
+        needs_summary = message_count - summarized_count >= CHAT_RECENT_MESSAGES + CHAT_SUMMARY_BATCH
+        response = ChatResponse(
+            conversation_id=conversation.id,
+            message=ChatMessageResponse.model_validate(message),
+            reply=ChatMessageResponse.model_validate(reply),
+        )
+        return response, needs_summary
+
+    async def get_history(
+        self, conversation_id: int, user_id: int, limit: int, before: Optional[int] = None
+    ) -> ChatHistoryResponse:
+        """A page of a conversation's messages, newest first."""
+        conversation = await self.conversation_repo.get_by_id(conversation_id)
+        if conversation is None or conversation.user_id != user_id:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
+        # Fetch one extra row to learn whether another page exists
+        messages = await self.message_repo.history(conversation_id, limit + 1, before)
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        return ChatHistoryResponse(
+            items=[ChatMessageResponse.model_validate(m) for m in messages],
+            next_before=messages[-1].id if has_more else None,
+        )
+
+    async def update_summary(self, conversation_id: int) -> bool:
+        """
+        Folds the oldest messages outside the recent window into the rolling
+        summary, one batch per call. Returns whether the summary changed.
+        """
+        conversation = await self.conversation_repo.get_by_id(conversation_id)
+        if conversation is None:
+            return False
+        outside_window = conversation.message_count - conversation.summarized_count - CHAT_RECENT_MESSAGES
+        if outside_window < CHAT_SUMMARY_BATCH:
+            return False
+        messages = await self.message_repo.oldest(
+            conversation.id, conversation.summarized_through_id, min(outside_window, CHAT_SUMMARY_BATCH)
+        )
+        if not messages:
+            return False
+        transcript = "\n".join(
+            f"{m.role.value}: {truncate_to_tokens(m.content, CHAT_SUMMARY_TOKENS)}" for m in messages
+        )
+        contents = f"Current summary: {conversation.summary or '(none)'}\n\nNext messages:\n{transcript}"
+        await self.db.commit()
+
+        summary = await self.llm.generate(
+            contents, {"system_instruction": SUMMARY_PROMPT, "max_output_tokens": CHAT_SUMMARY_TOKENS * 2}
+        )
+        return await self.conversation_repo.save_summary(
+            conversation.id,
+            conversation.summarized_through_id,
+            truncate_to_tokens(summary.strip(), CHAT_SUMMARY_TOKENS),
+            messages[-1].id,
+            len(messages),
+        )
+
+    async def _get_conversation(self, user_id: int, data: ChatRequest) -> Optional[Conversation]:
+        """The conversation to continue, or None when the message starts a new one."""
+        if data.conversation_id is None:
+            return None
+        conversation = await self.conversation_repo.get_by_id(data.conversation_id)
+        if conversation is None or conversation.user_id != user_id:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
+        return conversation
+
+    async def _goal_context(self, goal_id: int, user_id: int) -> str:
+        """Rendered goal tree, built once per goal revision and then served from memory."""
+        goal = await self.goal_repo.get_by_id(goal_id)
+        if goal is None or goal.user_id != user_id:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Goal not found")
+        key = (goal_id, goal.version)
+        context: Optional[str] = goal_contexts.get(key)
+        if context is None:
+            tree = await self.goal_repo.get_tree(goal_id)
+            if tree is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Goal not found")
+            context = render_goal_context(tree)
+            goal_contexts.set(key, context)
+        return context
+
+    async def _generate(self, contents, config) -> str:
+        try:
+            return await self.llm.generate(contents, config)
+        except LLMTimeoutError as e:
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="The mentor took too long to reply"
+            ) from e
+        except LLMError as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="The mentor is temporarily unavailable"
+            ) from e
+
+
+_summarizing: Set[int] = set()
+
+
+async def summarize_conversation(conversation_id: int) -> None:
+    """Background task: brings a conversation's rolling summary up to date."""
+    # One summary update per conversation at a time in this process; the
+    # conditional write in save_summary covers other workers
+    if conversation_id in _summarizing:
+        return
+    _summarizing.add(conversation_id)
+    try:
+        async with async_session_maker() as db:
+            await ChatService(db).update_summary(conversation_id)
+    except Exception:
+        # The next turn schedules it again
+        logger.exception("Summarizing conversation %s failed", conversation_id)
+    finally:
+        _summarizing.discard(conversation_id)
@@ -0,0 +1,101 @@
+"""
+Token-budgeted context for mentor chat turns.
+
+A turn's prompt is assembled from pieces whose size does not depend on how
+long the conversation has grown:
+
+1. a static prefix (persona prompt + the goal's precomputed context), sent
+   as the system instruction so the LLM client can cache it
+2. the rolling summary of everything older than the recent window
+3. as many of the most recent messages as fit the remaining budget
+4. the new user message
+
+Only the recent window is ever read from the database, so the cost per turn
+stays flat whether a conversation has ten messages or ten thousand.
+"""
+from typing import Dict, List, Optional, Sequence
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.llm import estimate_tokens
+from app.core.metrics import register_collector
+from app.models.chat import ChatMessage, ChatRole
+from app.models.goals import Actions, Goal
+from app.prompts.system import EMOTIONAL_SUPPORT_PROMPT, MENTOR_PROMPT
+
+CHAT_CONTEXT_TOKENS = settings.chat_context_tokens
+CHAT_RESPONSE_TOKENS = settings.chat_response_tokens
+CHAT_GOAL_CONTEXT_TOKENS = settings.chat_goal_context_tokens
+CHAT_SUMMARY_TOKENS = settings.chat_summary_tokens
+CHAT_GOAL_CONTEXT_CACHE_SIZE = settings.chat_goal_context_cache_size
+
+PERSONA_PROMPTS = {
+    ChatRole.mentor: MENTOR_PROMPT,
+    ChatRole.emotional_support: EMOTIONAL_SUPPORT_PROMPT,
+}
+
+# Rendered goal trees keyed by (goal_id, version), so each goal is
+# rendered once and an edited goal gets a fresh entry
+goal_contexts: TTLCache[str] = TTLCache(maxsize=CHAT_GOAL_CONTEXT_CACHE_SIZE, ttl=86400)
+register_collector("chat_goal_context", goal_contexts.stats)
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    """Cuts text down to roughly `tokens` tokens."""
+    limit = tokens * 4
+    return text if len(text) <= limit else text[:limit].rstrip() + "..."
+
+
+def render_goal_context(goal: Goal) -> str:
+    """Compact text version of a goal tree (subgoals and actions loaded)."""
+    lines = [f"The user's goal: {goal.title}"]
+    for idx, subgoal in enumerate(goal.subgoals, start=1):
+        lines.append(f"{idx}. {subgoal.title} ({subgoal.category.value})")
+        for action in subgoal.actions:
+            minutes = f" [{action.estimated_minutes} min]" if action.estimated_minutes else ""
+            lines.append(f"   - {action.description}{minutes}")
+    return truncate_to_tokens("\n".join(lines), CHAT_GOAL_CONTEXT_TOKENS)
+
+
+def system_prefix(role: ChatRole, goal_context: Optional[str]) -> str:
+    """Persona prompt plus goal context; identical for every turn on a goal."""
+    prompt = PERSONA_PROMPTS[role]
+    if goal_context:
+        prompt += "\n" + goal_context
+    return prompt
+
+
+def _turn(role: ChatRole, text: str) -> Dict:
+    return {"role": "user" if role == ChatRole.user else "model", "parts": [{"text": text}]}
+
+
+def assemble_contents(
+    prefix: str,
+    summary: Optional[str],
+    recent: Sequence[ChatMessage],
+    message: str,
+    action: Optional[Actions] = None,
+) -> List[Dict]:
+    """
+    Builds the contents for one turn. `recent` is newest first; messages are
+    taken until the budget left after the fixed pieces runs out.
+    """
+    if action is not None:
+        message = f"(I'm working on: {action.description})\n{message}"
+    budget = CHAT_CONTEXT_TOKENS - CHAT_RESPONSE_TOKENS - estimate_tokens(prefix) - estimate_tokens(message)
+
+    contents: List[Dict] = []
+    if summary:
+        summary = truncate_to_tokens(summary, CHAT_SUMMARY_TOKENS)
+        budget -= estimate_tokens(summary)
+        contents.append(_turn(ChatRole.user, f"Summary of our conversation so far: {summary}"))
+
+    history: List[Dict] = []
+    for chat_message in recent:
+        budget -= chat_message.token_count
+        if budget < 0:
+            break
+        history.append(_turn(chat_message.role, chat_message.content))
+    contents.extend(reversed(history))
+    contents.append(_turn(ChatRole.user, message))
+    return contents
@@ -0,0 +1,268 @@
+"""
+Bulk export and import of a user's goal trees.
+
+Exports read a server-side cursor and are sent in chunks as they are
+produced, so memory stays flat however many actions an account has. Imports
+parse the upload line by line and insert it in batches of
+GOAL_TRANSFER_BATCH_SIZE rows; the whole import is one transaction.
+"""
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.goals import ActionStatus
+from app.repositories.goals import GoalRepository
+from app.repositories.search import SearchRepository
+from app.schemas.transfer import GoalRecord, ImportResponse, SubGoalRecord, TreeRecord
+from app.services.progress import ProgressService
+
+GOAL_TRANSFER_BATCH_SIZE = settings.goal_transfer_batch_size
+GOAL_IMPORT_MAX_BYTES = settings.goal_import_max_bytes
+
+# Export output is sent in chunks of about this many characters
+_CHUNK_SIZE = 64 * 1024
+_MAX_LINE_BYTES = 1024 * 1024
+
+CSV_COLUMNS = [column.key for column in GoalRepository.TREE_COLUMNS]
+
+_tree_record = TypeAdapter(TreeRecord)
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return getattr(value, "value", value)
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps are stored as naive UTC."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class _Ref:
+    """ID of a row waiting in the import batch, known once the batch is inserted."""
+    __slots__ = ("id",)
+
+    def __init__(self):
+        self.id: Optional[int] = None
+
+
+class _TreeImporter:
+    """
+    Buffers imported records and inserts them with one multi-row INSERT per
+    table per batch. Rows refer to their parent through a _Ref, so a batch
+    can end anywhere in a tree.
+    """
+
+    def __init__(self, goal_repo: GoalRepository, user_id: int, batch_size: int):
+        self.goal_repo = goal_repo
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.now = datetime.utcnow()
+        self.goals: List[Tuple[_Ref, Dict]] = []
+        self.subgoals: List[Tuple[_Ref, _Ref, Dict]] = []
+        self.actions: List[Tuple[_Ref, Dict]] = []
+        # The goal being read and its subgoals by exported ID
+        self.goal: Optional[Tuple[int, _Ref]] = None
+        self.subgoal_refs: Dict[int, _Ref] = {}
+        self.goal_ids: List[int] = []
+        self.counts = ImportResponse(goals=0, subgoals=0, actions=0)
+
+    async def add(self, record) -> None:
+        if len(self.goals) + len(self.subgoals) + len(self.actions) >= self.batch_size:
+            await self.flush()
+        if isinstance(record, GoalRecord):
+            ref = _Ref()
+            self.goal = (record.id, ref)
+            self.subgoal_refs = {}
+            self.goals.append((ref, {
+                "user_id": self.user_id,
+                "title": record.title,
+                "description": record.description,
+                "status": record.status,
+                "created_at": _naive_utc(record.created_at) or self.now,
+                "updated_at": self.now,
+            }))
+        elif isinstance(record, SubGoalRecord):
+            if self.goal is None or self.goal[0] != record.goal_id:
+                raise ValueError(f"subgoal {record.id} does not follow its goal {record.goal_id}")
+            ref = self.subgoal_refs[record.id] = _Ref()
+            self.subgoals.append((ref, self.goal[1], {
+                "title": record.title, "description": record.description, "category": record.category
+            }))
+        else:
+            parent = self.subgoal_refs.get(record.subgoal_id)
+            if parent is None:
+                raise ValueError(f"action {record.id} does not follow its subgoal {record.subgoal_id}")
+            completed = record.status == ActionStatus.completed
+            self.actions.append((parent, {
+                "description": record.description,
+                "estimated_minutes": record.estimated_minutes,
+                "status": record.status,
+                "completed_at": (_naive_utc(record.completed_at) or self.now) if completed else None,
+                "position": record.position,
+            }))
+
+    async def flush(self) -> None:
+        goal_ids = await self.goal_repo.insert_goals([row for _, row in self.goals])
+        for (ref, _), goal_id in zip(self.goals, goal_ids, strict=True):
+            ref.id = goal_id
+        subgoal_ids = await self.goal_repo.insert_subgoal_rows([
+            {**row, "goal_id": parent.id} for _, parent, row in self.subgoals
+        ])
+        for (ref, _, _), subgoal_id in zip(self.subgoals, subgoal_ids, strict=True):
+            ref.id = subgoal_id
+        await self.goal_repo.insert_actions([{**row, "subgoal_id": parent.id} for parent, row in self.actions])
+
+        self.goal_ids.extend(goal_ids)
+        self.counts.goals += len(self.goals)
+        self.counts.subgoals += len(self.subgoals)
+        self.counts.actions += len(self.actions)
+        self.goals, self.subgoals, self.actions = [], [], []
+
+
+class GoalTransferService:
+    def __init__(self, db: AsyncSession):
+        self.goal_repo = GoalRepository(db)
+        self.db = db
+
+    async def _tree_records(self, user_id: int) -> AsyncIterator[Dict]:
+        """A user's goals, subgoals and actions as export records, in tree order."""
+        goal_id = subgoal_id = None
+        async for row in self.goal_repo.stream_trees(user_id, GOAL_TRANSFER_BATCH_SIZE):
+            if row.goal_id != goal_id:
+                goal_id, subgoal_id = row.goal_id, None
+                yield {
+                    "type": "goal",
+                    "id": row.goal_id,
+                    "title": row.goal_title,
+                    "description": row.goal_description,
+                    "status": row.goal_status.value,
+                    "created_at": _iso(row.goal_created_at),
+                }
+            if row.subgoal_id is not None and row.subgoal_id != subgoal_id:
+                subgoal_id = row.subgoal_id
+                yield {
+                    "type": "subgoal",
+                    "id": row.subgoal_id,
+                    "goal_id": row.goal_id,
+                    "title": row.subgoal_title,
+                    "description": row.subgoal_description,
+                    "category": row.subgoal_category.value,
+                }
+            if row.action_id is not None:
+                yield {
+                    "type": "action",
+                    "id": row.action_id,
+                    "subgoal_id": row.subgoal_id,
+                    "description": row.action_description,
+                    "estimated_minutes": row.action_estimated_minutes,
+                    "status": row.action_status.value,
+                    "completed_at": _iso(row.action_completed_at),
+                    "position": row.action_position,
+                }
+
+    async def export_ndjson(self, user_id: int) -> AsyncIterator[str]:
+        """Streams the user's goal trees as NDJSON, one record per line."""
+        lines: List[str] = []
+        size = 0
+        async for record in self._tree_records(user_id):
+            line = json.dumps(record, separators=(",", ":")) + "\n"
+            lines.append(line)
+            size += len(line)
+            if size >= _CHUNK_SIZE:
+                yield "".join(lines)
+                lines, size = [], 0
+        if lines:
+            yield "".join(lines)
+
+    async def export_csv(self, user_id: int) -> AsyncIterator[str]:
+        """Streams the user's goal trees as CSV, one row per action (or childless goal/subgoal)."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_COLUMNS)
+        async for row in self.goal_repo.stream_trees(user_id, GOAL_TRANSFER_BATCH_SIZE):
+            writer.writerow([_csv_value(value) for value in row])
+            if buffer.tell() >= _CHUNK_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    async def import_ndjson(self, user_id: int, chunks: AsyncIterator[bytes]) -> ImportResponse:
+        """
+        Imports goal trees from an NDJSON export as new goals of the user.
+        Either every record is imported or none is.
+        """
+        importer = _TreeImporter(self.goal_repo, user_id, GOAL_TRANSFER_BATCH_SIZE)
+        line_number = 0
+        try:
+            async for line in self._lines(chunks):
+                line_number += 1
+                if not line.strip():
+                    continue
+                await importer.add(_tree_record.validate_json(line))
+            await importer.flush()
+            search_repo = SearchRepository(self.db)
+            progress = ProgressService(self.db)
+            for start in range(0, len(importer.goal_ids), GOAL_TRANSFER_BATCH_SIZE):
+                goal_ids = importer.goal_ids[start:start + GOAL_TRANSFER_BATCH_SIZE]
+                await search_repo.index_goals(goal_ids)
+                # Only the new goals; the user's other goals (and their ETags) are untouched
+                await progress.recompute_goals(user_id, goal_ids)
+            # Daily totals and streaks now include the imported completions
+            await progress.recompute_daily(user_id)
+            await self.db.commit()
+        except ValidationError as e:
+            await self.db.rollback()
+            error = e.errors()[0]
+            location = ".".join(str(part) for part in error["loc"])
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Line {line_number}: {location + ': ' if location else ''}{error['msg']}"
+            ) from e
+        except ValueError as e:
+            await self.db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Line {line_number}: {e}"
+            ) from e
+        except Exception:
+            await self.db.rollback()
+            raise
+        return importer.counts
+
+    async def _lines(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """Splits the upload into lines as it arrives, enforcing the size limits."""
+        buffer = b""
+        received = 0
+        async for chunk in chunks:
+            received += len(chunk)
+            if received > GOAL_IMPORT_MAX_BYTES:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Imports are limited to {GOAL_IMPORT_MAX_BYTES} bytes"
+                )
+            *lines, buffer = (buffer + chunk).split(b"\n")
+            if len(buffer) > _MAX_LINE_BYTES:
+                raise ValueError("line too long")
+            for line in lines:
+                yield line
+        if buffer:
+            yield buffer
@@ -1,10 +1,44 @@
 from app.repositories.goals import GoalRepository, SubgoalRepository, ActionRepository
+from app.repositories.search import SearchRepository
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.prompts.system import SYS_PROMPT
-from app.models.goals import Goal, SubGoal, Actions, GoalStatus, SubgoalCategory
-from google import genai
+from app.models.goals import Goal, GoalStatus, SubgoalCategory, ActionStatus
+from app.core.llm import get_llm_client, LLMError, LLMTimeoutError
+from app.services.plan_stream import PlanStreamParser, PlanStreamError
+from app.services.plan_cache import get_plan_cache
+from app.services.plan_parser import parse_plan, parse_subgoal, PlanParseError
+from app.schemas.plan import PlanSubGoal, PLAN_JSON_SCHEMA
+from app.schemas.goal import GoalListResponse, GoalSummary, GoalTreeResponse, ActionChange, ActionBatchResponse, ActionResponse
+from app.services.progress import ProgressService
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import register_collector
+from fastapi import HTTPException, status
+from contextlib import aclosing
+from datetime import datetime
+import base64
 import json
-from typing import Dict, List, Tuple, Optional
+from typing import AsyncGenerator, Dict, List, Tuple, Optional
+
+
+# The planning prompt goes in as a system instruction, a static prefix the
+# API can cache, and the response is JSON matching the plan schema
+PLAN_RESPONSE_CONFIG = {
+    "system_instruction": SYS_PROMPT,
+    "response_mime_type": "application/json",
+    "response_json_schema": PLAN_JSON_SCHEMA,
+}
+
+GOAL_TREE_CACHE_ENABLED = settings.goal_tree_cache_enabled
+GOAL_TREE_CACHE_SIZE = settings.goal_tree_cache_size
+
+# Serialized goal trees keyed by (goal_id, version). A change to the tree
+# bumps the version, so an entry is never served once it is out of date.
+tree_cache: Optional[TTLCache[bytes]] = (
+    TTLCache(maxsize=GOAL_TREE_CACHE_SIZE, ttl=86400) if GOAL_TREE_CACHE_ENABLED else None
+)
+if tree_cache is not None:
+    register_collector("goal_tree_cache", tree_cache.stats)
 
 
 class GoalService:
@@ -13,122 +47,390 @@ class GoalService:
         self.subgoal_repo = SubgoalRepository(db)
         self.action_repo = ActionRepository(db)
         self.db = db 
-        self.client = genai.Client()
+        self.plan_cache = get_plan_cache()
     
-    def make_llm_request(self, prompt: str) -> str:
+    @property
+    def llm(self):
+        """Shared LLM client, created on first use so read paths never build one."""
+        return get_llm_client()
+
+    async def make_llm_request(self, prompt: str) -> str:
         """Make a request to the LLM and return the response text."""
-        response = self.client.models.generate_content(
-            model="gemini-3-pro-preview",
-            contents=SYS_PROMPT + "\n\nUser Goal: " + prompt,
-        )
-        return response.text
+        try:
+            return await self.llm.generate(
+                "User Goal: " + prompt, PLAN_RESPONSE_CONFIG
+            )
+        except LLMTimeoutError as e:
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="Goal generation timed out"
+            ) from e
+        except LLMError as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Goal generation is temporarily unavailable"
+            ) from e
     
     def parse_response(self, response_text: str) -> Tuple[Dict, List[Dict], List[Dict]]:
         """Parse LLM response into goal, subgoals, and actions."""
-        cleaned_text = response_text.strip()
-        if cleaned_text.startswith("```json"):
-            cleaned_text = cleaned_text[7:]
-        if cleaned_text.startswith("```"):
-            cleaned_text = cleaned_text[3:]
-        if cleaned_text.endswith("```"):
-            cleaned_text = cleaned_text[:-3]
-        cleaned_text = cleaned_text.strip()
-        
-        # Parse JSON
-        data = json.loads(cleaned_text)
+        try:
+            plan = parse_plan(response_text)
+        except PlanParseError as e:
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail=f"Invalid plan from model: {e}"
+            ) from e
         
-        # Extract goal data
-        goal_data = {
-            "title": data.get("Goal", "Untitled Goal"),
-            "description": data.get("Goal", "")
-        }
+        goal_data = {"title": plan.goal, "description": plan.goal}
         
         # Extract subgoals and actions
         subgoals_data = []
         actions_data = []
-        
-        for idx, subgoal in enumerate(data.get("subGoals", [])):
-            subgoal_dict = {
-                "title": subgoal.get("title", f"Subgoal {idx + 1}"),
-                "description": subgoal.get("title", ""),
-                "category": self._determine_category(idx, len(data.get("subGoals", [])))
-            }
+        total = len(plan.sub_goals)
+        for idx, subgoal in enumerate(plan.sub_goals):
+            subgoal_dict, subgoal_actions = self._subgoal_rows(idx, subgoal, total)
             subgoals_data.append(subgoal_dict)
             
-            # Extract action steps for this subgoal
-            for action in subgoal.get("actionSteps", []):
-                action_dict = {
-                    "description": action.get("description", action.get("title", "")),
-                    "subgoal_index": idx  # Track which subgoal this belongs to
-                }
-                actions_data.append(action_dict)
+            # Track which subgoal each action belongs to
+            for action_dict in subgoal_actions:
+                actions_data.append({**action_dict, "subgoal_index": idx})
         
         return goal_data, subgoals_data, actions_data
     
-    def _determine_category(self, index: int, total: int) -> SubgoalCategory:
+    def _subgoal_rows(self, idx: int, subgoal: PlanSubGoal, total: Optional[int] = None) -> Tuple[Dict, List[Dict]]:
+        """Map one subgoal of the LLM plan to a subgoal row and its action rows."""
+        title = subgoal.title or f"Subgoal {idx + 1}"
+        subgoal_dict = {
+            "title": title,
+            "description": title,
+            "category": self._determine_category(idx, total)
+        }
+        action_dicts = [
+            {
+                "description": action.description or action.title,
+                "estimated_minutes": action.estimated_minutes
+            }
+            for action in subgoal.action_steps
+        ]
+        return subgoal_dict, action_dicts
+
+    def _determine_category(self, index: int, total: Optional[int] = None) -> SubgoalCategory:
         """Distribute subgoals across categories."""
         categories = [SubgoalCategory.skill, SubgoalCategory.mental, SubgoalCategory.communication]
         return categories[index % len(categories)]
     
+    def _group_actions(self, subgoals_data: List[Dict], actions_data: List[Dict]) -> List[List[Dict]]:
+        """Group action rows by their subgoal_index in a single pass."""
+        actions_by_subgoal: List[List[Dict]] = [[] for _ in subgoals_data]
+        for action_data in actions_data:
+            action = {k: v for k, v in action_data.items() if k != "subgoal_index"}
+            actions_by_subgoal[action_data["subgoal_index"]].append(action)
+        return actions_by_subgoal
+
+    async def generate_plan(self, prompt: str) -> Tuple[Dict, List[Dict], List[Dict]]:
+        """Return the parsed plan for a prompt, from the plan cache or the LLM."""
+        if self.plan_cache is not None:
+            plan = await self.plan_cache.get(prompt)
+            if plan is not None:
+                return plan
+
+        response_text = await self.make_llm_request(prompt)
+        plan = self.parse_response(response_text)
+        
+        if self.plan_cache is not None:
+            await self.plan_cache.set(prompt, plan)
+        return plan
+
     async def create_goal(self, prompt: str, user_id: int) -> Goal:
         """Create a goal with subgoals and actions based on user prompt."""
-        # Get LLM response
-        response_text = self.make_llm_request(prompt)
-        
-        # Parse the response
-        goal_data, subgoals_data, actions_data = self.parse_response(response_text)
-        
-        # Create the main goal
+        # Get the parsed plan (cached or freshly generated)
+        plan = await self.generate_plan(prompt)
+        return await self.save_plan(plan, user_id)
+
+    async def save_plan(self, plan: Tuple[Dict, List[Dict], List[Dict]], user_id: int) -> Goal:
+        """Persist a parsed plan as a goal tree."""
+        goal_data, subgoals_data, actions_data = plan
+        actions_by_subgoal = self._group_actions(subgoals_data, actions_data)
+
+        # Persist the whole tree in one transaction
         goal = Goal(
             user_id=user_id,
             title=goal_data["title"],
             description=goal_data["description"],
             status=GoalStatus.active
         )
-        goal = await self.goal_repo.create(goal)
-        
-        # Create subgoals and their actions
-        for subgoal_data in subgoals_data:
-            subgoal = SubGoal(
-                goal_id=goal.id,
-                title=subgoal_data["title"],
-                description=subgoal_data["description"],
-                category=subgoal_data["category"]
-            )
-            subgoal = await self.subgoal_repo.create(subgoal)
-            
-            # Create actions for this subgoal
-            subgoal_index = subgoals_data.index(subgoal_data)
-            related_actions = [a for a in actions_data if a["subgoal_index"] == subgoal_index]
-            
-            for action_data in related_actions:
-                action = Actions(
-                    subgoal_id=subgoal.id,
-                    description=action_data["description"]
-                )
-                await self.action_repo.create(action)
-        
-        return goal
+        return await self.goal_repo.create_tree(goal, subgoals_data, actions_by_subgoal)
     
-    async def delete_goal(self, goal_id: int) -> bool:
-        """Delete a goal and all its related subgoals and actions."""
-        # Get the goal
+    async def create_goal_stream(self, prompt: str, user_id: int) -> AsyncGenerator[Dict, None]:
+        """
+        Create a goal from a streamed LLM response, yielding an event as soon as
+        the goal and each subgoal (with its actions) has been written.
+
+        All rows go into one transaction that is committed only once the full
+        plan has arrived, so a truncated or malformed stream leaves nothing behind.
+        """
+        cached = await self.plan_cache.get(prompt) if self.plan_cache is not None else None
+        rows = self._cached_plan_rows(cached) if cached is not None else self._streamed_plan_rows(prompt)
+
+        goal: Optional[Goal] = None
+        goal_data: Dict = {}
+        subgoals_data: List[Dict] = []
+        actions_data: List[Dict] = []
+        try:
+            async for kind, value in rows:
+                if goal is None:
+                    title = value if kind == "goal" and isinstance(value, str) else prompt
+                    goal_data = {"title": title, "description": title}
+                    goal = await self.goal_repo.insert_goal(
+                        Goal(user_id=user_id, status=GoalStatus.active, **goal_data)
+                    )
+                    yield {"event": "goal", "goal": {"id": goal.id, "title": goal.title}}
+                if kind != "subgoal":
+                    continue
+                subgoal_dict, action_dicts = value
+                index = len(subgoals_data)
+                subgoal_ids = await self.goal_repo.insert_subgoals(
+                    goal.id, [{**subgoal_dict, "action_count": len(action_dicts)}]
+                )
+                await self.goal_repo.insert_actions([
+                    {**action, "subgoal_id": subgoal_ids[0], "position": position}
+                    for position, action in enumerate(action_dicts)
+                ])
+                subgoals_data.append(subgoal_dict)
+                actions_data.extend({**action, "subgoal_index": index} for action in action_dicts)
+                yield {
+                    "event": "subgoal",
+                    "index": index,
+                    "subgoal": {
+                        "id": subgoal_ids[0],
+                        "title": subgoal_dict["title"],
+                        "description": subgoal_dict["description"],
+                        "category": subgoal_dict["category"].value
+                    },
+                    "actions": action_dicts
+                }
+            if goal is None:
+                raise PlanStreamError("The model returned no plan")
+            if not subgoals_data:
+                # The non-streaming path rejects this through the plan schema
+                raise PlanStreamError("The plan has no subgoals")
+            goal.subgoal_count = len(subgoals_data)
+            goal.action_count = len(actions_data)
+            await SearchRepository(self.db).index_goals([goal.id])
+            await self.db.commit()
+        except LLMTimeoutError:
+            await self.db.rollback()
+            yield {"event": "error", "detail": "Goal generation timed out"}
+            return
+        except LLMError:
+            await self.db.rollback()
+            yield {"event": "error", "detail": "Goal generation is temporarily unavailable"}
+            return
+        except (PlanStreamError, PlanParseError) as e:
+            await self.db.rollback()
+            yield {"event": "error", "detail": f"Invalid plan from model: {e}"}
+            return
+        except Exception:
+            await self.db.rollback()
+            raise
+        finally:
+            # Releases the LLM slot now if the plan failed or the client went away
+            await rows.aclose()
+
+        if cached is None and self.plan_cache is not None:
+            await self.plan_cache.set(prompt, (goal_data, subgoals_data, actions_data))
+        yield {"event": "done", "goal_id": goal.id, "subgoals": len(subgoals_data)}
+
+    async def _streamed_plan_rows(self, prompt: str) -> AsyncGenerator[Tuple[str, object], None]:
+        """Yield ("goal", title) and ("subgoal", (row, action rows)) as the LLM streams them."""
+        parser = PlanStreamParser()
+        index = 0
+        async with aclosing(self.llm.stream("User Goal: " + prompt, PLAN_RESPONSE_CONFIG)) as chunks:
+            async for chunk in chunks:
+                for kind, value in parser.feed(chunk):
+                    if kind == "subgoal":
+                        # Same validation as the non-streaming path, one subgoal at a time
+                        value = self._subgoal_rows(index, parse_subgoal(value))
+                        index += 1
+                    yield kind, value
+        parser.close()
+
+    async def _cached_plan_rows(self, plan: Tuple[Dict, List[Dict], List[Dict]]) -> AsyncGenerator[Tuple[str, object], None]:
+        """Yield a cached plan in the same shape as _streamed_plan_rows."""
+        goal_data, subgoals_data, actions_data = plan
+        actions_by_subgoal = self._group_actions(subgoals_data, actions_data)
+        yield "goal", goal_data["title"]
+        for subgoal_dict, action_dicts in zip(subgoals_data, actions_by_subgoal, strict=True):
+            yield "subgoal", (subgoal_dict, action_dicts)
+
+    async def delete_goal(self, goal_id: int, user_id: int, archive: bool = False) -> None:
+        """
+        Delete a user's goal with all its subgoals and actions in one
+        transaction, or with `archive` move them to the archive tables.
+        """
         goal = await self.goal_repo.get_by_id(goal_id)
-        if not goal:
-            return False
-        
-        await self.goal_repo.delete(goal_id)
-        return True
+        if not goal or goal.user_id != user_id:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Goal not found"
+            )
+        try:
+            if archive:
+                await self.goal_repo.archive_trees([goal_id])
+            else:
+                await self.goal_repo.delete_trees([goal_id])
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
     
     async def get_goal(self, goal_id: int) -> Goal:
         """Retrieve a goal by ID."""
         return await self.goal_repo.get_by_id(goal_id)
     
+    async def list_goals(
+        self,
+        user_id: int,
+        limit: int,
+        cursor: Optional[str] = None,
+        goal_status: Optional[GoalStatus] = None,
+        include_counts: bool = False
+    ) -> GoalListResponse:
+        """List a user's goals newest first, one keyset-paginated page at a time."""
+        after = self._decode_cursor(cursor) if cursor else None
+        # Fetch one extra row to learn whether another page exists
+        goals = await self.goal_repo.list_for_user(user_id, limit + 1, goal_status, after)
+        has_more = len(goals) > limit
+        goals = goals[:limit]
+
+        # Counts come from the goals' progress counters, no aggregation needed
+        items = [GoalSummary.model_validate(goal) for goal in goals]
+        if not include_counts:
+            for item in items:
+                item.subgoal_count = item.action_count = item.completed_count = None
+
+        next_cursor = self._encode_cursor(goals[-1]) if has_more else None
+        return GoalListResponse(items=items, next_cursor=next_cursor)
+
+    def _encode_cursor(self, goal: Goal) -> str:
+        raw = json.dumps([goal.created_at.isoformat(), goal.id])
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def _decode_cursor(self, cursor: str) -> Tuple[datetime, int]:
+        try:
+            created_at, goal_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return datetime.fromisoformat(created_at), int(goal_id)
+        except (ValueError, TypeError) as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            ) from e
+
+    async def get_goal_tree(self, goal_id: int, user_id: int) -> Goal:
+        """Retrieve a user's goal with all subgoals and actions loaded."""
+        goal = await self.goal_repo.get_tree(goal_id)
+        if not goal or goal.user_id != user_id:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Goal not found"
+            )
+        return goal
+
+    async def get_goal_version(self, goal_id: int, user_id: int) -> Tuple[int, datetime]:
+        """A user's goal's version and updated_at, from one lookup that loads nothing else."""
+        row = await self.goal_repo.get_version(goal_id)
+        if row is None or row.user_id != user_id:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Goal not found"
+            )
+        return row.version, row.updated_at
+
+    async def get_goal_tree_json(
+        self, goal_id: int, user_id: int, version: Optional[Tuple[int, datetime]] = None
+    ) -> Tuple[bytes, int, datetime]:
+        """
+        A user's goal tree serialized as JSON, with the version and updated_at
+        it was read at. With the tree cache enabled, the tree is only loaded
+        when its current version isn't cached (`version` if already looked up).
+        """
+        if tree_cache is not None:
+            version = version or await self.get_goal_version(goal_id, user_id)
+            body = tree_cache.get((goal_id, version[0]))
+            if body is not None:
+                return body, version[0], version[1]
+        goal = await self.get_goal_tree(goal_id, user_id)
+        body = GoalTreeResponse.model_validate(goal).model_dump_json().encode()
+        if tree_cache is not None:
+            tree_cache.set((goal.id, goal.version), body)
+        return body, goal.version, goal.updated_at
+
+    async def update_actions(self, goal_id: int, user_id: int, changes: List[ActionChange]) -> ActionBatchResponse:
+        """
+        Applies a batch of action changes (status, description, position) in
+        one transaction with one UPDATE, together with the progress counters.
+        Either every change applies or none does: a change made against an
+        outdated version fails the whole batch with 409.
+        """
+        goal = await self.goal_repo.get_by_id(goal_id)
+        if not goal or goal.user_id != user_id:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Goal not found")
+        ids = [change.id for change in changes]
+        if len(set(ids)) != len(ids):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Each action may appear only once")
+
+        current = {action.id: action for action in await self.action_repo.get_for_goal(goal_id, ids)}
+        missing = [action_id for action_id in ids if action_id not in current]
+        if missing:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Actions not found: {missing}")
+        stale = [change.id for change in changes if current[change.id].version != change.version]
+        if stale:
+            raise self._version_conflict(stale)
+
+        now = datetime.utcnow()
+        rows: List[Dict] = []
+        transitions = []
+        for change in changes:
+            action = current[change.id]
+            row = {"id": change.id, "version": change.version}
+            if change.description is not None:
+                row["description"] = change.description
+            if change.position is not None:
+                row["position"] = change.position
+            if change.status is not None and change.status != action.status:
+                row["status"] = change.status
+                row["completed_at"] = now if change.status == ActionStatus.completed else None
+                transitions.append((action, change.status))
+            rows.append(row)
+
+        try:
+            updated = await self.action_repo.update_batch(rows)
+            if len(updated) != len(rows):
+                # Changed by someone else between our read and the UPDATE
+                raise self._version_conflict(sorted(set(ids) - {row.id for row in updated}))
+            await ProgressService(self.db).apply_transitions(user_id, goal_id, transitions, now)
+            await self.goal_repo.bump_version(goal_id)
+            await SearchRepository(self.db).reindex_actions([row["id"] for row in rows if "description" in row])
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+
+        by_id = {row.id: row for row in updated}
+        return ActionBatchResponse(items=[ActionResponse.model_validate(by_id[action_id]) for action_id in ids])
+
+    def _version_conflict(self, action_ids: List[int]) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Actions changed by another request: {action_ids}; reload and try again"
+        )
+
     async def update_goal_status(self, goal_id: int, status: GoalStatus) -> Goal:
         """Update the status of a goal."""
         goal = await self.goal_repo.get_by_id(goal_id)
         if goal:
             goal.status = status
+            goal.version += 1
             await self.db.commit()
             await self.db.refresh(goal)
         return goal
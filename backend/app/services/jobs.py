@@ -0,0 +1,614 @@
+"""
+Background goal generation jobs.
+
+Generating a plan takes a full LLM round trip. Instead of holding the HTTP
+request, a session and a pooled connection open for all of it, the request
+enqueues a job and returns 202. A fixed pool of workers on the event loop
+runs the LLM call and then persists the tree with a short-lived session.
+
+- Jobs are kept in process (JOB_STORE=memory) or in the generation_jobs
+  table (JOB_STORE=db), which also survives restarts
+- Failed attempts are retried with jittered exponential backoff; after
+  JOB_MAX_ATTEMPTS the job is dead-lettered (status Dead, last error kept)
+- An identical prompt from the same user returns the job already in flight
+  (checked under a lock that is per process; with several workers sharing
+  JOB_STORE=db, two racing submits can still both create a job)
+- A worker claims a job with a conditional update (queued -> running), so a
+  job enqueued by several processes still runs once. Running jobs heartbeat;
+  one whose heartbeat is older than JOB_LEASE_SECONDS (its process died) is
+  re-queued by the others. Likewise a queued job still waiting
+  JOB_LEASE_SECONDS after it was due (its process died before running it or
+  before its retry fired) is taken over by the others.
+"""
+import asyncio
+import hashlib
+import logging
+import random
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import ColumnElement, and_, func, select, update
+
+from app.core.config import settings
+from app.core.metrics import register_collector
+from app.database import async_session_maker
+from app.models.jobs import GenerationJob, JobStatus
+from app.services.plan_cache import normalize_prompt
+
+JOB_STORE = settings.job_store.lower()
+JOB_WORKERS = settings.job_workers
+JOB_MAX_QUEUED = settings.job_max_queued
+JOB_MAX_ATTEMPTS = settings.job_max_attempts
+JOB_BACKOFF_BASE_SECONDS = settings.job_backoff_base_seconds
+JOB_BACKOFF_MAX_SECONDS = settings.job_backoff_max_seconds
+JOB_RETENTION_SECONDS = settings.job_retention_seconds
+JOB_LEASE_SECONDS = settings.job_lease_seconds
+
+UNFINISHED = (JobStatus.queued, JobStatus.running)
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """Raised when the queue cannot accept more jobs."""
+
+
+@dataclass
+class Job:
+    id: str
+    user_id: int
+    prompt: str
+    dedup_key: str
+    status: JobStatus = JobStatus.queued
+    attempts: int = 0
+    goal_id: Optional[int] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None
+    run_after: Optional[datetime] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status not in UNFINISHED
+
+    @property
+    def last_seen(self) -> Optional[datetime]:
+        """When a worker last showed it was running the job."""
+        # Jobs from before heartbeats existed only have started_at
+        return self.heartbeat_at or self.started_at
+
+    @property
+    def due_at(self) -> Optional[datetime]:
+        """When a queued job became due to run."""
+        return self.run_after or self.created_at
+
+
+def dedup_key(user_id: int, prompt: str) -> str:
+    return hashlib.sha256(f"{user_id}\n{normalize_prompt(prompt)}".encode()).hexdigest()
+
+
+class JobStore:
+    """Interface for where job state lives."""
+
+    async def add(self, job: Job) -> None:
+        raise NotImplementedError
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        raise NotImplementedError
+
+    async def save(self, job: Job) -> None:
+        raise NotImplementedError
+
+    async def find_active(self, key: str) -> Optional[Job]:
+        """Returns the queued or running job with the given dedup key."""
+        raise NotImplementedError
+
+    async def unfinished(self) -> List[Job]:
+        """Returns queued and running jobs, oldest first (used to resume on startup)."""
+        raise NotImplementedError
+
+    async def claim(self, job_id: str, now: datetime) -> Optional[Job]:
+        """
+        Marks a queued job running and counts the attempt, atomically.
+        Returns None if the job is not queued (finished, or claimed elsewhere).
+        """
+        raise NotImplementedError
+
+    async def heartbeat(self, job_id: str, now: datetime) -> None:
+        """Renews the lease of a running job."""
+        raise NotImplementedError
+
+    async def requeue_expired(self, before: datetime) -> List[Job]:
+        """Re-queues running jobs last heartbeated before `before` and returns them."""
+        raise NotImplementedError
+
+    async def take_stranded(self, before: datetime, now: datetime) -> List[Job]:
+        """
+        Returns queued jobs that were due before `before`, atomically moving
+        their run_after to `now` so other processes leave them alone for a
+        lease.
+        """
+        raise NotImplementedError
+
+
+class InMemoryJobStore(JobStore):
+    def __init__(self, retention: float = JOB_RETENTION_SECONDS):
+        self.retention = timedelta(seconds=retention)
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active: Dict[str, str] = {}
+
+    async def add(self, job: Job) -> None:
+        self._prune()
+        self._jobs[job.id] = job
+        self._active[job.dedup_key] = job.id
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def save(self, job: Job) -> None:
+        self._jobs[job.id] = job
+        if job.finished and self._active.get(job.dedup_key) == job.id:
+            del self._active[job.dedup_key]
+
+    async def find_active(self, key: str) -> Optional[Job]:
+        job_id = self._active.get(key)
+        return self._jobs.get(job_id) if job_id else None
+
+    async def unfinished(self) -> List[Job]:
+        return [job for job in self._jobs.values() if not job.finished]
+
+    async def claim(self, job_id: str, now: datetime) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is None or job.status != JobStatus.queued:
+            return None
+        job.status = JobStatus.running
+        job.attempts += 1
+        job.started_at = job.heartbeat_at = now
+        return job
+
+    async def heartbeat(self, job_id: str, now: datetime) -> None:
+        job = self._jobs.get(job_id)
+        if job is not None and job.status == JobStatus.running:
+            job.heartbeat_at = now
+
+    async def requeue_expired(self, before: datetime) -> List[Job]:
+        expired = [
+            job for job in self._jobs.values()
+            if job.status == JobStatus.running and _before(job.last_seen, before)
+        ]
+        for job in expired:
+            job.status = JobStatus.queued
+        return expired
+
+    async def take_stranded(self, before: datetime, now: datetime) -> List[Job]:
+        stranded = [
+            job for job in self._jobs.values()
+            if job.status == JobStatus.queued and _before(job.due_at, before)
+        ]
+        for job in stranded:
+            job.run_after = now
+        return stranded
+
+    def _prune(self) -> None:
+        """Drops finished jobs older than the retention window."""
+        cutoff = datetime.utcnow() - self.retention
+        while self._jobs:
+            job = next(iter(self._jobs.values()))
+            if not job.finished or not _before(job.created_at, cutoff):
+                break
+            self._jobs.popitem(last=False)
+
+
+def _before(moment: Optional[datetime], cutoff: datetime) -> bool:
+    """Like `moment < cutoff`, with an unknown moment never before anything (as NULL in SQL)."""
+    return moment is not None and moment < cutoff
+
+
+class SqlJobStore(JobStore):
+    """Keeps jobs in the generation_jobs table, one short session per operation."""
+
+    def __init__(self, session_maker=async_session_maker):
+        self.session_maker = session_maker
+
+    async def add(self, job: Job) -> None:
+        async with self.session_maker() as db:
+            db.add(GenerationJob(**asdict(job)))
+            await db.commit()
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        async with self.session_maker() as db:
+            row = await db.get(GenerationJob, job_id)
+            return self._to_job(row) if row else None
+
+    async def save(self, job: Job) -> None:
+        values = asdict(job)
+        del values["id"]
+        async with self.session_maker() as db:
+            await db.execute(
+                update(GenerationJob).where(GenerationJob.id == job.id).values(**values)
+            )
+            await db.commit()
+
+    async def find_active(self, key: str) -> Optional[Job]:
+        async with self.session_maker() as db:
+            result = await db.execute(
+                select(GenerationJob)
+                .where(GenerationJob.dedup_key == key, GenerationJob.status.in_(UNFINISHED))
+                .limit(1)
+            )
+            row = result.scalars().first()
+            return self._to_job(row) if row else None
+
+    async def unfinished(self) -> List[Job]:
+        async with self.session_maker() as db:
+            result = await db.execute(
+                select(GenerationJob)
+                .where(GenerationJob.status.in_(UNFINISHED))
+                .order_by(GenerationJob.created_at)
+            )
+            return [self._to_job(row) for row in result.scalars().all()]
+
+    async def claim(self, job_id: str, now: datetime) -> Optional[Job]:
+        async with self.session_maker() as db:
+            result = await db.execute(
+                update(GenerationJob)
+                .where(GenerationJob.id == job_id, GenerationJob.status == JobStatus.queued)
+                .values(
+                    status=JobStatus.running,
+                    attempts=GenerationJob.attempts + 1,
+                    started_at=now,
+                    heartbeat_at=now,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            if result.rowcount == 0:
+                return None
+            row = await db.get(GenerationJob, job_id)
+            return self._to_job(row) if row else None
+
+    async def heartbeat(self, job_id: str, now: datetime) -> None:
+        async with self.session_maker() as db:
+            await db.execute(
+                update(GenerationJob)
+                .where(GenerationJob.id == job_id, GenerationJob.status == JobStatus.running)
+                .values(heartbeat_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+
+    async def requeue_expired(self, before: datetime) -> List[Job]:
+        # Jobs from before heartbeats existed only have started_at
+        last_seen: ColumnElement[datetime] = func.coalesce(GenerationJob.heartbeat_at, GenerationJob.started_at)
+        return await self._update_returning(
+            and_(GenerationJob.status == JobStatus.running, last_seen < before),
+            {"status": JobStatus.queued},
+        )
+
+    async def take_stranded(self, before: datetime, now: datetime) -> List[Job]:
+        # Jobs that never backed off became due when they were created
+        due_at: ColumnElement[datetime] = func.coalesce(GenerationJob.run_after, GenerationJob.created_at)
+        return await self._update_returning(
+            and_(GenerationJob.status == JobStatus.queued, due_at < before),
+            {"run_after": now},
+        )
+
+    async def _update_returning(self, condition: ColumnElement[bool], values: Dict) -> List[Job]:
+        """Updates the jobs matching `condition` and returns them, oldest first."""
+        async with self.session_maker() as db:
+            result = await db.execute(
+                update(GenerationJob)
+                .where(condition)
+                .values(**values)
+                .returning(GenerationJob.id)
+                .execution_options(synchronize_session=False)
+            )
+            ids = list(result.scalars().all())
+            await db.commit()
+            if not ids:
+                return []
+            result = await db.execute(
+                select(GenerationJob).where(GenerationJob.id.in_(ids)).order_by(GenerationJob.created_at)
+            )
+            return [self._to_job(row) for row in result.scalars().all()]
+
+    def _to_job(self, row: GenerationJob) -> Job:
+        return Job(**{column.key: getattr(row, column.key) for column in GenerationJob.__table__.columns})
+
+
+async def run_generation_job(job: Job) -> int:
+    """Generates the plan, then persists it. Returns the new goal's ID."""
+    from app.services.goals import GoalService
+
+    # The session only checks out a connection once the plan is saved, so
+    # nothing is held open during the LLM call
+    async with async_session_maker() as db:
+        service = GoalService(db)
+        plan = await service.generate_plan(job.prompt)
+        goal = await service.save_plan(plan, job.user_id)
+        return goal.id
+
+
+class JobQueue:
+    def __init__(
+        self,
+        store: JobStore,
+        runner: Callable[[Job], Awaitable[int]] = run_generation_job,
+        workers: int = JOB_WORKERS,
+        max_queued: int = JOB_MAX_QUEUED,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        backoff_base: float = JOB_BACKOFF_BASE_SECONDS,
+        backoff_max: float = JOB_BACKOFF_MAX_SECONDS,
+        lease_seconds: float = JOB_LEASE_SECONDS,
+    ):
+        self.store = store
+        self.runner = runner
+        self.workers = max(workers, 1)
+        self.max_queued = max_queued
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self._retries: Set[asyncio.TimerHandle] = set()
+        self._enqueued_at: Dict[str, float] = {}
+        self._watchers: Dict[str, Set[asyncio.Queue]] = {}
+        # Deduplicates submits within this process only
+        self._submit_lock = asyncio.Lock()
+
+        # Metrics
+        self.running = 0
+        self.submitted = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.succeeded = 0
+        self.retried = 0
+        self.dead = 0
+        self.skipped = 0
+        self.requeued = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.run_time_total = 0.0
+        self.run_time_max = 0.0
+
+    async def start(self) -> None:
+        """
+        Enqueues queued jobs and jobs whose worker died, then starts the
+        workers. Jobs another live process is running keep their lease, and
+        jobs backing off before a retry wait out their delay.
+        """
+        for job in await self.store.requeue_expired(self._lease_cutoff()):
+            self.requeued += 1
+            self._enqueue(job.id)
+        now = datetime.utcnow()
+        for job in await self.store.unfinished():
+            if job.status != JobStatus.queued or job.id in self._enqueued_at:
+                continue
+            if job.run_after is not None and job.run_after > now:
+                self._schedule(job.id, (job.run_after - now).total_seconds())
+            else:
+                self._enqueue(job.id)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._reap()))
+
+    async def stop(self) -> None:
+        for handle in self._retries:
+            handle.cancel()
+        self._retries.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, user_id: int, prompt: str) -> Tuple[Job, bool]:
+        """
+        Enqueues a generation job. Returns (job, created); created is False
+        when an identical prompt from the same user is already in flight.
+        """
+        key = dedup_key(user_id, prompt)
+        async with self._submit_lock:
+            existing = await self.store.find_active(key)
+            if existing is not None:
+                self.deduplicated += 1
+                return existing, False
+            if self._queue.qsize() >= self.max_queued:
+                self.rejected += 1
+                raise JobQueueFull("Generation queue is full")
+
+            job = Job(
+                id=uuid.uuid4().hex,
+                user_id=user_id,
+                prompt=prompt,
+                dedup_key=key,
+                created_at=datetime.utcnow(),
+            )
+            await self.store.add(job)
+        self.submitted += 1
+        self._enqueue(job.id)
+        return job, True
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await self.store.get(job_id)
+
+    async def subscribe(self, job_id: str) -> AsyncIterator[Job]:
+        """Yields the job now and after every status change until it finishes."""
+        updates: asyncio.Queue = asyncio.Queue()
+        self._watchers.setdefault(job_id, set()).add(updates)
+        try:
+            job = await self.store.get(job_id)
+            while job is not None:
+                yield job
+                if job.finished:
+                    return
+                job = await updates.get()
+        finally:
+            watchers = self._watchers.get(job_id)
+            if watchers is not None:
+                watchers.discard(updates)
+                if not watchers:
+                    del self._watchers[job_id]
+
+    def _lease_cutoff(self) -> datetime:
+        return datetime.utcnow() - timedelta(seconds=self.lease_seconds)
+
+    async def _reap(self) -> None:
+        """
+        Takes over jobs a crashed process left behind: running jobs whose
+        worker stopped heartbeating, and queued jobs (new, or waiting for a
+        retry) still not run a lease after they were due.
+        """
+        while True:
+            await asyncio.sleep(self.lease_seconds)
+            try:
+                for job in await self.store.requeue_expired(self._lease_cutoff()):
+                    self.requeued += 1
+                    self._enqueue(job.id)
+                for job in await self.store.take_stranded(self._lease_cutoff(), datetime.utcnow()):
+                    # Still waiting in this process's own queue
+                    if job.id not in self._enqueued_at:
+                        self.requeued += 1
+                        self._enqueue(job.id)
+            except Exception:
+                logger.exception("Re-queueing expired generation jobs failed")
+
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self.store.heartbeat(job_id, datetime.utcnow())
+            except Exception:
+                logger.exception("Heartbeat for generation job %s failed", job_id)
+
+    def _enqueue(self, job_id: str) -> None:
+        self._enqueued_at[job_id] = time.perf_counter()
+        self._queue.put_nowait(job_id)
+
+    def _schedule(self, job_id: str, delay: float) -> None:
+        """Enqueues the job after `delay` seconds."""
+        def retry() -> None:
+            self._retries.discard(handle)
+            self._enqueue(job_id)
+
+        handle = asyncio.get_running_loop().call_later(delay, retry)
+        self._retries.add(handle)
+
+    async def _publish(self, job: Job) -> None:
+        await self.store.save(job)
+        self._notify(job)
+
+    def _notify(self, job: Job) -> None:
+        for updates in self._watchers.get(job.id, ()):
+            updates.put_nowait(replace(job))
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        wait = time.perf_counter() - self._enqueued_at.pop(job_id, time.perf_counter())
+        self.queue_wait_total += wait
+        self.queue_wait_max = max(self.queue_wait_max, wait)
+
+        job = await self.store.claim(job_id, datetime.utcnow())
+        if job is None:
+            # Finished, or another process claimed it first
+            self.skipped += 1
+            return
+        self._notify(job)
+
+        self.running += 1
+        started_at = time.perf_counter()
+        heartbeat = asyncio.create_task(self._heartbeat(job.id))
+        try:
+            job.goal_id = await self.runner(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.error = self._describe(e)
+            await self._failed(job)
+        else:
+            job.status = JobStatus.succeeded
+            job.error = None
+            job.finished_at = datetime.utcnow()
+            self.succeeded += 1
+            await self._publish(job)
+        finally:
+            heartbeat.cancel()
+            self.running -= 1
+            duration = time.perf_counter() - started_at
+            self.run_time_total += duration
+            self.run_time_max = max(self.run_time_max, duration)
+
+    async def _failed(self, job: Job) -> None:
+        if job.attempts >= self.max_attempts:
+            job.status = JobStatus.dead
+            job.finished_at = datetime.utcnow()
+            self.dead += 1
+            await self._publish(job)
+            return
+
+        # Full jitter keeps retries of a burst of failed jobs from lining up
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (job.attempts - 1)))
+        job.status = JobStatus.queued
+        # Stored so that another process can take the retry over if this one dies
+        job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+        self.retried += 1
+        await self._publish(job)
+        self._schedule(job.id, delay)
+
+    def _describe(self, error: Exception) -> str:
+        if isinstance(error, HTTPException):
+            return str(error.detail)
+        return f"{type(error).__name__}: {error}"[:500]
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "workers": self.workers,
+            "depth": self._queue.qsize(),
+            "retry_scheduled": len(self._retries),
+            "running": self.running,
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+            "succeeded": self.succeeded,
+            "retried": self.retried,
+            "dead": self.dead,
+            "skipped": self.skipped,
+            "requeued": self.requeued,
+            "queue_wait_seconds_total": self.queue_wait_total,
+            "queue_wait_seconds_max": self.queue_wait_max,
+            "run_seconds_total": self.run_time_total,
+            "run_seconds_max": self.run_time_max,
+        }
+
+
+_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """Returns the process-wide generation job queue, creating it on first use."""
+    if _queue is None:
+        store = SqlJobStore() if JOB_STORE == "db" else InMemoryJobStore()
+        return set_job_queue(JobQueue(store))
+    return _queue
+
+
+def set_job_queue(queue: JobQueue) -> JobQueue:
+    """Replaces the process-wide generation job queue."""
+    global _queue
+    _queue = queue
+    register_collector("generation_jobs", queue.stats)
+    return queue
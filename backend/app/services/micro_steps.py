@@ -0,0 +1,275 @@
+"""
+Micro-steps: an action broken down by the model into 5-10 minute steps.
+
+Generating them along with every plan would add one model call per action
+(36-64 per plan) for actions most users never open, so they are generated
+the first time an action is expanded and kept from then on:
+
+1. an in-process TTL/LRU cache of each action's micro-steps
+2. the micro_steps table, shared by workers and kept across restarts
+3. otherwise one model call: concurrent requests for the same action share
+   it (single-flight), and claim_micro_steps lets only one worker store it.
+   A request that starts a call goes through the "llm" admission limits
+   like the other generation routes; reads and requests joining a call
+   already in flight don't.
+
+Opening an action also prefetches micro-steps for the next action of its
+subgoal in the background, a bounded number at a time per worker, since
+users tend to work through a subgoal in order.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.admission import (
+    ADMISSION_ENABLED,
+    AdmissionRejected,
+    get_route_admission,
+    retry_after_header,
+)
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.llm import LLMError, LLMTimeoutError, get_llm_client
+from app.core.metrics import register_collector
+from app.database import async_session_maker
+from app.prompts.system import MICRO_STEP_PROMPT
+from app.repositories.goals import ActionRepository, GoalRepository, MicroStepRepository
+from app.schemas.goal import MicroStepListResponse, MicroStepResponse
+from app.schemas.plan import MICRO_STEP_JSON_SCHEMA, MicroStepPlan
+from app.services.plan_parser import repair_json
+
+MICRO_STEP_CACHE_SIZE = settings.micro_step_cache_size
+MICRO_STEP_CACHE_TTL_SECONDS = settings.micro_step_cache_ttl_seconds
+MICRO_STEP_PREFETCH_MAX_CONCURRENCY = settings.micro_step_prefetch_max_concurrency
+
+MICRO_STEP_RESPONSE_CONFIG = {
+    "system_instruction": MICRO_STEP_PROMPT,
+    "response_mime_type": "application/json",
+    "response_json_schema": MICRO_STEP_JSON_SCHEMA,
+}
+
+logger = logging.getLogger(__name__)
+
+# Action ID -> (goal ID, micro-steps). Entries are shared, treat them as read-only.
+micro_step_cache: TTLCache[Tuple[int, List[MicroStepResponse]]] = TTLCache(
+    maxsize=MICRO_STEP_CACHE_SIZE, ttl=MICRO_STEP_CACHE_TTL_SECONDS
+)
+
+
+class MicroStepStats:
+    def __init__(self):
+        self.generated = 0
+        self.coalesced = 0
+        self.loaded = 0
+        self.prefetched = 0
+        self.prefetch_skipped = 0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "generated": self.generated,
+            "coalesced": self.coalesced,
+            "loaded": self.loaded,
+            "prefetched": self.prefetched,
+            "prefetch_skipped": self.prefetch_skipped,
+            "cache_size": len(micro_step_cache),
+            "cache_hits": micro_step_cache.hits,
+            "in_flight": len(_pending),
+        }
+
+
+micro_step_stats = MicroStepStats()
+register_collector("micro_steps", micro_step_stats.stats)
+
+# Action ID -> the generation running for it in this process
+_pending: Dict[int, "asyncio.Future[List[MicroStepResponse]]"] = {}
+_prefetching: Set[int] = set()
+# Actions whose next sibling has already been prefetched (or has none)
+_prefetched: TTLCache[bool] = TTLCache(maxsize=MICRO_STEP_CACHE_SIZE, ttl=MICRO_STEP_CACHE_TTL_SECONDS)
+
+
+def _should_prefetch(action_id: int) -> bool:
+    return MICRO_STEP_PREFETCH_MAX_CONCURRENCY > 0 and action_id not in _prefetched and action_id not in _prefetching
+
+
+class MicroStepService:
+    def __init__(self, db: AsyncSession):
+        self.goal_repo = GoalRepository(db)
+        self.action_repo = ActionRepository(db)
+        self.micro_step_repo = MicroStepRepository(db)
+        self.db = db
+
+    @property
+    def llm(self):
+        return get_llm_client()
+
+    async def get_micro_steps(
+        self, goal_id: int, action_id: int, user_id: int, ip: Optional[str] = None
+    ) -> Tuple[MicroStepListResponse, bool]:
+        """
+        An action's micro-steps, generated on first use. Also returns whether
+        the next action's micro-steps should be prefetched.
+        """
+        items = await self._read(goal_id, action_id, user_id)
+        if items is None:
+            items = await self._admit_and_generate(action_id, user_id, ip)
+        return MicroStepListResponse(action_id=action_id, items=items), _should_prefetch(action_id)
+
+    async def _admit_and_generate(self, action_id: int, user_id: int, ip: Optional[str]) -> List[MicroStepResponse]:
+        """Generates an action's micro-steps, holding an "llm" admission slot unless a call is already in flight."""
+        if not ADMISSION_ENABLED or action_id in _pending:
+            return await generate_micro_steps(action_id)
+        try:
+            release = await get_route_admission("llm").enter(ip, user_id)
+        except AdmissionRejected as e:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, try again later",
+                headers={"Retry-After": retry_after_header(e.retry_after)}
+            ) from e
+        try:
+            return await generate_micro_steps(action_id)
+        finally:
+            release()
+
+    async def _read(self, goal_id: int, action_id: int, user_id: int) -> Optional[List[MicroStepResponse]]:
+        """
+        An action's micro-steps from the cache or the database, None if they
+        were never generated. Ends the read transaction, so no connection is
+        held while the model replies or the prefetch runs.
+        """
+        try:
+            goal = await self.goal_repo.get_by_id(goal_id)
+            if not goal or goal.user_id != user_id:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Goal not found")
+            cached = micro_step_cache.get(action_id)
+            if cached is not None and cached[0] == goal_id:
+                return cached[1]
+
+            actions = await self.action_repo.get_for_goal(goal_id, [action_id])
+            if not actions:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Action not found")
+            if actions[0].micro_steps_generated_at is None:
+                return None
+            steps = await self.micro_step_repo.list_for_action(action_id)
+            items = [MicroStepResponse.model_validate(step) for step in steps]
+            micro_step_cache.set(action_id, (goal_id, items))
+            micro_step_stats.loaded += 1
+            return items
+        finally:
+            await self.db.commit()
+
+    async def generate(self, action_id: int) -> List[MicroStepResponse]:
+        """
+        Generates and stores an action's micro-steps, unless they already
+        exist. Runs in its own session on the primary database.
+        """
+        row = await self.action_repo.get_with_context(action_id)
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Action not found")
+        action = row.Actions
+        if action.micro_steps_generated_at is None:
+            contents = (
+                f"Goal: {row.goal_title}\n"
+                f"Sub-goal: {row.subgoal_title}\n"
+                f"Action Step: {action.description}\n"
+                f"Estimated Time: {action.estimated_minutes or 'unknown'} minutes"
+            )
+            await self.db.commit()
+            titles = self._parse(await self._generate(contents))
+            try:
+                if await self.action_repo.claim_micro_steps(action_id, datetime.utcnow()):
+                    steps = await self.micro_step_repo.insert_for_action(action_id, titles)
+                    micro_step_stats.generated += 1
+                else:
+                    # Another worker stored its micro-steps in the meantime
+                    steps = await self.micro_step_repo.list_for_action(action_id)
+                items = [MicroStepResponse.model_validate(step) for step in steps]
+                await self.db.commit()
+            except Exception:
+                await self.db.rollback()
+                raise
+        else:
+            items = [MicroStepResponse.model_validate(step) for step in await self.micro_step_repo.list_for_action(action_id)]
+            micro_step_stats.loaded += 1
+        micro_step_cache.set(action_id, (row.goal_id, items))
+        return items
+
+    def _parse(self, text: str) -> List[str]:
+        """Validates the model output, trying the plan parser's repairs once."""
+        try:
+            return [step.title for step in MicroStepPlan.model_validate_json(text).micro_steps]
+        except ValidationError as e:
+            error = e
+        repaired, repairs = repair_json(text)
+        if repairs:
+            try:
+                return [step.title for step in MicroStepPlan.model_validate_json(repaired).micro_steps]
+            except ValidationError as e:
+                error = e
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"Invalid micro-steps from model: {error.errors()[0]['msg']}"
+        )
+
+    async def _generate(self, contents: str) -> str:
+        try:
+            return await self.llm.generate(contents, MICRO_STEP_RESPONSE_CONFIG)
+        except LLMTimeoutError as e:
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="Micro-step generation timed out"
+            ) from e
+        except LLMError as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Micro-step generation is temporarily unavailable"
+            ) from e
+
+
+async def _generate_in_session(action_id: int) -> List[MicroStepResponse]:
+    async with async_session_maker() as db:
+        return await MicroStepService(db).generate(action_id)
+
+
+async def generate_micro_steps(action_id: int) -> List[MicroStepResponse]:
+    """
+    Generates an action's micro-steps. Concurrent calls for the same action
+    share one generation, which keeps running if a caller goes away.
+    """
+    pending = _pending.get(action_id)
+    if pending is None:
+        pending = asyncio.ensure_future(_generate_in_session(action_id))
+        _pending[action_id] = pending
+        pending.add_done_callback(lambda _: _pending.pop(action_id, None))
+    else:
+        micro_step_stats.coalesced += 1
+    return await asyncio.shield(pending)
+
+
+async def prefetch_next_micro_steps(action_id: int) -> None:
+    """Background task: generates micro-steps for the action after `action_id` if it has none yet."""
+    if not _should_prefetch(action_id):
+        return
+    if len(_prefetching) >= MICRO_STEP_PREFETCH_MAX_CONCURRENCY:
+        micro_step_stats.prefetch_skipped += 1
+        return
+    _prefetching.add(action_id)
+    try:
+        async with async_session_maker() as db:
+            action_repo = ActionRepository(db)
+            action = await action_repo.get_by_id(action_id)
+            sibling = await action_repo.next_sibling(action) if action is not None else None
+        if sibling is not None and sibling.micro_steps_generated_at is None and sibling.id not in micro_step_cache:
+            micro_step_stats.prefetched += 1
+            await generate_micro_steps(sibling.id)
+        _prefetched.set(action_id, True)
+    except Exception:
+        # The sibling is generated when it is opened instead
+        logger.exception("Prefetching micro-steps after action %s failed", action_id)
+    finally:
+        _prefetching.discard(action_id)
@@ -0,0 +1,253 @@
+"""
+Cache of parsed goal plans, keyed by the normalized user prompt.
+
+Lookups go through three tiers:
+
+1. an in-process TTL/LRU cache keyed by the normalized prompt
+2. an optional shared backend (Redis) so workers reuse each other's plans
+3. an optional in-process MinHash index that matches near-identical prompts
+"""
+import hashlib
+import json
+import random
+import re
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.llm import LLM_MODEL
+from app.core.metrics import register_collector
+from app.models.goals import SubgoalCategory
+from app.prompts.system import SYS_PROMPT
+
+PLAN_CACHE_ENABLED = settings.plan_cache_enabled
+PLAN_CACHE_MAX_ENTRIES = settings.plan_cache_max_entries
+PLAN_CACHE_TTL_SECONDS = settings.plan_cache_ttl_seconds
+PLAN_CACHE_SIMILARITY_THRESHOLD = settings.plan_cache_similarity_threshold
+PLAN_CACHE_REDIS_URL = settings.plan_cache_redis_url
+
+Plan = Tuple[Dict, List[Dict], List[Dict]]
+
+# Plans generated with a different model or system prompt must not be reused
+_PLAN_VERSION = hashlib.sha256(f"{LLM_MODEL}\n{SYS_PROMPT}".encode()).hexdigest()[:12]
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercases the prompt and strips punctuation and repeated whitespace."""
+    return _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", prompt.lower())).strip()
+
+
+def _plan_key(normalized: str) -> str:
+    digest = hashlib.sha256(normalized.encode()).hexdigest()
+    return f"plan:{_PLAN_VERSION}:{digest}"
+
+
+def _dump_plan(plan: Plan) -> str:
+    goal_data, subgoals_data, actions_data = plan
+    subgoals = [{**subgoal, "category": subgoal["category"].value} for subgoal in subgoals_data]
+    return json.dumps([goal_data, subgoals, actions_data])
+
+
+def _load_plan(raw: str) -> Plan:
+    goal_data, subgoals, actions_data = json.loads(raw)
+    subgoals_data = [
+        {**subgoal, "category": SubgoalCategory(subgoal["category"])} for subgoal in subgoals
+    ]
+    return goal_data, subgoals_data, actions_data
+
+
+class MinHashIndex:
+    """
+    Locality-sensitive index over character trigrams. Prompts whose estimated
+    Jaccard similarity reaches the threshold are considered the same goal.
+    """
+
+    _PRIME = (1 << 61) - 1
+
+    def __init__(self, threshold: float, num_perm: int = 64, bands: int = 16):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = random.Random(0)
+        self._perms = [
+            (rng.randrange(1, self._PRIME), rng.randrange(0, self._PRIME)) for _ in range(num_perm)
+        ]
+        self._signatures: Dict[Hashable, Tuple[int, ...]] = {}
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], Set[Hashable]] = {}
+
+    def _signature(self, text: str) -> Tuple[int, ...]:
+        padded = f"  {text} "
+        shingles = {
+            int.from_bytes(hashlib.blake2b(padded[i:i + 3].encode(), digest_size=8).digest(), "big")
+            for i in range(len(padded) - 2)
+        }
+        return tuple(
+            min((a * shingle + b) % self._PRIME for shingle in shingles) for a, b in self._perms
+        )
+
+    def _bands(self, signature: Tuple[int, ...]):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+
+    def add(self, key: Hashable, text: str) -> None:
+        self.remove(key)
+        signature = self._signature(text)
+        self._signatures[key] = signature
+        for bucket in self._bands(signature):
+            self._buckets.setdefault(bucket, set()).add(key)
+
+    def remove(self, key: Hashable) -> None:
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for bucket in self._bands(signature):
+            keys = self._buckets.get(bucket)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._buckets[bucket]
+
+    def query(self, text: str) -> Optional[Hashable]:
+        """Returns the indexed key most similar to `text`, if above the threshold."""
+        signature = self._signature(text)
+        candidates: Set[Hashable] = set()
+        for bucket in self._bands(signature):
+            candidates |= self._buckets.get(bucket, set())
+        best_key, best_score = None, self.threshold
+        for key in candidates:
+            other = self._signatures[key]
+            score = sum(x == y for x, y in zip(signature, other, strict=True)) / len(signature)
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+
+class PlanCacheBackend:
+    """Interface for a cache tier shared between worker processes."""
+
+    async def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        raise NotImplementedError
+
+
+class RedisPlanCacheBackend(PlanCacheBackend):
+    """Shared tier stored in Redis. Needs the optional `redis` package."""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self._redis.get(key)
+        return value.decode() if value is not None else None
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        await self._redis.set(key, value, ex=max(int(ttl), 1))
+
+
+class PlanCache:
+    def __init__(
+        self,
+        max_entries: int = PLAN_CACHE_MAX_ENTRIES,
+        ttl: float = PLAN_CACHE_TTL_SECONDS,
+        similarity_threshold: float = PLAN_CACHE_SIMILARITY_THRESHOLD,
+        shared: Optional[PlanCacheBackend] = None,
+    ):
+        self.ttl = ttl
+        self.shared = shared
+        self.index = MinHashIndex(similarity_threshold) if similarity_threshold > 0 else None
+        self.local: TTLCache[Plan] = TTLCache(
+            max_entries, ttl, on_evict=self.index.remove if self.index else None
+        )
+
+        # Metrics
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.shared_errors = 0
+
+    async def get(self, prompt: str) -> Optional[Plan]:
+        """Returns the cached plan for the prompt (or a near-identical one)."""
+        normalized = normalize_prompt(prompt)
+        key = _plan_key(normalized)
+
+        plan: Optional[Plan] = self.local.get(key)
+        if plan is not None:
+            self.local_hits += 1
+            return plan
+
+        if self.shared is not None:
+            try:
+                raw = await self.shared.get(key)
+            except Exception:
+                self.shared_errors += 1
+                raw = None
+            if raw is not None:
+                plan = _load_plan(raw)
+                self._store_local(key, normalized, plan)
+                self.shared_hits += 1
+                return plan
+
+        if self.index is not None:
+            similar_key = self.index.query(normalized)
+            if similar_key is not None:
+                plan = self.local.get(similar_key)
+                if plan is not None:
+                    self.similar_hits += 1
+                    return plan
+
+        self.misses += 1
+        return None
+
+    async def set(self, prompt: str, plan: Plan) -> None:
+        """Caches a parsed plan. Cached plans are shared, so treat them as read-only."""
+        normalized = normalize_prompt(prompt)
+        key = _plan_key(normalized)
+        self._store_local(key, normalized, plan)
+        if self.shared is not None:
+            try:
+                await self.shared.set(key, _dump_plan(plan), self.ttl)
+            except Exception:
+                self.shared_errors += 1
+
+    def _store_local(self, key: str, normalized: str, plan: Plan) -> None:
+        self.local.set(key, plan)
+        if self.index is not None:
+            self.index.add(key, normalized)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.local_hits + self.shared_hits + self.similar_hits + self.misses
+        hits = lookups - self.misses
+        return {
+            "size": len(self.local),
+            "evictions": self.local.evictions,
+            "expirations": self.local.expirations,
+            "local_hits": self.local_hits,
+            "shared_hits": self.shared_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "shared_errors": self.shared_errors,
+        }
+
+
+_cache: Optional[PlanCache] = None
+
+
+def get_plan_cache() -> Optional[PlanCache]:
+    """Returns the process-wide plan cache, or None when caching is disabled."""
+    global _cache
+    if not PLAN_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        shared = RedisPlanCacheBackend(PLAN_CACHE_REDIS_URL) if PLAN_CACHE_REDIS_URL else None
+        _cache = PlanCache(shared=shared)
+        register_collector("plan_cache", _cache.stats)
+    return _cache
@@ -0,0 +1,157 @@
+"""
+Parsing of the model's plan output.
+
+Responses are requested as schema-constrained JSON and validated straight
+from the raw text against the Plan model (one pass in Pydantic's Rust
+core). When that fails, cheap repairs are tried before giving up, since a
+fresh generation costs a full model round trip:
+
+- markdown code fences and prose around the JSON object
+- trailing commas before a closing bracket
+- truncated output: cut back to the last complete object and close it
+"""
+from typing import Dict, List, Tuple
+
+from pydantic import ValidationError
+
+from app.core.metrics import register_collector
+from app.schemas.plan import Plan, PlanSubGoal
+
+REPAIR_KINDS = ("fences", "prose", "trailing_commas", "truncated")
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class PlanParseError(ValueError):
+    """Raised when the model output is not a usable plan, even after repair."""
+
+
+class PlanParserStats:
+    def __init__(self):
+        self.parsed = 0
+        self.repaired = 0
+        self.failures = 0
+        self.repairs = dict.fromkeys(REPAIR_KINDS, 0)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "parsed": self.parsed,
+            "repaired": self.repaired,
+            "failures": self.failures,
+            **{f"repairs_{kind}": count for kind, count in self.repairs.items()},
+        }
+
+
+parser_stats = PlanParserStats()
+register_collector("plan_parser", parser_stats.stats)
+
+
+def parse_plan(text: str) -> Plan:
+    """Validates model output as a Plan, repairing common defects if needed."""
+    try:
+        plan = Plan.model_validate_json(text)
+    except ValidationError as e:
+        repaired, repairs = repair_json(text)
+        if not repairs:
+            parser_stats.failures += 1
+            raise PlanParseError(_summarize(e)) from e
+        try:
+            plan = Plan.model_validate_json(repaired)
+        except ValidationError as e2:
+            parser_stats.failures += 1
+            raise PlanParseError(_summarize(e2)) from e2
+        parser_stats.repaired += 1
+        for kind in repairs:
+            parser_stats.repairs[kind] += 1
+    parser_stats.parsed += 1
+    return plan
+
+
+def parse_subgoal(data: Dict) -> PlanSubGoal:
+    """Validates one subgoal object emitted by the streaming parser."""
+    try:
+        return PlanSubGoal.model_validate(data)
+    except ValidationError as e:
+        parser_stats.failures += 1
+        raise PlanParseError(_summarize(e)) from e
+
+
+def repair_json(text: str) -> Tuple[str, List[str]]:
+    """Returns the text with recoverable defects fixed and the kinds of repair made."""
+    repairs: List[str] = []
+    text = text.strip()
+    if text.startswith("```"):
+        # Drop the opening fence line (```json) and a closing fence
+        newline = text.find("\n")
+        text = text[newline + 1:] if newline != -1 else text[3:]
+        text = text.rstrip()
+        if text.endswith("```"):
+            text = text[:-3]
+        repairs.append("fences")
+
+    start = text.find("{")
+    if start == -1:
+        return text, repairs
+    if text[:start].strip():
+        repairs.append("prose")
+
+    out: List[str] = []
+    stack: List[str] = []
+    # Output length and open brackets right after the last complete object/array
+    safe_point: Tuple[int, List[str]] = (0, [])
+    in_string = escaped = False
+    trailing_commas = False
+    end = len(text)
+    i = start
+    while i < end:
+        char = text[i]
+        if in_string:
+            out.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+            out.append(char)
+        elif char in _CLOSERS:
+            stack.append(char)
+            out.append(char)
+        elif char in "}]":
+            if stack:
+                stack.pop()
+            out.append(char)
+            if not stack:
+                if text[i + 1:].strip() and "prose" not in repairs:
+                    repairs.append("prose")
+                break
+            safe_point = (len(out), list(stack))
+        elif char == ",":
+            j = i + 1
+            while j < end and text[j].isspace():
+                j += 1
+            if j < end and text[j] in "}]":
+                trailing_commas = True
+            else:
+                out.append(char)
+        else:
+            out.append(char)
+        i += 1
+
+    if trailing_commas:
+        repairs.append("trailing_commas")
+    if stack:
+        length, open_brackets = safe_point
+        if not length:
+            return "".join(out), repairs
+        out = out[:length] + [_CLOSERS[bracket] for bracket in reversed(open_brackets)]
+        repairs.append("truncated")
+    return "".join(out), repairs
+
+
+def _summarize(error: ValidationError) -> str:
+    first = error.errors()[0]
+    location = ".".join(str(part) for part in first["loc"])
+    return f"{first['msg']} at {location}" if location else first["msg"]
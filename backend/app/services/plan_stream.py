@@ -0,0 +1,108 @@
+"""Incremental parser for streamed SYS_PROMPT plans"""
+import json
+from typing import Any, List, Optional, Tuple
+
+PlanEvent = Tuple[str, Any]
+
+
+class PlanStreamError(ValueError):
+    """Raised when a streamed plan is malformed or ends before it is complete."""
+
+
+class PlanStreamParser:
+    """
+    Consumes the model's response text chunk by chunk and reports the plan's
+    pieces as soon as they are complete:
+
+    - ("goal", str) once the top-level "Goal" string has been read
+    - ("subgoal", dict) for every finished element of the "subGoals" array
+
+    Text before the first "{" (e.g. a ```json fence) and after the closing "}"
+    is ignored. Only the top-level keys and subgoal boundaries are tracked; each
+    finished subgoal object is decoded with json.loads.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._expect_key = False
+        self._last_key: Optional[str] = None
+        self._subgoal_start: Optional[int] = None
+        self.complete = False
+
+    def feed(self, chunk: str) -> List[PlanEvent]:
+        """Adds a chunk of text and returns the events it completed."""
+        self._text += chunk
+        events: List[PlanEvent] = []
+        text = self._text
+        while self._pos < len(text) and not self.complete:
+            char = text[self._pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    self._end_string(text[self._string_start:self._pos + 1], events)
+            elif not self._stack:
+                if char == "{":
+                    self._open(char)
+            elif char == '"':
+                self._in_string = True
+                self._string_start = self._pos
+            elif char in "{[":
+                self._open(char)
+            elif char in "}]":
+                self._close(char, events)
+            elif char == ":" and len(self._stack) == 1:
+                self._expect_key = False
+            elif char == "," and len(self._stack) == 1:
+                self._expect_key = True
+            self._pos += 1
+        return events
+
+    def close(self) -> None:
+        """Raises PlanStreamError unless the whole top-level object was received."""
+        if not self.complete:
+            raise PlanStreamError("Plan stream ended before the plan was complete")
+
+    def _open(self, char: str) -> None:
+        if len(self._stack) == 1 and char == "[" and self._last_key == "subGoals":
+            char = "subGoals"
+        elif char == "{" and self._stack and self._stack[-1] == "subGoals":
+            self._subgoal_start = self._pos
+        self._stack.append(char)
+        if len(self._stack) == 1:
+            self._expect_key = True
+
+    def _close(self, char: str, events: List[PlanEvent]) -> None:
+        opener = self._stack.pop()
+        if (opener == "{") != (char == "}"):
+            raise PlanStreamError(f"Unbalanced {char!r} at offset {self._pos}")
+        if not self._stack:
+            self.complete = True
+        elif self._stack[-1] == "subGoals" and self._subgoal_start is not None:
+            raw = self._text[self._subgoal_start:self._pos + 1]
+            self._subgoal_start = None
+            try:
+                subgoal = json.loads(raw)
+            except json.JSONDecodeError as exc:
+                raise PlanStreamError(f"Malformed subgoal: {exc}") from exc
+            events.append(("subgoal", subgoal))
+
+    def _end_string(self, raw: str, events: List[PlanEvent]) -> None:
+        if len(self._stack) != 1:
+            return
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError as exc:
+            raise PlanStreamError(f"Malformed string: {exc}") from exc
+        if self._expect_key:
+            self._last_key = value
+        elif self._last_key == "Goal":
+            events.append(("goal", value))
@@ -0,0 +1,232 @@
+"""
+Progress tracking: action completion, per-goal/subgoal counters and streaks.
+
+Counters (completed actions per subgoal and goal, last activity, streaks and
+the user's daily totals) are adjusted by a delta in the same transaction as
+the action's status change, so progress reads are a couple of primary-key
+lookups however many actions a goal has. `rebuild_progress` recomputes every
+counter from the actions themselves, for repairing drift:
+
+    python -m app.services.progress [--user-id ID]
+
+The rebuild treats the currently completed actions as the source of truth,
+so a streak day whose only completion was later undone is dropped.
+"""
+import argparse
+import asyncio
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.conditional import make_etag
+from app.database import async_session_maker
+from app.models.goals import Actions, ActionStatus, Goal
+from app.models.user import User
+from app.repositories.goals import GoalRepository
+from app.repositories.progress import ProgressRepository
+from app.repositories.user import UserRepository
+from app.schemas.progress import GoalProgressResponse, StreakResponse, SubGoalProgress
+
+
+def compute_streaks(days: List[date]) -> Tuple[int, int, Optional[date]]:
+    """
+    (current, longest, last day) for sorted distinct active days; `current`
+    is the run ending on the last day, as stored by the incremental path.
+    """
+    current = longest = 0
+    previous: Optional[date] = None
+    for day in days:
+        current = current + 1 if previous is not None and day - previous == timedelta(days=1) else 1
+        longest = max(longest, current)
+        previous = day
+    return current, longest, previous
+
+
+def effective_streak(current: int, last_active: Optional[date], today: date) -> int:
+    """A stored streak only counts while its last day is today or yesterday."""
+    if last_active is None or today - last_active > timedelta(days=1):
+        return 0
+    return current
+
+
+def progress_validators(goal_id: int, version: int, updated_at: datetime) -> Tuple[str, datetime]:
+    """
+    ETag and Last-Modified of a goal's progress. The current streak can
+    lapse overnight without the goal changing, so the day is part of both.
+    """
+    today = datetime.utcnow().date()
+    return make_etag(goal_id, version, today.isoformat()), max(updated_at, datetime.combine(today, time.min))
+
+
+def _percent(completed: int, total: int) -> float:
+    return round(100 * completed / total, 1) if total else 0.0
+
+
+class ProgressService:
+    def __init__(self, db: AsyncSession):
+        self.progress_repo = ProgressRepository(db)
+        self.goal_repo = GoalRepository(db)
+        self.user_repo = UserRepository(db)
+        self.db = db
+
+    async def set_action_status(
+        self, user_id: int, goal_id: int, action_id: int, new_status: ActionStatus
+    ) -> Actions:
+        """Changes an action's status and applies the resulting counter deltas atomically."""
+        row = await self.progress_repo.get_goal_action(action_id, goal_id)
+        if row is None or row[1] != user_id:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Action not found")
+        action = row[0]
+        old_status = action.status
+        if old_status == new_status:
+            return action
+
+        now = datetime.utcnow()
+        completed_at = now if new_status == ActionStatus.completed else None
+        try:
+            if not await self.progress_repo.set_action_status(action_id, old_status, new_status, completed_at):
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Action was changed by another request, reload and try again"
+                )
+            await self.apply_transitions(user_id, goal_id, [(action, new_status)], now)
+            await self.goal_repo.bump_version(goal_id)
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+        action.status = new_status
+        action.completed_at = completed_at
+        action.version += 1
+        return action
+
+    async def apply_transitions(
+        self, user_id: int, goal_id: int, transitions: List[Tuple[Actions, ActionStatus]], now: datetime
+    ) -> None:
+        """
+        Updates the progress counters for actions of one goal moving to new
+        statuses. `transitions` pairs each action, as it was before the change,
+        with its new status. Runs inside the caller's transaction.
+        """
+        deltas: Dict[int, int] = defaultdict(int)
+        # (day, minutes) -> delta; an undone completion comes off the day it was counted on
+        days: Dict[Tuple[date, int], int] = defaultdict(int)
+        completed = False
+        for action, new_status in transitions:
+            delta = (new_status == ActionStatus.completed) - (action.status == ActionStatus.completed)
+            if not delta:
+                continue
+            deltas[action.subgoal_id] += delta
+            day = now.date() if delta > 0 else (action.completed_at or now).date()
+            days[(day, action.estimated_minutes or 0)] += delta
+            completed = completed or delta > 0
+        await self.progress_repo.add_completed(goal_id, dict(deltas), completed, now)
+        for (day, minutes), delta in days.items():
+            if delta:
+                await self.progress_repo.add_daily_progress(user_id, day, delta, minutes)
+        if completed:
+            await self.progress_repo.extend_user_streak(user_id, now.date())
+
+    async def get_goal_progress(self, goal_id: int, user_id: int) -> GoalProgressResponse:
+        """Progress of a goal from its stored counters."""
+        progress = await self.progress_repo.get_progress(goal_id)
+        if progress is None or progress[0].user_id != user_id:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Goal not found")
+        goal, subgoals = progress
+        return GoalProgressResponse(
+            goal_id=goal.id,
+            version=goal.version,
+            updated_at=goal.updated_at,
+            subgoal_count=goal.subgoal_count,
+            action_count=goal.action_count,
+            completed_count=goal.completed_count,
+            percent_complete=_percent(goal.completed_count, goal.action_count),
+            current_streak=effective_streak(goal.current_streak, goal.last_active_date, datetime.utcnow().date()),
+            longest_streak=goal.longest_streak,
+            last_active_date=goal.last_active_date,
+            last_activity_at=goal.last_activity_at,
+            subgoals=[
+                SubGoalProgress(
+                    id=subgoal.id,
+                    title=subgoal.title,
+                    action_count=subgoal.action_count,
+                    completed_count=subgoal.completed_count,
+                    percent_complete=_percent(subgoal.completed_count, subgoal.action_count),
+                    last_activity_at=subgoal.last_activity_at,
+                )
+                for subgoal in subgoals
+            ],
+        )
+
+    async def get_streak(self, user_id: int) -> StreakResponse:
+        """The user's streak and today's totals."""
+        user = await self.user_repo.get_by_id(user_id)
+        if user is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+        today = datetime.utcnow().date()
+        day = await self.progress_repo.get_day(user_id, today)
+        return StreakResponse(
+            current_streak=effective_streak(user.current_streak, user.last_active_date, today),
+            longest_streak=user.longest_streak,
+            last_active_date=user.last_active_date,
+            actions_completed_today=day.actions_completed if day else 0,
+            minutes_worked_today=day.minutes_worked if day else 0,
+        )
+
+    async def rebuild(self, user_id: int) -> None:
+        """Recomputes all progress counters of one user from scratch, in one transaction."""
+        try:
+            await self.recompute(user_id)
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+
+    async def recompute(self, user_id: int) -> None:
+        """The work of `rebuild`, inside the caller's transaction."""
+        await self.recompute_goals(user_id)
+        await self.recompute_daily(user_id)
+
+    async def recompute_goals(self, user_id: int, goal_ids: Optional[List[int]] = None) -> None:
+        """Counters and streaks of the user's goals, or only of `goal_ids` (their versions are bumped)."""
+        await self.progress_repo.rebuild_counters(user_id, goal_ids)
+        goal_rows = []
+        for goal_id, days in (await self.progress_repo.completion_days_by_goal(user_id, goal_ids)).items():
+            current, longest, last = compute_streaks(days)
+            goal_rows.append({
+                "id": goal_id, "current_streak": current, "longest_streak": longest, "last_active_date": last
+            })
+        await self.progress_repo.set_streaks(Goal, goal_rows)
+
+    async def recompute_daily(self, user_id: int) -> None:
+        """The user's daily totals and streak."""
+        current, longest, last = compute_streaks(await self.progress_repo.rebuild_daily_progress(user_id))
+        await self.progress_repo.set_streaks(User, [{
+            "id": user_id, "current_streak": current, "longest_streak": longest, "last_active_date": last
+        }])
+
+
+async def rebuild_progress(user_id: Optional[int] = None, batch_size: int = 100) -> int:
+    """Rebuilds progress for one user or all of them, one transaction per user. Returns the count."""
+    if user_id is not None:
+        user_ids = [user_id]
+    else:
+        async with async_session_maker() as db:
+            user_ids = list((await db.execute(select(User.id).order_by(User.id))).scalars().all())
+    for start in range(0, len(user_ids), batch_size):
+        async with async_session_maker() as db:
+            service = ProgressService(db)
+            for uid in user_ids[start:start + batch_size]:
+                await service.rebuild(uid)
+    return len(user_ids)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild progress counters from completed actions")
+    parser.add_argument("--user-id", type=int)
+    args = parser.parse_args()
+    print(f"Rebuilt progress for {asyncio.run(rebuild_progress(args.user_id))} user(s)")
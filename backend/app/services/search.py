@@ -0,0 +1,43 @@
+import base64
+import json
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.repositories.search import SearchRepository
+from app.schemas.search import SearchHit, SearchResponse
+
+
+class SearchService:
+    def __init__(self, db: AsyncSession):
+        self.search_repo = SearchRepository(db)
+        self.db = db
+
+    async def search(self, user_id: int, query: str, limit: int, cursor: Optional[str] = None) -> SearchResponse:
+        """A user's goals, subgoals and actions matching `query`, best match first, one page at a time."""
+        after = self._decode_cursor(cursor) if cursor else None
+        # Fetch one extra row to learn whether another page exists
+        rows = await self.search_repo.search(user_id, query, limit + 1, after)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        items = [
+            SearchHit(kind=row.kind, id=row.ref_id, goal_id=row.goal_id, content=row.content, rank=row.rank)
+            for row in rows
+        ]
+        next_cursor = self._encode_cursor(rows[-1].rank, rows[-1].id) if has_more else None
+        return SearchResponse(items=items, next_cursor=next_cursor)
+
+    def _encode_cursor(self, rank: float, entry_id: int) -> str:
+        raw = json.dumps([rank, entry_id])
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def _decode_cursor(self, cursor: str) -> Tuple[float, int]:
+        try:
+            rank, entry_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return float(rank), int(entry_id)
+        except (ValueError, TypeError) as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            ) from e
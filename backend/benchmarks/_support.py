@@ -0,0 +1,138 @@
+"""Shared helpers for the benchmark scripts."""
+import os
+import statistics
+import tempfile
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from app.models.base import Base
+
+
+class QueryCounter:
+    """Counts DBAPI round trips and commits issued through an engine."""
+
+    def __init__(self, engine: AsyncEngine):
+        self.statements = 0
+        self.commits = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+        event.listen(engine.sync_engine, "commit", self._on_commit)
+
+    def _on_execute(self, *args) -> None:
+        self.statements += 1
+
+    def _on_commit(self, *args) -> None:
+        self.commits += 1
+
+    def reset(self) -> None:
+        self.statements = 0
+        self.commits = 0
+
+
+@asynccontextmanager
+async def temp_database() -> AsyncIterator[AsyncEngine]:
+    """Creates a throwaway SQLite database with every table in the metadata."""
+    import app.models.goals  # noqa: F401
+    import app.models.user  # noqa: F401
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        try:
+            yield engine
+        finally:
+            await engine.dispose()
+
+
+def session_factory(engine: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Returns p50/p95/p99 of the samples."""
+    if len(samples) < 2:
+        value = samples[0] if samples else 0.0
+        return {"p50": value, "p95": value, "p99": value}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98]}
+
+
+def use_temp_database(directory: str) -> str:
+    """
+    Points the app at a SQLite file inside `directory`. Must run before
+    anything under `app` that reads the environment is imported.
+    """
+    url = f"sqlite+aiosqlite:///{os.path.join(directory, 'bench.db')}"
+    os.environ["DATABASE_URL"] = url
+    os.environ.setdefault("DB_PROFILE", "test")
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+    return url
+
+
+async def seed_goal_trees(
+    engine: AsyncEngine,
+    users: int,
+    goals_per_user: int,
+    subgoals_per_goal: int,
+    actions_per_subgoal: int,
+    batch_size: int = 20000,
+) -> None:
+    """Bulk-loads users with complete goal trees using sequential IDs."""
+    from datetime import datetime, timedelta
+
+    from app.models.goals import Actions, Goal, GoalStatus, SubGoal, SubgoalCategory
+    from app.models.user import User
+
+    categories = list(SubgoalCategory)
+    start = datetime(2025, 1, 1)
+
+    async def insert_batches(table, rows):
+        batch = []
+        async with engine.begin() as conn:
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    await conn.execute(table.insert(), batch)
+                    batch = []
+            if batch:
+                await conn.execute(table.insert(), batch)
+
+    await insert_batches(User.__table__, (
+        {"id": u, "user_name": f"user{u}", "email": f"user{u}@example.com",
+         "hashed_password": "x", "created_at": start}
+        for u in range(1, users + 1)
+    ))
+    goal_count = users * goals_per_user
+    await insert_batches(Goal.__table__, (
+        {"id": g, "user_id": (g - 1) // goals_per_user + 1, "title": f"Goal {g}",
+         "description": f"Goal {g}", "status": GoalStatus.active,
+         "created_at": start + timedelta(minutes=g), "updated_at": start + timedelta(minutes=g)}
+        for g in range(1, goal_count + 1)
+    ))
+    subgoal_count = goal_count * subgoals_per_goal
+    await insert_batches(SubGoal.__table__, (
+        {"id": s, "goal_id": (s - 1) // subgoals_per_goal + 1, "title": f"Subgoal {s}",
+         "description": f"Subgoal {s}", "category": categories[s % len(categories)]}
+        for s in range(1, subgoal_count + 1)
+    ))
+    await insert_batches(Actions.__table__, (
+        {"id": a, "subgoal_id": (a - 1) // actions_per_subgoal + 1, "description": f"Action {a}"}
+        for a in range(1, subgoal_count * actions_per_subgoal + 1)
+    ))
+
+    if engine.dialect.name == "postgresql":
+        # Explicit IDs don't advance the sequences; move them past the seeded rows
+        async with engine.begin() as conn:
+            for table in (User.__table__, Goal.__table__, SubGoal.__table__, Actions.__table__):
+                await conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                    f"(SELECT COALESCE(MAX(id), 1) FROM {table.name}))"
+                ))
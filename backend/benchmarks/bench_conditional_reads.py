@@ -0,0 +1,119 @@
+"""
+A dashboard polling goal trees through the app, where the goal changes once
+every --change-every polls. Compares, per poll: DB statements, response bytes
+and latency for
+
+- plain GETs, which load and serialize the tree every time
+- plain GETs with the (goal_id, version) tree cache enabled, for clients
+  that do not revalidate
+- GETs revalidated with If-None-Match, answered 304 from a version lookup
+
+    python -m benchmarks.bench_conditional_reads [--goals 50] [--polls 20] [--change-every 10]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from benchmarks._support import (
+    QueryCounter,
+    percentiles,
+    seed_goal_trees,
+    use_temp_database,
+)
+
+SUBGOALS = 8
+ACTIONS = 8
+
+
+def token_for(user_id: int) -> dict:
+    from jose import jwt
+
+    from app.services.auth import ALGORITHM, SECRET_KEY
+
+    token = jwt.encode(
+        {"sub": f"user{user_id}@example.com", "user_id": user_id, "exp": time.time() + 3600},
+        SECRET_KEY, algorithm=ALGORITHM
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+# Goal ID -> whether its first action is currently completed; every change flips it
+completed = {}
+
+
+async def poll(client, counter: QueryCounter, args, conditional: bool) -> None:
+    statements = size = not_modified = 0
+    timings = []
+    for goal_id in range(1, args.goals + 1):
+        headers = token_for(goal_id)
+        etag = None
+        # First action of the goal, as seeded
+        action_id = (goal_id - 1) * SUBGOALS * ACTIONS + 1
+        for n in range(args.polls):
+            if n and n % args.change_every == 0:
+                completed[goal_id] = not completed.get(goal_id, False)
+                status = "Completed" if completed[goal_id] else "Pending"
+                response = await client.patch(
+                    f"/api/goals/{goal_id}/actions/{action_id}", json={"status": status}, headers=headers
+                )
+                response.raise_for_status()
+            request_headers = {**headers, "If-None-Match": etag} if conditional and etag else headers
+            before = counter.statements
+            start = time.perf_counter()
+            response = await client.get(f"/api/goals/{goal_id}/tree", headers=request_headers)
+            timings.append(time.perf_counter() - start)
+            statements += counter.statements - before
+            size += len(response.content)
+            if response.status_code == 304:
+                not_modified += 1
+            else:
+                response.raise_for_status()
+                etag = response.headers["etag"]
+    polls = args.goals * args.polls
+    p = percentiles(timings)
+    print(
+        f"  statements/poll={statements / polls:5.2f} bytes/poll={size / polls:8.0f} "
+        f"304s={not_modified:>5}  p50={p['p50'] * 1000:6.2f} ms p95={p['p95'] * 1000:6.2f} ms"
+    )
+
+
+async def main(args) -> None:
+    import httpx
+
+    from app.core.cache import TTLCache
+    from app.database import create_tables, engine
+    from app.main import app
+    from app.services import goals
+
+    await create_tables()
+    await seed_goal_trees(engine, args.goals, 1, SUBGOALS, ACTIONS)
+    counter = QueryCounter(engine)
+    print(f"{args.goals} goals ({SUBGOALS}x{ACTIONS}) polled {args.polls} times each, changed every {args.change_every} polls")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, conditional, cached in (
+            ("plain GET", False, False),
+            ("plain GET + tree cache", False, True),
+            ("If-None-Match", True, False),
+        ):
+            goals.tree_cache = TTLCache(maxsize=args.goals, ttl=86400) if cached else None
+            print(name)
+            await poll(client, counter, args, conditional)
+            if cached:
+                print(f"  tree cache: {goals.tree_cache.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--goals", type=int, default=50)
+    parser.add_argument("--polls", type=int, default=20)
+    parser.add_argument("--change-every", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_database(tmp)
+        os.environ["ADMISSION_ENABLED"] = "false"
+        asyncio.run(main(args))
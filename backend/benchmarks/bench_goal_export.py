@@ -0,0 +1,106 @@
+"""
+Exports one user's goal trees (100k actions by default) and imports the
+export back, recording time and peak Python memory (tracemalloc).
+
+The streamed NDJSON and CSV exports are compared with building the same
+NDJSON from fully loaded trees (selectinload), which grows with the account.
+
+    python -m benchmarks.bench_goal_export [--goals 250] [--subgoals 20] [--actions 20]
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks._support import seed_goal_trees, use_temp_database
+
+
+async def loaded_export(db, user_id: int):
+    """The naive export: every tree loaded into the session, then serialized."""
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+
+    from app.models.goals import Goal, SubGoal
+
+    goals = (await db.execute(
+        select(Goal).where(Goal.user_id == user_id).order_by(Goal.id)
+        .options(selectinload(Goal.subgoals).selectinload(SubGoal.actions))
+    )).scalars().all()
+    lines = []
+    for goal in goals:
+        lines.append(json.dumps({"type": "goal", "id": goal.id, "title": goal.title}))
+        for subgoal in goal.subgoals:
+            lines.append(json.dumps({"type": "subgoal", "id": subgoal.id, "goal_id": goal.id, "title": subgoal.title}))
+            for action in subgoal.actions:
+                lines.append(json.dumps({"type": "action", "id": action.id, "subgoal_id": subgoal.id}))
+    yield "\n".join(lines)
+
+
+async def measure(name: str, run) -> str:
+    """Runs `run()` (an async iterator of chunks) and prints time, size and peak memory."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = 0
+    last = ""
+    async for chunk in run():
+        size += len(chunk)
+        last = chunk
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<16} {elapsed:7.2f} s {size / 1e6:8.1f} MB out  peak {peak / 1e6:7.1f} MB")
+    return last
+
+
+async def main(args) -> None:
+    from app.database import async_session_maker, create_tables, engine
+    from app.services.goal_transfer import GoalTransferService
+
+    await create_tables()
+    await seed_goal_trees(engine, 2, args.goals, args.subgoals, args.actions)
+    actions = args.goals * args.subgoals * args.actions
+    print(f"User 1: {args.goals} goals x {args.subgoals} subgoals x {args.actions} actions = {actions} actions\n")
+
+    async with async_session_maker() as db:
+        await measure("loaded (naive)", lambda: loaded_export(db, 1))
+    async with async_session_maker() as db:
+        await measure("stream csv", lambda: GoalTransferService(db).export_csv(1))
+
+    async def keep_ndjson():
+        async with async_session_maker() as db:
+            async for chunk in GoalTransferService(db).export_ndjson(1):
+                yield chunk
+
+    # Measured without keeping the output, then written to a file for the import
+    await measure("stream ndjson", keep_ndjson)
+    with tempfile.TemporaryFile() as file:
+        async for chunk in keep_ndjson():
+            file.write(chunk.encode())
+        file.seek(0)
+
+        async def upload():
+            while chunk := file.read(64 * 1024):
+                yield chunk
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        async with async_session_maker() as db:
+            result = await GoalTransferService(db).import_ndjson(2, upload())
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{'import ndjson':<16} {elapsed:7.2f} s {result.actions:>8} actions  peak {peak / 1e6:7.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--goals", type=int, default=250)
+    parser.add_argument("--subgoals", type=int, default=20)
+    parser.add_argument("--actions", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_database(tmp)
+        asyncio.run(main(args))
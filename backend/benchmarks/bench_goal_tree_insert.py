@@ -0,0 +1,81 @@
+"""
+Compares persisting one 8 x 8 (64 action) goal plan with per-row
+`BaseRepository.create` calls against `GoalRepository.create_tree`.
+
+    python -m benchmarks.bench_goal_tree_insert [--runs 20]
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+from app.models.goals import Actions, Goal, GoalStatus, SubGoal, SubgoalCategory
+from app.repositories.goals import ActionRepository, GoalRepository, SubgoalRepository
+from benchmarks._support import QueryCounter, session_factory, temp_database
+
+SUBGOALS = 8
+ACTIONS_PER_SUBGOAL = 8
+
+
+def sample_plan() -> tuple[List[Dict], List[List[Dict]]]:
+    categories = list(SubgoalCategory)
+    subgoals = [
+        {
+            "title": f"Subgoal {i + 1}",
+            "description": f"Subgoal {i + 1}",
+            "category": categories[i % len(categories)],
+        }
+        for i in range(SUBGOALS)
+    ]
+    actions = [
+        [{"description": f"Action {i + 1}.{j + 1}"} for j in range(ACTIONS_PER_SUBGOAL)]
+        for i in range(SUBGOALS)
+    ]
+    return subgoals, actions
+
+
+def new_goal() -> Goal:
+    return Goal(user_id=1, title="Learn Python", description="Learn Python", status=GoalStatus.active)
+
+
+async def per_row_insert(db, subgoals, actions) -> None:
+    """The previous GoalService.create_goal persistence loop."""
+    goal = await GoalRepository(db).create(new_goal())
+    for subgoal_data, subgoal_actions in zip(subgoals, actions, strict=True):
+        subgoal = await SubgoalRepository(db).create(SubGoal(goal_id=goal.id, **subgoal_data))
+        for action_data in subgoal_actions:
+            await ActionRepository(db).create(Actions(subgoal_id=subgoal.id, **action_data))
+
+
+async def tree_insert(db, subgoals, actions) -> None:
+    await GoalRepository(db).create_tree(new_goal(), subgoals, actions)
+
+
+async def measure(name: str, insert, runs: int) -> None:
+    subgoals, actions = sample_plan()
+    async with temp_database() as engine:
+        counter = QueryCounter(engine)
+        make_session = session_factory(engine)
+        timings = []
+        for _ in range(runs):
+            counter.reset()
+            async with make_session() as db:
+                start = time.perf_counter()
+                await insert(db, subgoals, actions)
+                timings.append(time.perf_counter() - start)
+        print(
+            f"{name:<12} statements={counter.statements:<4} commits={counter.commits:<4} "
+            f"mean={sum(timings) / len(timings) * 1000:.2f} ms"
+        )
+
+
+async def main(runs: int) -> None:
+    print(f"Persisting a {SUBGOALS}x{ACTIONS_PER_SUBGOAL} plan ({runs} runs, per-plan counts)")
+    await measure("per-row", per_row_insert, runs)
+    await measure("create_tree", tree_insert, runs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=20)
+    asyncio.run(main(parser.parse_args().runs))
@@ -0,0 +1,78 @@
+"""
+Reads full goal trees from a seeded database, comparing one query per
+subgoal against GoalRepository.get_tree (selectinload, constant queries).
+
+    python -m benchmarks.bench_goal_tree_read [--users 10000] [--goals 5] [--reads 500]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from sqlalchemy import select
+
+from app.models.goals import Actions, Goal, SubGoal
+from app.repositories.goals import GoalRepository
+from benchmarks._support import (
+    QueryCounter,
+    percentiles,
+    seed_goal_trees,
+    session_factory,
+    temp_database,
+)
+
+
+async def per_subgoal_read(db, goal_id: int) -> int:
+    """What a dashboard had to do before relationships existed."""
+    goal = (await db.execute(select(Goal).where(Goal.id == goal_id))).scalars().first()
+    subgoals = (await db.execute(select(SubGoal).where(SubGoal.goal_id == goal.id))).scalars().all()
+    actions = 0
+    for subgoal in subgoals:
+        rows = await db.execute(select(Actions).where(Actions.subgoal_id == subgoal.id))
+        actions += len(rows.scalars().all())
+    return actions
+
+
+async def tree_read(db, goal_id: int) -> int:
+    goal = await GoalRepository(db).get_tree(goal_id)
+    return sum(len(subgoal.actions) for subgoal in goal.subgoals)
+
+
+async def main(args) -> None:
+    async with temp_database() as engine:
+        start = time.perf_counter()
+        await seed_goal_trees(engine, args.users, args.goals, args.subgoals, args.actions)
+        goal_count = args.users * args.goals
+        print(
+            f"Seeded {args.users} users x {args.goals} goals "
+            f"({goal_count * args.subgoals * args.actions} actions) "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+
+        counter = QueryCounter(engine)
+        make_session = session_factory(engine)
+        goal_ids = [random.randint(1, goal_count) for _ in range(args.reads)]
+        for name, read in (("per-subgoal", per_subgoal_read), ("get_tree", tree_read)):
+            counter.reset()
+            timings = []
+            for goal_id in goal_ids:
+                async with make_session() as db:
+                    start = time.perf_counter()
+                    await read(db, goal_id)
+                    timings.append(time.perf_counter() - start)
+            p = percentiles(timings)
+            print(
+                f"{name:<12} queries/read={counter.statements / args.reads:5.1f} "
+                f"p50={p['p50'] * 1000:6.2f} ms p95={p['p95'] * 1000:6.2f} ms "
+                f"p99={p['p99'] * 1000:6.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--goals", type=int, default=5)
+    parser.add_argument("--subgoals", type=int, default=8)
+    parser.add_argument("--actions", type=int, default=8)
+    parser.add_argument("--reads", type=int, default=500)
+    asyncio.run(main(parser.parse_args()))
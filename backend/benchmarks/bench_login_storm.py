@@ -0,0 +1,85 @@
+"""
+Measures /health latency while a burst of logins is in flight, with bcrypt
+running inline on the event loop versus on the password hashing pool.
+
+    python -m benchmarks.bench_login_storm [--logins 16] [--workers 4]
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+
+from benchmarks._support import percentiles, use_temp_database
+
+EMAIL = "storm@example.com"
+PASSWORD = "StormPassw0rd"
+PROBE_INTERVAL = 0.005
+
+
+async def storm(client, logins: int):
+    latencies = []
+    done = asyncio.Event()
+
+    async def poll_health():
+        # Latency is measured from when the probe was due, so time the event
+        # loop spends blocked before sending it counts against the probe.
+        while not done.is_set():
+            due = time.perf_counter() + PROBE_INTERVAL
+            await asyncio.sleep(PROBE_INTERVAL)
+            await client.get("/health")
+            latencies.append(time.perf_counter() - due)
+
+    async def login():
+        response = await client.post("/api/auth/login", json={"email": EMAIL, "password": PASSWORD})
+        response.raise_for_status()
+
+    poller = asyncio.create_task(poll_health())
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await poller
+    return elapsed, latencies
+
+
+async def main(logins: int, workers: int) -> None:
+    import httpx
+
+    from app.core.hashing import PasswordHasher, set_password_hasher
+    from app.database import async_session_maker, create_tables
+    from app.main import app
+    from app.repositories.user import UserRepository
+    from app.schemas.auth import UserCreate
+
+    await create_tables()
+
+    # Seed the user directly: registration validates email deliverability over DNS
+    async with async_session_maker() as db:
+        hashed = await PasswordHasher(max_workers=1).hash(PASSWORD)
+        await UserRepository(db).create(UserCreate(user_name="storm", email=EMAIL, password=hashed))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{logins} concurrent logins while polling /health")
+        for name, hasher in (
+            ("inline", PasswordHasher(max_workers=0)),
+            (f"pool({workers})", PasswordHasher(max_workers=workers)),
+        ):
+            set_password_hasher(hasher)
+            elapsed, latencies = await storm(client, logins)
+            p = percentiles(latencies)
+            print(
+                f"{name:<10} logins/s={logins / elapsed:6.2f} health samples={len(latencies):<4} "
+                f"p50={p['p50'] * 1000:7.1f} ms p99={p['p99'] * 1000:7.1f} ms "
+                f"max={max(latencies) * 1000:7.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_database(tmp)
+        asyncio.run(main(args.logins, args.workers))
@@ -0,0 +1,138 @@
+"""
+On-demand micro-step generation through the app, against the fake Gemini API.
+
+Users with one 8x8 plan each open the first actions of a subgoal in order,
+pausing between actions like someone reading them. Reported:
+
+- model calls made for micro-steps vs. generating them eagerly for every
+  action of every plan
+- latency of the first open and of the following ones, which the next-sibling
+  prefetch should have ready before they are opened
+- a burst of concurrent requests for one action, which must share one call
+
+    python -m benchmarks.bench_micro_steps [--users 20] [--opens 4] [--think-ms 500] [--llm-latency-ms 300]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import tempfile
+import time
+
+from benchmarks._support import percentiles, seed_goal_trees, use_temp_database
+from benchmarks.fake_gemini import FakeGeminiServer
+
+SUBGOALS = 8
+ACTIONS = 8
+
+
+def token_for(user_id: int) -> dict:
+    from jose import jwt
+
+    from app.services.auth import ALGORITHM, SECRET_KEY
+
+    token = jwt.encode(
+        {"sub": f"user{user_id}@example.com", "user_id": user_id, "exp": time.time() + 3600},
+        SECRET_KEY, algorithm=ALGORITHM
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+def first_action(goal_id: int) -> int:
+    """ID of the first action of the goal's first subgoal, as seeded."""
+    return ((goal_id - 1) * SUBGOALS) * ACTIONS + 1
+
+
+async def main(args, llm: FakeGeminiServer) -> None:
+    import uvicorn
+
+    from app.database import create_tables, engine
+    from app.main import app
+
+    await create_tables()
+    await seed_goal_trees(engine, args.users, 1, SUBGOALS, ACTIONS)
+
+    # A real server, so latencies end when the response is sent rather than
+    # after the background prefetch (as they would with httpx's ASGI transport)
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    try:
+        await run(args, llm, f"http://127.0.0.1:{port}")
+    finally:
+        server.should_exit = True
+        await serving
+
+
+async def run(args, llm: FakeGeminiServer, base_url: str) -> None:
+    import httpx
+
+    from app.core.llm import get_llm_client
+    from app.services.micro_steps import micro_step_stats
+
+    # Creating the client imports the Gemini SDK, which would land on the first opens
+    get_llm_client()
+
+    def llm_calls() -> int:
+        return httpx.get(f"{llm.url}/stats").json()["requests"]
+
+    first, following = [], []
+    limits = httpx.Limits(max_connections=None)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def walk(user_id: int) -> None:
+            headers = token_for(user_id)
+            for n in range(args.opens):
+                action_id = first_action(user_id) + n
+                start = time.perf_counter()
+                response = await client.get(f"/api/goals/{user_id}/actions/{action_id}/micro-steps", headers=headers)
+                response.raise_for_status()
+                (following if n else first).append(time.perf_counter() - start)
+                await asyncio.sleep(args.think_ms / 1000)
+
+        calls = llm_calls()
+        await asyncio.gather(*(walk(user_id) for user_id in range(1, args.users + 1)))
+        calls = llm_calls() - calls
+        eager = args.users * SUBGOALS * ACTIONS
+        print(f"{args.users} users opened {args.opens} actions each ({args.users * args.opens} opens)")
+        print(f"  model calls: {calls} on demand vs. {eager} generating every action eagerly")
+        for name, samples in (("first open", first), ("later opens", following)):
+            if samples:
+                p = percentiles(samples)
+                print(f"  {name:<12} p50 {p['p50'] * 1000:7.1f} ms  p95 {p['p95'] * 1000:7.1f} ms")
+
+        # Everyone opens the same fresh action at once
+        action_id = first_action(1) + ACTIONS
+        calls = llm_calls()
+        responses = await asyncio.gather(*(
+            client.get(f"/api/goals/1/actions/{action_id}/micro-steps", headers=token_for(1))
+            for _ in range(args.burst)
+        ))
+        errors = sum(response.status_code != 200 for response in responses)
+        # The burst's prefetch of the next action runs after the responses
+        await asyncio.sleep(args.llm_latency_ms / 1000 * 2)
+        print(f"\nburst of {args.burst} requests for one action ({errors} errors):")
+        print(f"  model calls: {llm_calls() - calls} (1 for the action, 1 for its prefetched sibling)")
+        print(f"\nstats: {micro_step_stats.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--opens", type=int, default=4, help="actions each user opens, in order")
+    parser.add_argument("--think-ms", type=float, default=500, help="pause between opens")
+    parser.add_argument("--burst", type=int, default=50)
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, FakeGeminiServer(latency_ms=args.llm_latency_ms) as llm:
+        use_temp_database(tmp)
+        os.environ["GEMINI_BASE_URL"] = llm.url
+        os.environ.setdefault("GEMINI_API_KEY", "fake")
+        os.environ["ADMISSION_ENABLED"] = "false"
+        # Enough prefetch slots for every user walking at once
+        os.environ.setdefault("MICRO_STEP_PREFETCH_MAX_CONCURRENCY", str(args.users))
+        asyncio.run(main(args, llm))
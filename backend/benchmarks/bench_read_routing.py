@@ -0,0 +1,122 @@
+"""
+Read/write routing with a primary and read replicas, locally on SQLite files.
+
+The primary is seeded and then copied to the replica file, which stands in
+for a streaming replica that stops receiving changes. Then, through the app:
+
+- goal-tree reads by many users, which should land on the replica
+- a user completing an action and immediately reading their progress back,
+  which must come from the primary (read-your-writes) and see the change
+- with --broken-replica, a second replica URL that can't be opened, which the
+  health check keeps out of rotation without failing any request
+
+    python -m benchmarks.bench_read_routing [--reads 500] [--broken-replica]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from benchmarks._support import (
+    QueryCounter,
+    percentiles,
+    seed_goal_trees,
+    use_temp_database,
+)
+
+USERS = 200
+GOALS_PER_USER = 5
+
+
+def replicate(primary_path: str, replica_path: str) -> None:
+    """Copies the primary database file into the replica file."""
+    with sqlite3.connect(primary_path) as source, sqlite3.connect(replica_path) as target:
+        source.backup(target)
+
+
+def token_for(user_id: int) -> dict:
+    from jose import jwt
+
+    from app.services.auth import ALGORITHM, SECRET_KEY
+
+    token = jwt.encode(
+        {"sub": f"user{user_id}@example.com", "user_id": user_id, "exp": time.time() + 3600},
+        SECRET_KEY, algorithm=ALGORITHM
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def main(reads: int, primary_path: str, replica_path: str) -> None:
+    import httpx
+
+    from app.database import create_tables, engine, session_router
+    from app.main import app
+
+    await create_tables()
+    await seed_goal_trees(engine, USERS, GOALS_PER_USER, 4, 4)
+    replicate(primary_path, replica_path)
+
+    primary_queries = QueryCounter(engine)
+    replica_queries = QueryCounter(session_router.replicas[0].engine)
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for replica in session_router.replicas:
+            state = f"usable, lag {replica.lag:.1f} s" if replica.healthy else f"unusable ({replica.failures} failed checks)"
+            print(f"{replica.name}: {state}")
+
+        timings = []
+        errors = 0
+        for _ in range(reads):
+            goal_id = random.randint(1, USERS * GOALS_PER_USER)
+            user_id = (goal_id - 1) // GOALS_PER_USER + 1
+            start = time.perf_counter()
+            response = await client.get(f"/api/goals/{goal_id}/tree", headers=token_for(user_id))
+            timings.append(time.perf_counter() - start)
+            errors += response.status_code != 200
+        p = percentiles(timings)
+        print(
+            f"\ntree reads: {reads} ({errors} errors), p50 {p['p50'] * 1000:.1f} ms, p95 {p['p95'] * 1000:.1f} ms"
+        )
+        print(f"  statements on primary: {primary_queries.statements}, on replica1: {replica_queries.statements}")
+
+        # The replica never sees this write; the follow-up read must not go there
+        headers = token_for(1)
+        tree = (await client.get("/api/goals/1/tree", headers=headers)).json()
+        action_id = tree["subgoals"][0]["actions"][0]["id"]
+        primary_queries.reset()
+        replica_queries.reset()
+        response = await client.patch(
+            f"/api/goals/1/actions/{action_id}", json={"status": "Completed"}, headers=headers
+        )
+        response.raise_for_status()
+        progress = (await client.get("/api/goals/1/progress", headers=headers)).json()
+        print("\nread-your-writes:")
+        print(f"  completed_count right after completing an action: {progress['completed_count']} (expected 1)")
+        print(f"  statements on primary: {primary_queries.statements}, on replica1: {replica_queries.statements}")
+
+        # Another user (without the writer's cookie) keeps reading from the replica
+        replica_queries.reset()
+        client.cookies.clear()
+        await client.get(f"/api/goals/{GOALS_PER_USER + 1}/progress", headers=token_for(2))
+        print(f"  another user's read, statements on replica1: {replica_queries.statements}")
+        print(f"\nrouter stats: {session_router.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reads", type=int, default=500)
+    parser.add_argument("--broken-replica", action="store_true", help="also configure a replica that is down")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_database(tmp)
+        replica_path = os.path.join(tmp, "replica.db")
+        urls = [f"sqlite+aiosqlite:///{replica_path}"]
+        if args.broken_replica:
+            urls.append(f"sqlite+aiosqlite:///{os.path.join(tmp, 'missing', 'replica.db')}")
+        os.environ["DATABASE_REPLICA_URLS"] = ",".join(urls)
+        os.environ["ADMISSION_ENABLED"] = "false"
+        asyncio.run(main(args.reads, os.path.join(tmp, "bench.db"), replica_path))
@@ -0,0 +1,96 @@
+"""
+Serialization cost of one full 8x8 goal tree, the largest payload the API
+returns. Compares FastAPI's generic jsonable_encoder + json.dumps path with
+the response-model fast path (Pydantic's Rust serializer straight to JSON
+bytes), and what GZip adds on top.
+
+    python -m benchmarks.bench_serialization [--iterations 2000]
+"""
+import argparse
+import gzip
+import json
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks._support import percentiles, use_temp_database
+
+
+def build_tree(subgoals: int, actions: int):
+    from app.models.goals import (
+        Actions,
+        ActionStatus,
+        Goal,
+        GoalStatus,
+        SubGoal,
+        SubgoalCategory,
+    )
+
+    now = datetime.utcnow()
+    categories = list(SubgoalCategory)
+    return Goal(
+        id=1, user_id=1, title="Run a marathon", description="Run a marathon",
+        status=GoalStatus.active, created_at=now, updated_at=now, version=1,
+        subgoals=[
+            SubGoal(
+                id=s, goal_id=1, title=f"Milestone {s}", description=f"Milestone {s}",
+                category=categories[s % len(categories)],
+                action_count=actions, completed_count=0,
+                actions=[
+                    Actions(id=s * actions + a, subgoal_id=s, status=ActionStatus.pending, position=a, version=1,
+                            description=f"Work on step {a + 1} of milestone {s + 1} for 30 minutes")
+                    for a in range(actions)
+                ],
+            )
+            for s in range(subgoals)
+        ],
+    )
+
+
+def timed(fn, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return result, percentiles(samples)
+
+
+def main(iterations: int, subgoals: int, actions: int) -> None:
+    from fastapi.encoders import jsonable_encoder
+
+    from app.schemas.goal import GoalTreeResponse
+
+    goal = build_tree(subgoals, actions)
+
+    def generic():
+        # What FastAPI does with a custom response class or no response model
+        model = GoalTreeResponse.model_validate(goal)
+        return json.dumps(jsonable_encoder(model)).encode()
+
+    def fast_path():
+        return GoalTreeResponse.model_validate(goal).model_dump_json().encode()
+
+    body = fast_path()
+    print(f"{subgoals}x{actions} tree, {len(body)} bytes, {iterations} iterations")
+    for name, fn in (
+        ("jsonable_encoder", generic),
+        ("model_dump_json", fast_path),
+        ("+ gzip level 5", lambda: gzip.compress(fast_path(), compresslevel=5)),
+    ):
+        payload, p = timed(fn, iterations)
+        print(
+            f"{name:<17} p50={p['p50'] * 1e6:7.1f} us p99={p['p99'] * 1e6:7.1f} us "
+            f"size={len(payload):6d} bytes"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--subgoals", type=int, default=8)
+    parser.add_argument("--actions", type=int, default=8)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_database(tmp)
+        main(args.iterations, args.subgoals, args.actions)
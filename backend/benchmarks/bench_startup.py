@@ -0,0 +1,72 @@
+"""
+Cold-start time of a worker: each run is a fresh interpreter that imports
+the app, runs the lifespan startup and serves its first /health request.
+Also reports what the Gemini SDK would add if it were imported eagerly.
+
+    python -m benchmarks.bench_startup [--runs 10]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks._support import use_temp_database
+
+CHILD = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+
+async def serve_first_request():
+    import httpx
+    async with app.main.app.router.lifespan_context(app.main.app):
+        started = time.perf_counter()
+        transport = httpx.ASGITransport(app=app.main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            (await client.get("/health")).raise_for_status()
+        return started, time.perf_counter()
+
+started, served = asyncio.run(serve_first_request())
+genai_loaded = "google.genai" in sys.modules
+sdk_start = time.perf_counter()
+import google.genai
+sdk = time.perf_counter() - sdk_start
+print(json.dumps({
+    "import": imported - start,
+    "lifespan": started - imported,
+    "first_request": served - started,
+    "total": served - start,
+    "genai_loaded": genai_loaded,
+    "genai_import": sdk,
+}))
+"""
+
+
+def main(runs: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_database(tmp)
+        env = dict(os.environ)
+        samples = []
+        for _ in range(runs):
+            output = subprocess.run(
+                [sys.executable, "-c", CHILD], env=env, check=True, capture_output=True, text=True
+            ).stdout
+            samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{runs} cold starts (median / max, ms)")
+    for key in ("import", "lifespan", "first_request", "total", "genai_import"):
+        values = [sample[key] * 1000 for sample in samples]
+        label = "genai (deferred)" if key == "genai_import" else key
+        print(f"  {label:<17} {statistics.median(values):8.1f} / {max(values):8.1f}")
+    loaded = sum(sample["genai_loaded"] for sample in samples)
+    print(f"  google.genai imported during startup in {loaded}/{runs} runs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    main(parser.parse_args().runs)
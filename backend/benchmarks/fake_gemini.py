@@ -0,0 +1,179 @@
+"""
+Local stand-in for the Gemini API.
+
+Answers `generateContent` and `streamGenerateContent` (SSE) with a plan in
+the shape SYS_PROMPT asks for (or micro-steps, for MICRO_STEP_PROMPT
+requests), after a configurable delay, and accepts
+`cachedContents` creation so prompt-prefix caching can be exercised. Point the app at
+it with GEMINI_BASE_URL:
+
+    python -m benchmarks.fake_gemini --port 8765 --latency-ms 800
+    GEMINI_BASE_URL=http://127.0.0.1:8765 GEMINI_API_KEY=fake uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+from typing import Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+
+def build_plan(goal: str, subgoals: int = 8, actions: int = 8, fenced: bool = True) -> str:
+    """A plan as the model returns it: JSON inside a ```json fence unless JSON mode was requested."""
+    plan = {
+        "Goal": goal,
+        "subGoals": [
+            {
+                "title": f"Milestone {s + 1} for {goal}",
+                "actionSteps": [
+                    {
+                        "title": f"Step {a + 1}",
+                        "description": f"Work on step {a + 1} of milestone {s + 1} for {goal}",
+                        "estimatedMinutes": 15 + 5 * a,
+                    }
+                    for a in range(actions)
+                ],
+            }
+            for s in range(subgoals)
+        ],
+    }
+    text = json.dumps(plan, indent=2)
+    return "```json\n" + text + "\n```" if fenced else text
+
+
+def build_micro_steps(action: str, count: int = 5) -> str:
+    """Micro-steps as the model returns them in JSON mode."""
+    return json.dumps({"microSteps": [{"title": f"Micro-step {m + 1} of {action}"} for m in range(count)]})
+
+
+def _response(text: str) -> dict:
+    return {
+        "candidates": [
+            {"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP", "index": 0}
+        ],
+        "usageMetadata": {"promptTokenCount": 400, "candidatesTokenCount": len(text) // 4},
+    }
+
+
+def _prompt(body: dict) -> str:
+    try:
+        return body["contents"][0]["parts"][0]["text"]
+    except (KeyError, IndexError, TypeError):
+        return ""
+
+
+def _goal_from(body: dict) -> str:
+    """Pulls the user's goal out of the prompt the app sent."""
+    return _prompt(body).rsplit("User Goal:", 1)[-1].strip()[:200] or "Fake goal"
+
+
+def create_app(
+    latency_ms: float = 500,
+    jitter_ms: float = 0,
+    subgoals: int = 8,
+    actions: int = 8,
+    chunks: int = 20,
+) -> Starlette:
+    """`latency_ms` (+/- jitter) is the total time per response, spread over chunks when streaming."""
+    stats = {"requests": 0, "cached_contents": 0}
+
+    def delay() -> float:
+        return max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000
+
+    async def generate(request: Request):
+        model_and_method = request.path_params["target"]
+        body = await request.json()
+        stats["requests"] += 1
+        json_mode = body.get("generationConfig", {}).get("responseMimeType") == "application/json"
+        prompt = _prompt(body)
+        if "Action Step:" in prompt:
+            text = build_micro_steps(prompt.split("Action Step:", 1)[1].split("\n", 1)[0].strip())
+        else:
+            text = build_plan(_goal_from(body), subgoals, actions, fenced=not json_mode)
+
+        if model_and_method.endswith(":streamGenerateContent"):
+            total = delay()
+            size = max(1, len(text) // chunks)
+            parts = [text[i:i + size] for i in range(0, len(text), size)]
+
+            async def events():
+                for part in parts:
+                    await asyncio.sleep(total / len(parts))
+                    yield f"data: {json.dumps(_response(part))}\r\n\r\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await asyncio.sleep(delay())
+        return JSONResponse(_response(text))
+
+    async def create_cached_content(request: Request):
+        body = await request.json()
+        stats["cached_contents"] += 1
+        return JSONResponse({
+            "name": f"cachedContents/fake-{stats['cached_contents']}",
+            "model": body.get("model"),
+        })
+
+    async def get_stats(request: Request):
+        return JSONResponse(stats)
+
+    return Starlette(routes=[
+        Route("/{version}/models/{target:path}", generate, methods=["POST"]),
+        Route("/{version}/cachedContents", create_cached_content, methods=["POST"]),
+        Route("/stats", get_stats),
+    ])
+
+
+class FakeGeminiServer:
+    """Runs the fake API with uvicorn on a background thread."""
+
+    def __init__(self, port: Optional[int] = None, **options):
+        self.port = port or _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        config = uvicorn.Config(
+            create_app(**options), host="127.0.0.1", port=self.port, log_level="warning"
+        )
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def __enter__(self) -> "FakeGeminiServer":
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Fake Gemini server did not start")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=500)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--subgoals", type=int, default=8)
+    parser.add_argument("--actions", type=int, default=8)
+    args = parser.parse_args()
+    uvicorn.run(
+        create_app(args.latency_ms, args.jitter_ms, args.subgoals, args.actions),
+        host="127.0.0.1",
+        port=args.port,
+    )
@@ -0,0 +1,226 @@
+"""
+End-to-end load scenarios against the ASGI app, fully offline.
+
+Goal generation goes through the real Gemini client to a local fake server
+(benchmarks.fake_gemini); the database is a seeded throwaway SQLite file,
+or any empty database given with --database-url (e.g. postgresql+asyncpg).
+
+Scenarios:
+
+    register   concurrent registrations (bcrypt hash on the hashing pool)
+    login      concurrent logins of the registered users (bcrypt verify)
+    create     burst of authenticated goal creations (fake LLM + tree insert)
+    tree       goal-tree reads spread over the seeded users
+
+Each reports throughput, p50/p95/p99 latency and DB statements per request.
+With --baseline, the run fails (exit 1) if a scenario errors, issues more
+queries per request, or is slower than the baseline beyond --tolerance.
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --baseline benchmarks/baseline.json
+    python -m benchmarks.suite --update-baseline benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict, List
+
+from benchmarks._support import (
+    QueryCounter,
+    percentiles,
+    seed_goal_trees,
+    use_temp_database,
+)
+from benchmarks.fake_gemini import FakeGeminiServer
+
+SCENARIOS = ("register", "login", "create", "tree")
+PASSWORD = "BenchPassw0rd"
+
+
+async def run_scenario(
+    counter: QueryCounter,
+    requests: List[Callable[[], Awaitable]],
+    concurrency: int,
+) -> Dict[str, float]:
+    """Runs the requests with at most `concurrency` in flight and summarizes them."""
+    pending = iter(requests)
+    timings: List[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for request in pending:
+            start = time.perf_counter()
+            response = await request()
+            timings.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    counter.reset()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    p = percentiles(timings)
+    return {
+        "requests": len(timings),
+        "errors": errors,
+        "throughput": round(len(timings) / elapsed, 2),
+        "p50_ms": round(p["p50"] * 1000, 2),
+        "p95_ms": round(p["p95"] * 1000, 2),
+        "p99_ms": round(p["p99"] * 1000, 2),
+        "queries_per_request": round(counter.statements / max(len(timings), 1), 2),
+    }
+
+
+async def run_suite(args) -> Dict[str, Dict[str, float]]:
+    import email_validator
+    import httpx
+    from jose import jwt
+
+    from app.database import create_tables, engine
+    from app.main import app
+    from app.services.auth import ALGORITHM, SECRET_KEY
+
+    # Registration checks deliverability over DNS, which an offline run can't do
+    email_validator.CHECK_DELIVERABILITY = False
+
+    await create_tables()
+    await seed_goal_trees(engine, args.seed_users, args.seed_goals, 8, 8)
+    counter = QueryCounter(engine)
+
+    def token_for(user_id: int, email: str) -> Dict[str, str]:
+        token = jwt.encode(
+            {"sub": email, "user_id": user_id, "exp": time.time() + 3600}, SECRET_KEY, algorithm=ALGORITHM
+        )
+        return {"Authorization": f"Bearer {token}"}
+
+    results: Dict[str, Dict[str, float]] = {}
+    registered: List[Dict] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+
+        if {"register", "login", "create"} & set(scenarios):
+            emails = [f"bench{i}@example.com" for i in range(args.users)]
+
+            async def register(email: str):
+                response = await client.post("/api/auth/register", json={
+                    "user_name": email.split("@")[0], "email": email, "password": PASSWORD
+                })
+                if response.status_code == 200:
+                    registered.append(response.json()["user"])
+                return response
+
+            results["register"] = await run_scenario(
+                counter, [lambda e=e: register(e) for e in emails], args.concurrency
+            )
+
+        if "login" in scenarios:
+            results["login"] = await run_scenario(counter, [
+                lambda u=u: client.post("/api/auth/login", json={"email": u["email"], "password": PASSWORD})
+                for u in registered
+            ], args.concurrency)
+
+        if "create" in scenarios:
+            results["create"] = await run_scenario(counter, [
+                lambda i=i, u=registered[i % len(registered)]: client.post(
+                    "/api/goals/create",
+                    json={"user_id": u["id"], "prompt": f"Run a marathon, attempt {i}"},
+                    headers=token_for(u["id"], u["email"]),
+                )
+                for i in range(args.goals)
+            ], args.concurrency)
+
+        if "tree" in scenarios:
+            goal_count = args.seed_users * args.seed_goals
+            reads = []
+            for _ in range(args.reads):
+                goal_id = random.randint(1, goal_count)
+                user_id = (goal_id - 1) // args.seed_goals + 1
+                headers = token_for(user_id, f"user{user_id}@example.com")
+                reads.append(lambda g=goal_id, h=headers: client.get(f"/api/goals/{g}/tree", headers=h))
+            results["tree"] = await run_scenario(counter, reads, args.concurrency)
+
+    return {name: results[name] for name in SCENARIOS if name in results}
+
+
+def check_baseline(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Returns a description of every regression against the baseline."""
+    failures = []
+    for name, current in results.items():
+        if current["errors"]:
+            failures.append(f"{name}: {current['errors']} failed requests")
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        # Query counts are deterministic, so any increase is a regression
+        if current["queries_per_request"] > expected["queries_per_request"] + 0.01:
+            failures.append(
+                f"{name}: queries/request {current['queries_per_request']} > {expected['queries_per_request']}"
+            )
+        if current["p95_ms"] > expected["p95_ms"] * (1 + tolerance):
+            failures.append(f"{name}: p95 {current['p95_ms']} ms > {expected['p95_ms']} ms +{tolerance:.0%}")
+        if current["throughput"] < expected["throughput"] * (1 - tolerance):
+            failures.append(f"{name}: throughput {current['throughput']}/s < {expected['throughput']}/s -{tolerance:.0%}")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=("all",) + SCENARIOS, default="all")
+    parser.add_argument("--users", type=int, default=32, help="users registered (and logged in)")
+    parser.add_argument("--goals", type=int, default=32, help="goals created in the burst")
+    parser.add_argument("--reads", type=int, default=500, help="goal-tree reads")
+    parser.add_argument("--seed-users", type=int, default=1000)
+    parser.add_argument("--seed-goals", type=int, default=5, help="seeded goals per user")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    parser.add_argument("--database-url", help="empty database to use instead of a temp SQLite file")
+    parser.add_argument("--baseline", help="fail if results regress past this baseline file")
+    parser.add_argument("--update-baseline", metavar="PATH", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed latency/throughput drift")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, FakeGeminiServer(latency_ms=args.llm_latency_ms) as llm:
+        # The app reads its configuration at import time
+        use_temp_database(tmp)
+        if args.database_url:
+            os.environ["DATABASE_URL"] = args.database_url
+        os.environ["GEMINI_BASE_URL"] = llm.url
+        os.environ.setdefault("GEMINI_API_KEY", "fake")
+        os.environ["ADMISSION_ENABLED"] = "false"
+        os.environ["PLAN_CACHE_ENABLED"] = "false"
+        results = asyncio.run(run_suite(args))
+
+    print(f"{'scenario':<10} {'reqs':>5} {'errs':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+    for name, r in results.items():
+        print(
+            f"{name:<10} {r['requests']:>5} {r['errors']:>5} {r['throughput']:>8.1f} {r['p50_ms']:>8.1f} "
+            f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['queries_per_request']:>8.2f}"
+        )
+
+    if args.update_baseline:
+        with open(args.update_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.update_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = check_baseline(results, json.load(f), args.tolerance)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
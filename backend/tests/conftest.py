@@ -0,0 +1,134 @@
+"""
+Shared fixtures. The app runs in process against a throwaway SQLite file;
+the environment is set before anything under `app` is imported, which is
+why app modules are only imported inside the fixtures here.
+"""
+import itertools
+import os
+import shutil
+import tempfile
+from typing import Dict, List
+
+import pytest
+
+_DATABASE_DIR = tempfile.mkdtemp(prefix="apollo-tests-")
+DATABASE_URL = f"sqlite+aiosqlite:///{os.path.join(_DATABASE_DIR, 'test.db')}"
+
+os.environ["DATABASE_URL"] = DATABASE_URL
+os.environ["DB_PROFILE"] = "test"
+os.environ["DATABASE_REPLICA_URLS"] = ""
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+os.environ["ADMISSION_ENABLED"] = "false"
+os.environ["PASSWORD_HASH_WORKERS"] = "0"
+os.environ["GOAL_TREE_CACHE_ENABLED"] = "false"
+os.environ["PLAN_CACHE_ENABLED"] = "false"
+
+_user_numbers = itertools.count(1)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    import asyncio
+
+    from app.database import create_tables, engine
+
+    async def setup():
+        await create_tables()
+        await engine.dispose()
+
+    asyncio.run(setup())
+    yield DATABASE_URL
+    shutil.rmtree(_DATABASE_DIR, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+async def dispose_engine():
+    """Pooled connections belong to the test's event loop; drop them afterwards."""
+    from app.database import engine
+
+    yield
+    await engine.dispose()
+
+
+@pytest.fixture
+async def client():
+    import email_validator
+    import httpx
+
+    from app.main import app
+
+    # Test addresses don't resolve
+    email_validator.CHECK_DELIVERABILITY = False
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+def llm():
+    """Points the process-wide LLM client at a FakeLLMBackend (client.backend)."""
+    from app.core import llm
+    from tests.fakes import FakeLLMBackend
+
+    previous = llm._client
+    client = llm.set_llm_client(
+        llm.LLMClient(FakeLLMBackend(), max_concurrency=2, timeout=5, backoff_base=0, backoff_max=0)
+    )
+    yield client
+    llm._client = previous
+
+
+@pytest.fixture
+def make_user(client):
+    """Registers a new user; returns their ID, email and auth headers."""
+    async def register() -> Dict:
+        name = f"user{next(_user_numbers)}"
+        response = await client.post(
+            "/api/auth/register",
+            json={"user_name": name, "email": f"{name}@example.com", "password": "Passw0rdTest"},
+        )
+        response.raise_for_status()
+        body = response.json()
+        return {
+            "id": body["user"]["id"],
+            "email": body["user"]["email"],
+            "headers": {"Authorization": f"Bearer {body['access_token']}"},
+        }
+
+    return register
+
+
+@pytest.fixture
+async def user(make_user) -> Dict:
+    return await make_user()
+
+
+@pytest.fixture
+def make_goal():
+    """Stores a goal tree for a user the way goal generation does; returns its ID."""
+    return _create_goal
+
+
+async def _create_goal(user_id: int, subgoals: int = 2, actions: int = 3) -> int:
+    from app.database import async_session_maker
+    from app.models.goals import Goal, SubgoalCategory
+    from app.repositories.goals import GoalRepository
+
+    categories = list(SubgoalCategory)
+    subgoal_rows: List[Dict] = [
+        {"title": f"Subgoal {s + 1}", "description": f"Subgoal {s + 1}", "category": categories[s % len(categories)]}
+        for s in range(subgoals)
+    ]
+    action_rows = [
+        [{"description": f"Action {s + 1}.{a + 1}", "estimated_minutes": 10} for a in range(actions)]
+        for s in range(subgoals)
+    ]
+    async with async_session_maker() as db:
+        goal = Goal(user_id=user_id, title="Learn to swim", description="Learn to swim")
+        goal = await GoalRepository(db).create_tree(goal, subgoal_rows, action_rows)
+        return goal.id
+
+
+@pytest.fixture
+async def goal(user, make_goal) -> int:
+    return await make_goal(user["id"])
@@ -0,0 +1,68 @@
+"""Stand-ins for external services used by the tests."""
+import asyncio
+import itertools
+from typing import Any, AsyncGenerator, Iterator, List, Optional
+
+from app.core.llm import LLMBackend
+
+
+class Unavailable(Exception):
+    """A retryable model error (HTTP 503)."""
+    code = 503
+
+
+class FakeLLMBackend(LLMBackend):
+    """
+    Answers with `reply`, streamed `chunk_size` characters at a time; with no
+    reply, generate() returns "ok" and streams never end. The first
+    `failures` calls fail with a retryable error, and a stream fails after
+    `fail_after` chunks. The contents of every call are kept in `contents`.
+    """
+
+    def __init__(
+        self,
+        reply: Optional[str] = None,
+        chunk_size: int = 16,
+        failures: int = 0,
+        fail_after: Optional[int] = None,
+        delay: float = 0,
+    ):
+        self.reply = reply
+        self.chunk_size = chunk_size
+        self.failures = failures
+        self.fail_after = fail_after
+        self.delay = delay
+        self.calls = 0
+        self.closed = 0
+        self.contents: List[Any] = []
+
+    async def generate(self, model, contents, config=None) -> str:
+        self.contents.append(contents)
+        self._fail_first_calls()
+        await asyncio.sleep(self.delay)
+        return "ok" if self.reply is None else self.reply
+
+    async def stream(self, model, contents, config=None) -> AsyncGenerator[str, None]:
+        self.contents.append(contents)
+        self._fail_first_calls()
+        try:
+            for n, chunk in enumerate(self._chunks()):
+                if n == self.fail_after:
+                    raise Unavailable()
+                await asyncio.sleep(self.delay)
+                yield chunk
+        finally:
+            self.closed += 1
+
+    async def cache_prefix(self, model, system_instruction, ttl_seconds) -> str:
+        return "cachedContents/fake"
+
+    def _fail_first_calls(self) -> None:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise Unavailable()
+
+    def _chunks(self) -> Iterator[str]:
+        if self.reply is None:
+            return (f"chunk{n}" for n in itertools.count())
+        return (self.reply[i:i + self.chunk_size] for i in range(0, len(self.reply), self.chunk_size))
@@ -0,0 +1,48 @@
+async def actions_of(client, user, goal):
+    response = await client.get(f"/api/goals/{goal}/tree", headers=user["headers"])
+    response.raise_for_status()
+    return [action for subgoal in response.json()["subgoals"] for action in subgoal["actions"]]
+
+
+async def test_update_bumps_versions(client, user, goal):
+    first, second = (await actions_of(client, user, goal))[:2]
+
+    response = await client.patch(
+        f"/api/goals/{goal}/actions",
+        json={"changes": [
+            {"id": first["id"], "version": first["version"], "status": "Completed"},
+            {"id": second["id"], "version": second["version"], "description": "Float on your back"},
+        ]},
+        headers=user["headers"],
+    )
+
+    assert response.status_code == 200
+    items = {item["id"]: item for item in response.json()["items"]}
+    assert items[first["id"]]["version"] == first["version"] + 1
+    assert items[first["id"]]["status"] == "Completed"
+    assert items[second["id"]]["description"] == "Float on your back"
+
+
+async def test_stale_version_is_rejected(client, user, goal):
+    action, other = (await actions_of(client, user, goal))[:2]
+    url = f"/api/goals/{goal}/actions"
+    change = {"id": action["id"], "version": action["version"], "description": "Kick with straight legs"}
+    assert (await client.patch(url, json={"changes": [change]}, headers=user["headers"])).status_code == 200
+
+    # Another client still holds the old version
+    response = await client.patch(
+        url,
+        json={"changes": [
+            {"id": other["id"], "version": other["version"], "status": "Completed"},
+            {"id": action["id"], "version": action["version"], "status": "Completed"},
+        ]},
+        headers=user["headers"],
+    )
+
+    assert response.status_code == 409
+    assert str(action["id"]) in response.json()["detail"]
+    # Nothing in the batch was applied
+    current = {item["id"]: item for item in await actions_of(client, user, goal)}
+    assert current[other["id"]]["status"] == "Pending"
+    assert current[other["id"]]["version"] == other["version"]
+    assert current[action["id"]]["description"] == "Kick with straight legs"
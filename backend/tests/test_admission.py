@@ -0,0 +1,70 @@
+import pytest
+
+from app import dependencies
+from app.core import admission
+from app.core.admission import (
+    AdmissionRejected,
+    InMemoryTokenBucketBackend,
+    RouteAdmission,
+    load_route_class,
+)
+
+
+@pytest.fixture
+def limit(monkeypatch):
+    """Turns admission control on with the given limits for a route class."""
+    monkeypatch.setattr(dependencies, "ADMISSION_ENABLED", True)
+    monkeypatch.setattr(admission, "_routes", {})
+
+    def install(name: str, **limits) -> RouteAdmission:
+        limits = {**load_route_class(name), **limits}
+        return admission.set_route_admission(RouteAdmission(name, InMemoryTokenBucketBackend(), limits))
+
+    return install
+
+
+async def test_bucket_allows_a_burst_then_waits_for_refill():
+    backend = InMemoryTokenBucketBackend()
+
+    assert [await backend.take("key", 1, 2) for _ in range(2)] == [0, 0]
+    retry_after = await backend.take("key", 1, 2)
+    assert 0.9 < retry_after <= 1
+    assert await backend.take("other", 1, 2) == 0
+
+
+async def test_user_bucket_is_checked_before_ip():
+    route = RouteAdmission("llm", InMemoryTokenBucketBackend(), {
+        "user_per_minute": 60, "user_burst": 1, "ip_per_minute": 60, "ip_burst": 5, "max_concurrency": 0,
+    })
+    (await route.enter("10.0.0.1", 1))()
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await route.enter("10.0.0.1", 1)
+    assert rejected.value.reason == "user"
+    # Another user behind the same IP still gets in
+    (await route.enter("10.0.0.1", 2))()
+    assert (route.admitted, route.rejected_user, route.in_flight) == (2, 1, 0)
+
+
+async def test_ip_over_its_bucket_gets_429(client, limit):
+    route = limit("auth", ip_per_minute=1, ip_burst=2)
+    credentials = {"email": "nobody@example.com", "password": "Passw0rdTest"}
+
+    responses = [await client.post("/api/auth/login", json=credentials) for _ in range(3)]
+
+    assert [response.status_code for response in responses] == [401, 401, 429]
+    # One token a minute, none left
+    assert responses[-1].headers["retry-after"] == "60"
+    assert (route.admitted, route.rejected_ip, route.in_flight) == (2, 1, 0)
+
+
+async def test_user_over_their_bucket_gets_429(client, user, llm, limit):
+    route = limit("llm", user_per_minute=30, user_burst=1)
+
+    first = await client.post("/api/goals/create", json={"prompt": "swim"}, headers=user["headers"])
+    second = await client.post("/api/goals/create", json={"prompt": "swim"}, headers=user["headers"])
+
+    assert first.status_code != 429
+    assert second.status_code == 429
+    assert second.headers["retry-after"] == "2"
+    assert route.rejected_user == 1
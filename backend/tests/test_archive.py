@@ -0,0 +1,124 @@
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict
+
+import pytest
+from sqlalchemy import func, select, update
+
+from app.database import async_session_maker
+from app.models.archive import archived_actions, archived_goals, archived_subgoals
+from app.models.chat import ChatMessage, ChatRole, Conversation
+from app.models.goals import Actions, Goal, GoalStatus, MicroStep, SubGoal
+from app.models.jobs import GenerationJob, JobStatus
+from app.models.search import SearchEntry
+from app.services.archive import archive_goals
+
+
+@pytest.fixture
+async def tree(user, goal) -> Dict:
+    """The goal with a chat about one of its actions, micro-steps and the job that created it."""
+    async with async_session_maker() as db:
+        action_id = await db.scalar(
+            select(Actions.id).join(SubGoal).where(SubGoal.goal_id == goal).order_by(Actions.id).limit(1)
+        )
+        conversation = Conversation(user_id=user["id"], goal_id=goal, message_count=1)
+        db.add(conversation)
+        await db.flush()
+        job_id = uuid.uuid4().hex
+        db.add_all([
+            ChatMessage(conversation_id=conversation.id, user_id=user["id"], goal_id=goal, action_id=action_id,
+                        role=ChatRole.user, content="How do I kick?"),
+            MicroStep(action_id=action_id, title="Hold the wall"),
+            GenerationJob(id=job_id, user_id=user["id"], prompt="swim", dedup_key=job_id,
+                          status=JobStatus.succeeded, goal_id=goal),
+        ])
+        await db.commit()
+        return {"goal": goal, "action_id": action_id, "conversation_id": conversation.id, "job_id": job_id}
+
+
+async def count(db, column, condition) -> int:
+    return await db.scalar(select(func.count()).select_from(column.table).where(condition))
+
+
+async def live_rows(db, goal: int) -> Dict[str, int]:
+    subgoal_ids = select(SubGoal.id).where(SubGoal.goal_id == goal)
+    return {
+        "goals": await count(db, Goal.id, Goal.id == goal),
+        "subgoals": await count(db, SubGoal.id, SubGoal.goal_id == goal),
+        "actions": await count(db, Actions.id, Actions.subgoal_id.in_(subgoal_ids)),
+        "micro_steps": await count(db, MicroStep.id, MicroStep.action_id.in_(
+            select(Actions.id).where(Actions.subgoal_id.in_(subgoal_ids))
+        )),
+        "search_entries": await count(db, SearchEntry.id, SearchEntry.goal_id == goal),
+    }
+
+
+async def archived_rows(db, goal: int) -> Dict[str, int]:
+    return {
+        "goals": await count(db, archived_goals.c.id, archived_goals.c.id == goal),
+        "subgoals": await count(db, archived_subgoals.c.id, archived_subgoals.c.goal_id == goal),
+        "actions": await count(db, archived_actions.c.id, archived_actions.c.subgoal_id.in_(
+            select(archived_subgoals.c.id).where(archived_subgoals.c.goal_id == goal)
+        )),
+    }
+
+
+async def test_delete_removes_the_whole_tree(client, user, tree):
+    goal = tree["goal"]
+
+    response = await client.delete(f"/api/goals/{goal}", headers=user["headers"])
+
+    assert response.status_code == 204
+    async with async_session_maker() as db:
+        assert set((await live_rows(db, goal)).values()) == {0}
+        assert set((await archived_rows(db, goal)).values()) == {0}
+        assert await db.get(Conversation, tree["conversation_id"]) is None
+        assert await count(db, ChatMessage.id, ChatMessage.conversation_id == tree["conversation_id"]) == 0
+        # The job record outlives the goal it created
+        job = await db.get(GenerationJob, tree["job_id"])
+        assert (job.status, job.goal_id) == (JobStatus.succeeded, None)
+
+
+async def test_archive_moves_the_tree_and_detaches_chats(client, user, tree):
+    goal = tree["goal"]
+    async with async_session_maker() as db:
+        before = await live_rows(db, goal)
+        subgoal_ids = list(await db.scalars(select(SubGoal.id).where(SubGoal.goal_id == goal)))
+
+    response = await client.delete(f"/api/goals/{goal}", params={"archive": "true"}, headers=user["headers"])
+
+    assert response.status_code == 204
+    async with async_session_maker() as db:
+        assert set((await live_rows(db, goal)).values()) == {0}
+        assert await archived_rows(db, goal) == {"goals": 1, "subgoals": 2, "actions": 6}
+        assert before == {"goals": 1, "subgoals": 2, "actions": 6, "micro_steps": 1, "search_entries": 9}
+        # Same IDs, stamped when they were archived
+        archived = (await db.execute(select(archived_subgoals).where(archived_subgoals.c.goal_id == goal))).all()
+        assert sorted(row.id for row in archived) == subgoal_ids
+        assert all(row.archived_at is not None for row in archived)
+        # The conversation stays with the user
+        conversation = await db.get(Conversation, tree["conversation_id"])
+        assert (conversation.user_id, conversation.goal_id) == (user["id"], None)
+        message = await db.scalar(
+            select(ChatMessage).where(ChatMessage.conversation_id == tree["conversation_id"])
+        )
+        assert (message.content, message.goal_id, message.action_id) == ("How do I kick?", None, None)
+    assert (await client.get(f"/api/goals/{goal}/tree", headers=user["headers"])).status_code == 404
+
+
+async def test_archive_job_picks_completed_and_inactive_goals(user, make_goal):
+    active, completed, inactive, recent = [await make_goal(user["id"]) for _ in range(4)]
+    long_ago = datetime.utcnow() - timedelta(days=400)
+    async with async_session_maker() as db:
+        await db.execute(update(Goal).where(Goal.id.in_([active, inactive, recent])).values(status=GoalStatus.active))
+        await db.execute(update(Goal).where(Goal.id == inactive).values(updated_at=long_ago))
+        await db.execute(update(Goal).where(Goal.id == recent).values(updated_at=long_ago, last_activity_at=datetime.utcnow()))
+        await db.commit()
+
+    assert await archive_goals(completed=True, inactive_days=180, user_id=user["id"], batch_size=1) == 2
+
+    async with async_session_maker() as db:
+        live = set(await db.scalars(select(Goal.id).where(Goal.user_id == user["id"])))
+        archived = set(await db.scalars(select(archived_goals.c.id).where(archived_goals.c.user_id == user["id"])))
+    assert live == {active, recent}
+    assert archived == {completed, inactive}
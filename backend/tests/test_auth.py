@@ -0,0 +1,93 @@
+import asyncio
+import threading
+
+import pytest
+from passlib.context import CryptContext
+from sqlalchemy import select
+
+from app.core import hashing
+from app.core.hashing import HashingPoolSaturated, PasswordHasher
+from app.database import async_session_maker
+from app.models.user import User
+
+PASSWORD = "Passw0rdTest"
+
+
+@pytest.fixture
+def use_hasher():
+    """Installs a process-wide password hasher for the test."""
+    previous = hashing._hasher
+
+    def install(hasher: PasswordHasher) -> PasswordHasher:
+        return hashing.set_password_hasher(hasher)
+
+    yield install
+    hashing._hasher = previous
+
+
+class BlockingContext:
+    """Hashes only once released, to hold pool workers busy."""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def hash(self, password):
+        self.release.wait(5)
+        return "hashed"
+
+
+async def test_saturated_pool_rejects_work():
+    context = BlockingContext()
+    hasher = PasswordHasher(context, max_workers=1, max_pending=1)
+    busy = [asyncio.ensure_future(hasher.hash(PASSWORD)) for _ in range(2)]
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(HashingPoolSaturated):
+        await hasher.hash(PASSWORD)
+
+    context.release.set()
+    assert await asyncio.gather(*busy) == ["hashed", "hashed"]
+    assert (hasher.rejected, hasher.completed, hasher.pending) == (1, 2, 0)
+
+
+async def test_saturated_pool_gets_503(client, user, use_hasher):
+    hasher = use_hasher(PasswordHasher(max_workers=1, max_pending=0))
+    # Every slot is taken
+    hasher.pending = 1
+
+    login = await client.post("/api/auth/login", json={"email": user["email"], "password": PASSWORD})
+    register = await client.post(
+        "/api/auth/register", json={"user_name": "busy", "email": "busy@example.com", "password": PASSWORD}
+    )
+
+    for response in (login, register):
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+    assert hasher.rejected == 2
+
+
+async def test_login_rehashes_outdated_hashes(client, use_hasher):
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash(PASSWORD)
+    async with async_session_maker() as db:
+        user = User(user_name="rehash", email="rehash@example.com", hashed_password=old_hash)
+        db.add(user)
+        await db.commit()
+    # The policy now asks for at least 5 rounds
+    use_hasher(PasswordHasher(CryptContext(schemes=["bcrypt"], bcrypt__rounds=5, bcrypt__min_rounds=5), max_workers=0))
+
+    response = await client.post("/api/auth/login", json={"email": "rehash@example.com", "password": PASSWORD})
+    assert response.status_code == 200
+
+    async with async_session_maker() as db:
+        new_hash = await db.scalar(select(User.hashed_password).where(User.email == "rehash@example.com"))
+    assert new_hash != old_hash
+    assert new_hash.startswith("$2b$05$")
+    # And the new hash still works
+    response = await client.post("/api/auth/login", json={"email": "rehash@example.com", "password": PASSWORD})
+    assert response.status_code == 200
+
+
+async def test_wrong_password_is_rejected(client, user):
+    for email, password in ((user["email"], "Wr0ngPassword"), ("nobody@example.com", PASSWORD)):
+        response = await client.post("/api/auth/login", json={"email": email, "password": password})
+        assert response.status_code == 401
@@ -0,0 +1,109 @@
+from app.database import async_session_maker
+from app.models.chat import ChatMessage, ChatRole, Conversation
+from app.models.goals import Actions
+from app.repositories.chat import ConversationRepository
+from app.services import chat, chat_context
+from app.services.chat import ChatService
+from app.services.chat_context import (
+    CHAT_RESPONSE_TOKENS,
+    CHAT_SUMMARY_TOKENS,
+    assemble_contents,
+)
+
+SUMMARY_PREFIX = "Summary of our conversation so far: "
+
+
+def message(message_id: int, role: ChatRole, content: str, token_count: int = 1) -> ChatMessage:
+    return ChatMessage(id=message_id, role=role, content=content, token_count=token_count)
+
+
+def texts(contents):
+    return [turn["parts"][0]["text"] for turn in contents]
+
+
+async def send(client, user, text, conversation_id=None) -> int:
+    response = await client.post(
+        "/api/chat", json={"message": text, "conversation_id": conversation_id}, headers=user["headers"]
+    )
+    assert response.status_code == 200
+    return response.json()["conversation_id"]
+
+
+def test_contents_put_history_between_summary_and_message():
+    # Newest first, as read from the database
+    recent = [message(3, ChatRole.mentor, "Try kicking"), message(2, ChatRole.user, "How do I start?")]
+
+    contents = assemble_contents("prefix", "We talked about swimming", recent, "Thanks", Actions(description="Kick"))
+
+    assert [turn["role"] for turn in contents] == ["user", "user", "model", "user"]
+    assert texts(contents) == [
+        SUMMARY_PREFIX + "We talked about swimming",
+        "How do I start?",
+        "Try kicking",
+        "(I'm working on: Kick)\nThanks",
+    ]
+
+
+def test_history_is_cut_to_the_token_budget(monkeypatch):
+    # 100 tokens left for the prompt; the prefix and the message take 10 each
+    monkeypatch.setattr(chat_context, "CHAT_CONTEXT_TOKENS", CHAT_RESPONSE_TOKENS + 100)
+    recent = [message(n, ChatRole.user, f"message {n}", token_count=30) for n in (4, 3, 2, 1)]
+
+    contents = assemble_contents("p" * 36, None, recent, "m" * 36)
+
+    assert texts(contents) == ["message 3", "message 4", "m" * 36]
+
+
+def test_long_summary_is_truncated():
+    contents = assemble_contents("prefix", "s" * CHAT_SUMMARY_TOKENS * 8, [], "Hi")
+
+    summary = texts(contents)[0][len(SUMMARY_PREFIX):]
+    assert summary == "s" * CHAT_SUMMARY_TOKENS * 4 + "..."
+
+
+async def test_old_messages_are_folded_into_the_summary(client, user, llm, monkeypatch):
+    monkeypatch.setattr(chat, "CHAT_RECENT_MESSAGES", 2)
+    monkeypatch.setattr(chat, "CHAT_SUMMARY_BATCH", 2)
+    llm.backend.reply = "Swimming"
+
+    conversation_id = await send(client, user, "first")
+    # Leaves two messages outside the recent window, which the background task folds
+    await send(client, user, "second", conversation_id)
+
+    async with async_session_maker() as db:
+        conversation = await db.get(Conversation, conversation_id)
+        first_reply = await ChatService(db).message_repo.oldest(conversation_id, 0, 2)
+    assert conversation.summary == "Swimming"
+    assert conversation.summarized_through_id == first_reply[-1].id
+    assert (conversation.summarized_count, conversation.message_count) == (2, 4)
+
+    calls = len(llm.backend.contents)
+    await send(client, user, "third", conversation_id)
+
+    # The folded messages are left out of the next turn
+    assert texts(llm.backend.contents[calls]) == [SUMMARY_PREFIX + "Swimming", "second", "Swimming", "third"]
+
+
+async def test_nothing_to_fold_leaves_the_summary_alone(client, user, llm):
+    conversation_id = await send(client, user, "first")
+    calls = len(llm.backend.contents)
+
+    async with async_session_maker() as db:
+        assert not await ChatService(db).update_summary(conversation_id)
+    assert len(llm.backend.contents) == calls
+
+
+async def test_summary_is_only_saved_over_the_one_it_was_built_from(client, user, llm):
+    conversation_id = await send(client, user, "first")
+
+    async with async_session_maker() as db:
+        repo = ConversationRepository(db)
+        assert await repo.save_summary(conversation_id, 0, "Swimming", through_id=2, folded=2)
+        # Built from the old summary by another worker
+        assert not await repo.save_summary(conversation_id, 0, "Stale", through_id=2, folded=2)
+
+    async with async_session_maker() as db:
+        conversation = await db.get(Conversation, conversation_id)
+    assert (conversation.summary, conversation.summarized_through_id, conversation.summarized_count) == (
+        "Swimming", 2, 2
+    )
@@ -0,0 +1,54 @@
+async def test_matching_etag_gets_304(client, user, goal):
+    url = f"/api/goals/{goal}/tree"
+    response = await client.get(url, headers=user["headers"])
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert response.headers["last-modified"]
+
+    response = await client.get(url, headers={**user["headers"], "If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+async def test_weak_and_listed_etags_match(client, user, goal):
+    url = f"/api/goals/{goal}/tree"
+    etag = (await client.get(url, headers=user["headers"])).headers["etag"]
+
+    for header in (f"W/{etag}", f'"other", {etag}', "*"):
+        response = await client.get(url, headers={**user["headers"], "If-None-Match": header})
+        assert response.status_code == 304, header
+
+
+async def test_change_invalidates_etag(client, user, goal):
+    url = f"/api/goals/{goal}/tree"
+    response = await client.get(url, headers=user["headers"])
+    etag = response.headers["etag"]
+    action = response.json()["subgoals"][0]["actions"][0]
+    await client.patch(f"/api/goals/{goal}/actions/{action['id']}", json={"status": "Completed"}, headers=user["headers"])
+
+    response = await client.get(url, headers={**user["headers"], "If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["subgoals"][0]["actions"][0]["status"] == "Completed"
+
+
+async def test_progress_etag(client, user, goal):
+    url = f"/api/goals/{goal}/progress"
+    etag = (await client.get(url, headers=user["headers"])).headers["etag"]
+
+    response = await client.get(url, headers={**user["headers"], "If-None-Match": etag})
+
+    assert response.status_code == 304
+
+
+async def test_other_users_get_404_not_304(client, make_user, user, goal):
+    url = f"/api/goals/{goal}/tree"
+    etag = (await client.get(url, headers=user["headers"])).headers["etag"]
+    other = await make_user()
+
+    response = await client.get(url, headers={**other["headers"], "If-None-Match": etag})
+
+    assert response.status_code == 404
@@ -0,0 +1,94 @@
+import json
+from contextlib import aclosing
+
+from app.database import async_session_maker
+from app.services.goals import GoalService
+
+PLAN = {
+    "Goal": "Swim a mile",
+    "subGoals": [
+        {"title": "Breathing", "actionSteps": [{"title": "Exhale underwater", "estimatedMinutes": 10}]},
+        {"title": "Stroke", "actionSteps": [
+            {"title": "Kick drills", "estimatedMinutes": 15},
+            {"title": 'Say "hi" to the lifeguard', "estimatedMinutes": 1},
+        ]},
+    ],
+}
+
+
+async def stream_events(client, user, prompt="swim"):
+    response = await client.post("/api/goals/create/stream", json={"prompt": prompt}, headers=user["headers"])
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+async def goal_count(client, user):
+    return len((await client.get("/api/goals", headers=user["headers"])).json()["items"])
+
+
+async def test_requires_authentication(client, llm):
+    response = await client.post("/api/goals/create/stream", json={"prompt": "swim"})
+
+    assert response.status_code == 401
+    assert llm.backend.calls == 0
+
+
+async def test_streams_goal_then_each_subgoal(client, user, llm):
+    llm.backend.reply = json.dumps(PLAN)
+
+    events = await stream_events(client, user)
+
+    assert [event["event"] for event in events] == ["goal", "subgoal", "subgoal", "done"]
+    goal_id = events[0]["goal"]["id"]
+    assert events[-1] == {"event": "done", "goal_id": goal_id, "subgoals": 2}
+    tree = (await client.get(f"/api/goals/{goal_id}/tree", headers=user["headers"])).json()
+    assert tree["title"] == "Swim a mile"
+    assert [len(subgoal["actions"]) for subgoal in tree["subgoals"]] == [1, 2]
+    assert tree["subgoals"][1]["actions"][1]["description"] == 'Say "hi" to the lifeguard'
+
+
+async def test_error_mid_stream_rolls_back(client, user, llm):
+    reply = llm.backend.reply = json.dumps(PLAN)
+    # Fails after the goal and first subgoal have been written and sent
+    llm.backend.fail_after = reply.index('"Stroke"') // llm.backend.chunk_size + 1
+
+    events = await stream_events(client, user)
+
+    assert [event["event"] for event in events] == ["goal", "subgoal", "error"]
+    assert await goal_count(client, user) == 0
+    assert llm.in_flight == 0
+
+
+async def test_truncated_plan_rolls_back(client, user, llm):
+    llm.backend.reply = json.dumps(PLAN)[:-20]
+
+    events = await stream_events(client, user)
+
+    assert events[-1]["event"] == "error"
+    assert "before the plan was complete" in events[-1]["detail"]
+    assert await goal_count(client, user) == 0
+
+
+async def test_empty_plan_is_rejected(client, user, llm):
+    llm.backend.reply = json.dumps({"Goal": "Swim a mile", "subGoals": []})
+
+    events = await stream_events(client, user)
+
+    assert [event["event"] for event in events] == ["goal", "error"]
+    assert events[-1]["detail"] == "Invalid plan from model: The plan has no subgoals"
+    assert await goal_count(client, user) == 0
+
+
+async def test_stopping_early_frees_the_llm_slot(client, user, llm):
+    llm.backend.reply = json.dumps(PLAN)
+    llm.backend.chunk_size = 4
+
+    async with async_session_maker() as db:
+        async with aclosing(GoalService(db).create_goal_stream("swim", user["id"])) as events:
+            async for event in events:
+                assert event["event"] == "goal"
+                break
+
+    assert llm.in_flight == 0
+    assert llm.backend.closed == 1
+    assert await goal_count(client, user) == 0
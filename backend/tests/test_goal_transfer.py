@@ -0,0 +1,88 @@
+import json
+
+
+async def tree_of(client, user, goal):
+    response = await client.get(f"/api/goals/{goal}/tree", headers=user["headers"])
+    response.raise_for_status()
+    return response.json()
+
+
+async def progress_of(client, user, goal):
+    response = await client.get(f"/api/goals/{goal}/progress", headers=user["headers"])
+    response.raise_for_status()
+    return response.json()
+
+
+def shape(tree, progress):
+    """A goal tree without anything an import reassigns (IDs, versions)."""
+    return {
+        "title": tree["title"],
+        "status": tree["status"],
+        "counts": [progress[key] for key in ("subgoal_count", "action_count", "completed_count", "current_streak")],
+        "subgoals": [
+            (
+                subgoal["title"],
+                subgoal["category"],
+                [(action["description"], action["status"], action["estimated_minutes"]) for action in subgoal["actions"]],
+            )
+            for subgoal in tree["subgoals"]
+        ],
+    }
+
+
+async def export(client, user) -> bytes:
+    response = await client.get("/api/goals/export", headers=user["headers"])
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return response.content
+
+
+async def goal_ids(client, user):
+    response = await client.get("/api/goals", headers=user["headers"])
+    return [item["id"] for item in response.json()["items"]]
+
+
+async def test_export_import_round_trip(client, make_user, make_goal):
+    owner, other = await make_user(), await make_user()
+    goal = await make_goal(owner["id"], subgoals=3, actions=2)
+    action = (await tree_of(client, owner, goal))["subgoals"][1]["actions"][0]
+    await client.patch(f"/api/goals/{goal}/actions/{action['id']}", json={"status": "Completed"}, headers=owner["headers"])
+    original = shape(await tree_of(client, owner, goal), await progress_of(client, owner, goal))
+    assert original["counts"] == [3, 6, 1, 1]
+
+    body = await export(client, owner)
+    records = [json.loads(line) for line in body.splitlines()]
+    assert [record["type"] for record in records[:4]] == ["goal", "subgoal", "action", "action"]
+    assert len(records) == 1 + 3 + 3 * 2
+
+    response = await client.post("/api/goals/import", content=body, headers=other["headers"])
+    assert response.status_code == 200
+    assert response.json() == {"goals": 1, "subgoals": 3, "actions": 6}
+
+    [imported] = await goal_ids(client, other)
+    assert imported != goal
+    assert shape(await tree_of(client, other, imported), await progress_of(client, other, imported)) == original
+    # Exporting the copy gives the same records under new IDs
+    assert len((await export(client, other)).splitlines()) == len(records)
+
+
+async def test_import_leaves_existing_goals_alone(client, user, goal):
+    before = await tree_of(client, user, goal)
+
+    response = await client.post("/api/goals/import", content=await export(client, user), headers=user["headers"])
+    assert response.status_code == 200
+
+    assert len(await goal_ids(client, user)) == 2
+    after = await tree_of(client, user, goal)
+    assert after["version"] == before["version"]
+
+
+async def test_invalid_import_changes_nothing(client, user, goal):
+    lines = (await export(client, user)).splitlines()
+    lines[-1] = b'{"type": "action", "id": 1}'
+
+    response = await client.post("/api/goals/import", content=b"\n".join(lines) + b"\n", headers=user["headers"])
+
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith(f"Line {len(lines)}:")
+    assert await goal_ids(client, user) == [goal]
@@ -0,0 +1,205 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.jobs import (
+    InMemoryJobStore,
+    Job,
+    JobQueue,
+    JobStatus,
+    SqlJobStore,
+    dedup_key,
+)
+
+
+async def finished(queue: JobQueue, job_id: str, timeout: float = 5) -> Job:
+    """Polls the store, so it sees jobs run by any queue sharing it."""
+    async def wait() -> Job:
+        while True:
+            job = await queue.get(job_id)
+            if job.finished:
+                return job
+            await asyncio.sleep(0.01)
+
+    return await asyncio.wait_for(wait(), timeout)
+
+
+def make_queue(store, runner, **kwargs) -> JobQueue:
+    kwargs = {"workers": 1, "backoff_base": 0, "backoff_max": 0, **kwargs}
+    return JobQueue(store, runner, **kwargs)
+
+
+@pytest.fixture
+async def running():
+    """Starts queues and stops them after the test."""
+    queues = []
+
+    async def start(queue: JobQueue) -> JobQueue:
+        await queue.start()
+        queues.append(queue)
+        return queue
+
+    yield start
+    for queue in queues:
+        await queue.stop()
+
+
+async def test_submit_deduplicates_prompts_in_flight():
+    async def runner(job):
+        return 1
+
+    # Not started, so submitted jobs stay queued
+    queue = make_queue(InMemoryJobStore(), runner)
+    job, created = await queue.submit(1, "Learn to swim")
+    same, same_created = await queue.submit(1, "  learn to SWIM! ")
+    other_user, other_created = await queue.submit(2, "Learn to swim")
+
+    assert created and not same_created and other_created
+    assert same.id == job.id
+    assert other_user.id != job.id
+    assert queue.deduplicated == 1
+
+
+async def test_finished_job_is_not_reused(running):
+    async def runner(job):
+        return 7
+
+    queue = await running(make_queue(InMemoryJobStore(), runner))
+    job, _ = await queue.submit(1, "Learn to swim")
+    assert (await finished(queue, job.id)).goal_id == 7
+
+    again, created = await queue.submit(1, "Learn to swim")
+    assert created and again.id != job.id
+
+
+async def test_failures_are_retried_until_dead_letter(running):
+    calls = []
+
+    async def runner(job):
+        calls.append(job.attempts)
+        raise RuntimeError("model unavailable")
+
+    queue = await running(make_queue(InMemoryJobStore(), runner, max_attempts=3))
+    job, _ = await queue.submit(1, "Learn to swim")
+    job = await finished(queue, job.id)
+
+    assert job.status == JobStatus.dead
+    assert job.attempts == 3
+    assert job.error == "RuntimeError: model unavailable"
+    assert calls == [1, 2, 3]
+    assert (queue.retried, queue.dead, queue.succeeded) == (2, 1, 0)
+
+
+async def test_retry_can_succeed(running):
+    async def runner(job):
+        if job.attempts == 1:
+            raise RuntimeError("model unavailable")
+        return 42
+
+    queue = await running(make_queue(InMemoryJobStore(), runner, max_attempts=3))
+    job, _ = await queue.submit(1, "Learn to swim")
+    job = await finished(queue, job.id)
+
+    assert job.status == JobStatus.succeeded
+    assert (job.attempts, job.goal_id, job.error) == (2, 42, None)
+
+
+async def test_claim_is_atomic(user):
+    store = SqlJobStore()
+    job = Job(id="a" * 32, user_id=user["id"], prompt="swim", dedup_key=dedup_key(user["id"], "swim"),
+              created_at=datetime.utcnow())
+    await store.add(job)
+
+    claims = await asyncio.gather(*(store.claim(job.id, datetime.utcnow()) for _ in range(5)))
+
+    assert sum(claim is not None for claim in claims) == 1
+    stored = await store.get(job.id)
+    assert (stored.status, stored.attempts) == (JobStatus.running, 1)
+
+
+async def test_queued_job_runs_once_across_processes(user, running):
+    runs = []
+
+    async def runner(job):
+        runs.append(job.id)
+        await asyncio.sleep(0.05)
+        return 1
+
+    store = SqlJobStore()
+    first = make_queue(store, runner)
+    job, _ = await first.submit(user["id"], "Learn to swim")
+    # A second process finds the same job queued when it starts
+    second = await running(make_queue(store, runner))
+    await running(first)
+
+    assert (await finished(first, job.id)).status == JobStatus.succeeded
+    await asyncio.sleep(0.1)
+    assert runs == [job.id]
+    assert first.skipped + second.skipped == 1
+
+
+async def test_expired_lease_is_requeued(user, running):
+    async def runner(job):
+        return 3
+
+    store = SqlJobStore()
+    long_ago = datetime.utcnow() - timedelta(minutes=5)
+    # Left running by a process that died
+    orphan = Job(id="b" * 32, user_id=user["id"], prompt="swim", dedup_key=dedup_key(user["id"], "swim"),
+                 status=JobStatus.running, attempts=1, created_at=long_ago, started_at=long_ago,
+                 heartbeat_at=long_ago)
+    # Still heartbeating in a live process
+    live = Job(id="c" * 32, user_id=user["id"], prompt="run", dedup_key=dedup_key(user["id"], "run"),
+               status=JobStatus.running, attempts=1, created_at=long_ago, started_at=long_ago,
+               heartbeat_at=datetime.utcnow())
+    await store.add(orphan)
+    await store.add(live)
+
+    queue = await running(make_queue(store, runner, lease_seconds=60))
+    orphan = await finished(queue, orphan.id)
+
+    assert queue.requeued == 1
+    assert (orphan.status, orphan.attempts, orphan.goal_id) == (JobStatus.succeeded, 2, 3)
+    assert (await store.get(live.id)).status == JobStatus.running
+
+
+async def test_stranded_queued_jobs_are_taken_over(user, running):
+    async def runner(job):
+        return 5
+
+    store = SqlJobStore()
+    queue = await running(make_queue(store, runner, lease_seconds=0.05))
+    long_ago = datetime.utcnow() - timedelta(minutes=5)
+    # Left by a process that died before running it, or before its retry fired
+    never_run = Job(id="d" * 32, user_id=user["id"], prompt="swim", dedup_key=dedup_key(user["id"], "swim"),
+                    created_at=long_ago)
+    retry = Job(id="e" * 32, user_id=user["id"], prompt="run", dedup_key=dedup_key(user["id"], "run"),
+                attempts=1, error="RuntimeError: model unavailable", created_at=long_ago,
+                run_after=long_ago + timedelta(seconds=1))
+    # Still backing off
+    backing_off = Job(id="f" * 32, user_id=user["id"], prompt="ski", dedup_key=dedup_key(user["id"], "ski"),
+                      attempts=1, created_at=long_ago, run_after=datetime.utcnow() + timedelta(hours=1))
+    for job in (never_run, retry, backing_off):
+        await store.add(job)
+
+    never_run = await finished(queue, never_run.id)
+    retry = await finished(queue, retry.id)
+
+    assert (never_run.status, never_run.attempts, never_run.goal_id) == (JobStatus.succeeded, 1, 5)
+    assert (retry.status, retry.attempts, retry.error) == (JobStatus.succeeded, 2, None)
+    assert (await store.get(backing_off.id)).status == JobStatus.queued
+
+
+async def test_failed_attempt_stores_when_it_is_retried(user, running):
+    async def runner(job):
+        raise RuntimeError("model unavailable")
+
+    store = SqlJobStore()
+    queue = await running(make_queue(store, runner, backoff_base=3600, backoff_max=3600))
+    job, _ = await queue.submit(user["id"], "Learn to swim")
+    await asyncio.sleep(0.1)
+
+    job = await store.get(job.id)
+    assert (job.status, job.attempts) == (JobStatus.queued, 1)
+    assert job.run_after > job.created_at
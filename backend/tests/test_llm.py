@@ -0,0 +1,70 @@
+import asyncio
+from contextlib import aclosing
+
+import pytest
+
+from app.core.llm import LLMBackend, LLMClient, LLMError, LLMTimeoutError
+from tests.fakes import FakeLLMBackend
+
+
+def make_client(backend, **kwargs) -> LLMClient:
+    kwargs = {"max_concurrency": 1, "timeout": 5, "backoff_base": 0, "backoff_max": 0, **kwargs}
+    return LLMClient(backend, **kwargs)
+
+
+def test_backend_must_implement_every_method():
+    class Partial(LLMBackend):
+        async def generate(self, model, contents, config=None):
+            return ""
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+async def test_closing_a_stream_early_frees_its_slot():
+    backend = FakeLLMBackend()
+    client = make_client(backend)
+
+    async with aclosing(client.stream("prompt")) as chunks:
+        async for chunk in chunks:
+            assert chunk == "chunk0"
+            break
+
+    assert client.in_flight == 0
+    assert backend.closed == 1
+    # With a single slot, this would wait forever if the stream still held it
+    assert await asyncio.wait_for(client.generate("prompt"), 1) == "ok"
+
+
+async def test_stream_yields_every_chunk():
+    client = make_client(FakeLLMBackend(reply="abc", chunk_size=1))
+
+    assert [chunk async for chunk in client.stream("prompt")] == ["a", "b", "c"]
+    assert client.in_flight == 0
+
+
+async def test_retryable_errors_are_retried():
+    backend = FakeLLMBackend(failures=2)
+    client = make_client(backend, max_retries=3)
+
+    assert await client.generate("prompt") == "ok"
+    assert (backend.calls, client.retries, client.failures) == (3, 2, 0)
+
+
+async def test_retries_give_up():
+    client = make_client(FakeLLMBackend(failures=5), max_retries=2)
+
+    with pytest.raises(LLMError):
+        await client.generate("prompt")
+    assert (client.retries, client.failures) == (2, 1)
+
+
+async def test_stream_timeout_covers_the_whole_stream():
+    client = make_client(FakeLLMBackend(delay=0.05), timeout=0.12)
+
+    with pytest.raises(LLMTimeoutError):
+        async with aclosing(client.stream("prompt")) as chunks:
+            async for _ in chunks:
+                pass
+    assert client.timeouts == 1
+    assert client.in_flight == 0
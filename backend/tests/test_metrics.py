@@ -0,0 +1,23 @@
+from app.core import instrumentation
+
+
+async def test_requests_are_labelled_with_the_full_route(client, user, goal, monkeypatch):
+    labels = []
+    monkeypatch.setattr(
+        instrumentation, "observe_request",
+        lambda method, route, status_code, *args: labels.append((method, route, status_code)),
+    )
+
+    await client.get("/api/goals", headers=user["headers"])
+    await client.get("/api/search", params={"q": "swim"}, headers=user["headers"])
+    await client.get(f"/api/goals/{goal}/tree", headers=user["headers"])
+    await client.post("/api/auth/register", json={})
+    await client.get("/api/nowhere")
+
+    assert [label[:2] for label in labels] == [
+        ("GET", "/api/goals"),
+        ("GET", "/api/search"),
+        ("GET", "/api/goals/{goal_id}/tree"),
+        ("POST", "/api/auth/register"),
+        ("GET", "unmatched"),
+    ]
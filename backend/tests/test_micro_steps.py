@@ -0,0 +1,111 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+from app.database import async_session_maker
+from app.models.goals import Actions, MicroStep, SubGoal
+from app.repositories.goals import ActionRepository, MicroStepRepository
+from app.services import micro_steps
+from app.services.micro_steps import generate_micro_steps, micro_step_stats
+
+REPLY = json.dumps({"microSteps": [{"title": "Hold the wall"}, {"title": "Kick your legs"}]})
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # IDs of deleted rows can come back in SQLite, cached entries must not
+    micro_steps.micro_step_cache.clear()
+    micro_steps._prefetched.clear()
+
+
+async def action_ids(goal):
+    async with async_session_maker() as db:
+        return list(await db.scalars(
+            select(Actions.id).join(SubGoal).where(SubGoal.goal_id == goal).order_by(SubGoal.id, Actions.id)
+        ))
+
+
+async def stored_titles(action_id):
+    async with async_session_maker() as db:
+        return [step.title for step in await MicroStepRepository(db).list_for_action(action_id)]
+
+
+async def test_concurrent_requests_share_one_generation(llm, goal):
+    llm.backend.reply, llm.backend.delay = REPLY, 0.05
+    action_id = (await action_ids(goal))[0]
+    coalesced = micro_step_stats.coalesced
+
+    results = await asyncio.gather(*(generate_micro_steps(action_id) for _ in range(3)))
+
+    assert len(llm.backend.contents) == 1
+    assert "Action Step: Action 1.1" in llm.backend.contents[0]
+    assert results[0] == results[1] == results[2]
+    assert [step.title for step in results[0]] == ["Hold the wall", "Kick your legs"]
+    assert micro_step_stats.coalesced - coalesced == 2
+    assert action_id not in micro_steps._pending
+    assert await stored_titles(action_id) == ["Hold the wall", "Kick your legs"]
+
+
+async def test_only_one_claim_succeeds(goal):
+    action_id = (await action_ids(goal))[0]
+    async with async_session_maker() as db:
+        repo = ActionRepository(db)
+
+        assert await repo.claim_micro_steps(action_id, datetime.utcnow()) is True
+        assert await repo.claim_micro_steps(action_id, datetime.utcnow()) is False
+        await db.commit()
+
+        action = await db.scalar(select(Actions).where(Actions.id == action_id))
+        assert action.micro_steps_generated_at is not None
+
+
+async def test_losing_the_claim_returns_the_stored_steps(llm, goal):
+    llm.backend.reply, llm.backend.delay = REPLY, 0.05
+    action_id = (await action_ids(goal))[0]
+
+    generation = asyncio.ensure_future(generate_micro_steps(action_id))
+    while not llm.backend.contents:
+        await asyncio.sleep(0)
+    # Another worker stores its micro-steps while the model is still replying
+    async with async_session_maker() as db:
+        assert await ActionRepository(db).claim_micro_steps(action_id, datetime.utcnow())
+        await MicroStepRepository(db).insert_for_action(action_id, ["Theirs"])
+        await db.commit()
+
+    assert [step.title for step in await generation] == ["Theirs"]
+    assert await stored_titles(action_id) == ["Theirs"]
+
+
+async def test_opening_an_action_generates_once_and_prefetches_the_next(client, user, llm, goal):
+    llm.backend.reply = REPLY
+    first, second = (await action_ids(goal))[:2]
+    url = f"/api/goals/{goal}/actions/{first}/micro-steps"
+
+    response = await client.get(url, headers=user["headers"])
+
+    assert response.status_code == 200
+    assert [item["title"] for item in response.json()["items"]] == ["Hold the wall", "Kick your legs"]
+    # The prefetch ran once the response was sent
+    assert len(llm.backend.contents) == 2
+    assert await stored_titles(second) == ["Hold the wall", "Kick your legs"]
+
+    micro_steps.micro_step_cache.clear()
+    again = await client.get(url, headers=user["headers"])
+
+    assert again.json() == response.json()
+    assert len(llm.backend.contents) == 2
+    async with async_session_maker() as db:
+        assert len(list(await db.scalars(select(MicroStep.id).where(MicroStep.action_id == first)))) == 2
+
+
+async def test_other_users_cannot_open_the_action(client, make_user, llm, goal):
+    other = await make_user()
+    action_id = (await action_ids(goal))[0]
+
+    response = await client.get(f"/api/goals/{goal}/actions/{action_id}/micro-steps", headers=other["headers"])
+
+    assert response.status_code == 404
+    assert llm.backend.contents == []
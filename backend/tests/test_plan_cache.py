@@ -0,0 +1,106 @@
+import asyncio
+from typing import Dict
+
+import pytest
+
+from app.models.goals import SubgoalCategory
+from app.services.plan_cache import PlanCache, PlanCacheBackend, normalize_prompt
+
+
+def plan(title: str):
+    return (
+        {"title": title, "description": title},
+        [{"title": "Basics", "description": "Basics", "category": SubgoalCategory.skill}],
+        [{"description": "Start", "estimated_minutes": 5, "subgoal_index": 0}],
+    )
+
+
+class DictBackend(PlanCacheBackend):
+    def __init__(self, fail: bool = False):
+        self.data: Dict[str, str] = {}
+        self.fail = fail
+
+    async def get(self, key):
+        if self.fail:
+            raise ConnectionError("redis is down")
+        return self.data.get(key)
+
+    async def set(self, key, value, ttl):
+        if self.fail:
+            raise ConnectionError("redis is down")
+        self.data[key] = value
+
+
+@pytest.mark.parametrize("prompt", ["Learn to swim", "  learn   to SWIM!! ", "learn, to swim."])
+def test_prompts_normalize_to_the_same_key(prompt):
+    assert normalize_prompt(prompt) == "learn to swim"
+
+
+async def test_normalized_prompts_share_a_plan():
+    cache = PlanCache(similarity_threshold=0)
+    await cache.set("Learn to swim", plan("Swim"))
+
+    assert await cache.get("LEARN TO SWIM!") == plan("Swim")
+    assert await cache.get("Learn to ski") is None
+    assert (cache.local_hits, cache.misses) == (1, 1)
+
+
+async def test_entries_expire():
+    cache = PlanCache(ttl=0.05, similarity_threshold=0)
+    await cache.set("Learn to swim", plan("Swim"))
+    assert await cache.get("Learn to swim") is not None
+
+    await asyncio.sleep(0.06)
+
+    assert await cache.get("Learn to swim") is None
+    assert cache.stats()["expirations"] == 1
+
+
+async def test_least_recently_used_entry_is_evicted():
+    cache = PlanCache(max_entries=2, similarity_threshold=0)
+    await cache.set("swim", plan("Swim"))
+    await cache.set("ski", plan("Ski"))
+    # Touching "swim" makes "ski" the least recently used
+    await cache.get("swim")
+    await cache.set("run", plan("Run"))
+
+    assert await cache.get("ski") is None
+    assert await cache.get("swim") is not None
+    assert await cache.get("run") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+async def test_near_identical_prompts_hit():
+    cache = PlanCache(similarity_threshold=0.7)
+    await cache.set("I want to learn how to swim freestyle", plan("Swim"))
+
+    assert await cache.get("I want to learn how to swim freestyle please") == plan("Swim")
+    assert await cache.get("Bake sourdough bread at home") is None
+    assert cache.similar_hits == 1
+
+
+async def test_evicted_entries_leave_the_similarity_index():
+    cache = PlanCache(max_entries=1, similarity_threshold=0.7)
+    await cache.set("I want to learn how to swim freestyle", plan("Swim"))
+    await cache.set("Bake sourdough bread at home", plan("Bread"))
+
+    assert await cache.get("I want to learn how to swim freestyle please") is None
+
+
+async def test_shared_tier_fills_other_workers():
+    shared = DictBackend()
+    await PlanCache(shared=shared).set("Learn to swim", plan("Swim"))
+    other_worker = PlanCache(shared=shared)
+
+    assert await other_worker.get("learn to swim") == plan("Swim")
+    assert await other_worker.get("learn to swim") == plan("Swim")
+    assert (other_worker.shared_hits, other_worker.local_hits) == (1, 1)
+
+
+async def test_shared_tier_errors_are_misses():
+    cache = PlanCache(shared=DictBackend(fail=True), similarity_threshold=0)
+    await cache.set("Learn to swim", plan("Swim"))
+
+    assert await cache.get("Learn to swim") == plan("Swim")
+    assert await cache.get("Learn to ski") is None
+    assert cache.shared_errors == 2
@@ -0,0 +1,110 @@
+import json
+
+import pytest
+
+from app.services import plan_parser
+from app.services.plan_parser import (
+    PlanParseError,
+    PlanParserStats,
+    parse_plan,
+    parse_subgoal,
+    repair_json,
+)
+
+PLAN = {
+    "Goal": "Swim a mile",
+    "subGoals": [
+        {"title": "Breathing", "actionSteps": [{"title": "Exhale underwater", "estimatedMinutes": 10}]},
+        {"title": "Stroke", "actionSteps": [
+            {"title": "Kick drills", "estimatedMinutes": 15},
+            {"title": 'Say "hi" to the lifeguard', "estimatedMinutes": 1},
+        ]},
+    ],
+}
+TEXT = json.dumps(PLAN)
+# Cut inside the last action step
+TRUNCATED = TEXT[:TEXT.index("lifeguard")]
+# What survives the cut: everything up to the last complete object
+TRUNCATED_PLAN = {**PLAN, "subGoals": [PLAN["subGoals"][0], {**PLAN["subGoals"][1], "actionSteps": [
+    PLAN["subGoals"][1]["actionSteps"][0],
+]}]}
+
+
+@pytest.fixture
+def stats(monkeypatch) -> PlanParserStats:
+    """Counts this test's parses only."""
+    stats = PlanParserStats()
+    monkeypatch.setattr(plan_parser, "parser_stats", stats)
+    return stats
+
+
+@pytest.mark.parametrize("text, repairs, expected", [
+    (f"```json\n{TEXT}\n```", ["fences"], PLAN),
+    (f"Here is your plan:\n{TEXT}\nGood luck!", ["prose"], PLAN),
+    (TEXT.replace("]}]}", "],},],}"), ["trailing_commas"], PLAN),
+    (TRUNCATED, ["truncated"], TRUNCATED_PLAN),
+    (f"```\nSure! {TRUNCATED}", ["fences", "prose", "truncated"], TRUNCATED_PLAN),
+])
+def test_repairs(text, repairs, expected):
+    repaired, made = repair_json(text)
+
+    assert made == repairs
+    assert json.loads(repaired) == expected
+
+
+def test_commas_inside_strings_are_kept():
+    text = '{"Goal": "Swim, ],} a mile", "subGoals": [{"title": "a"},]}'
+
+    repaired, repairs = repair_json(text)
+
+    assert repairs == ["trailing_commas"]
+    assert json.loads(repaired)["Goal"] == "Swim, ],} a mile"
+
+
+def test_nothing_to_close_is_left_alone():
+    assert repair_json('{"Goal": "Swim') == ('{"Goal": "Swim', [])
+    assert repair_json("No plan today") == ("No plan today", [])
+
+
+def test_valid_plan_is_parsed_without_repair(stats):
+    plan = parse_plan(TEXT)
+
+    assert plan.goal == "Swim a mile"
+    assert [len(subgoal.action_steps) for subgoal in plan.sub_goals] == [1, 2]
+    assert stats.stats() == {
+        "parsed": 1, "repaired": 0, "failures": 0,
+        "repairs_fences": 0, "repairs_prose": 0, "repairs_trailing_commas": 0, "repairs_truncated": 0,
+    }
+
+
+def test_each_repair_is_counted(stats):
+    parse_plan(f"```json\n{TEXT}\n```")
+    parse_plan(f"Plan: {TEXT}")
+    parse_plan(TEXT.replace("]}]}", "],},],}"))
+    plan = parse_plan(f"```json\n{TRUNCATED}")
+
+    assert [len(subgoal.action_steps) for subgoal in plan.sub_goals] == [1, 1]
+    assert stats.stats() == {
+        "parsed": 4, "repaired": 4, "failures": 0,
+        "repairs_fences": 2, "repairs_prose": 1, "repairs_trailing_commas": 1, "repairs_truncated": 1,
+    }
+
+
+@pytest.mark.parametrize("text", [
+    "I can't help with that",
+    # Repaired, but still not a plan
+    '```json\n{"Goal": "Swim a mile", "subGoals": []}\n```',
+])
+def test_unusable_output_is_a_failure(stats, text):
+    with pytest.raises(PlanParseError):
+        parse_plan(text)
+
+    assert (stats.parsed, stats.repaired, stats.failures) == (0, 0, 1)
+
+
+def test_invalid_streamed_subgoal_is_a_failure(stats):
+    assert parse_subgoal({"title": "Breathing"}).title == "Breathing"
+
+    with pytest.raises(PlanParseError, match="actionSteps"):
+        parse_subgoal({"title": "Breathing", "actionSteps": "none"})
+    assert stats.failures == 1
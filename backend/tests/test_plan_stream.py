@@ -0,0 +1,73 @@
+import json
+from typing import List
+
+import pytest
+
+from app.services.plan_stream import PlanEvent, PlanStreamError, PlanStreamParser
+
+PLAN = {
+    "Goal": 'Swim "a mile" \\ fast',
+    "subGoals": [
+        {"title": "Breathing", "actionSteps": [{"title": "Exhale underwater", "estimatedMinutes": 10}]},
+        {"title": "Stroke {not a brace}", "actionSteps": [
+            {"title": 'Say "hi" to the lifeguard', "estimatedMinutes": 1},
+        ]},
+    ],
+}
+TEXT = json.dumps(PLAN)
+EVENTS = [("goal", PLAN["Goal"]), ("subgoal", PLAN["subGoals"][0]), ("subgoal", PLAN["subGoals"][1])]
+
+
+def feed(parser: PlanStreamParser, text: str, chunk_size: int) -> List[PlanEvent]:
+    events: List[PlanEvent] = []
+    for i in range(0, len(text), chunk_size):
+        events.extend(parser.feed(text[i:i + chunk_size]))
+    return events
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 16, len(TEXT)])
+def test_events_span_chunk_boundaries(chunk_size):
+    parser = PlanStreamParser()
+
+    assert feed(parser, TEXT, chunk_size) == EVENTS
+    assert parser.complete
+    parser.close()
+
+
+def test_subgoals_are_reported_as_soon_as_they_close():
+    parser = PlanStreamParser()
+    first_end = TEXT.index(', {"title": "Stroke')
+
+    assert parser.feed(TEXT[:first_end - 1]) == [EVENTS[0]]
+    assert parser.feed(TEXT[first_end - 1:first_end]) == [EVENTS[1]]
+    assert parser.feed(TEXT[first_end:]) == [EVENTS[2]]
+
+
+def test_text_around_the_object_is_ignored():
+    parser = PlanStreamParser()
+
+    assert feed(parser, f"```json\n{TEXT}\n```", 7) == EVENTS
+
+
+def test_other_keys_are_not_events():
+    parser = PlanStreamParser()
+    text = json.dumps({"note": "Goal", "extra": ["Goal"], **PLAN})
+
+    assert feed(parser, text, 3) == EVENTS
+
+
+def test_truncated_stream_fails_on_close():
+    parser = PlanStreamParser()
+    events = feed(parser, TEXT[:TEXT.index("Stroke")], 4)
+
+    assert events == EVENTS[:2]
+    assert not parser.complete
+    with pytest.raises(PlanStreamError, match="before the plan was complete"):
+        parser.close()
+
+
+def test_unbalanced_brackets_fail():
+    parser = PlanStreamParser()
+
+    with pytest.raises(PlanStreamError, match="Unbalanced"):
+        parser.feed('{"Goal": "Swim", "subGoals": [}')
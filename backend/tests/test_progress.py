@@ -0,0 +1,120 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from app.database import async_session_maker
+from app.models.goals import Actions, ActionStatus, Goal, SubGoal
+from app.models.progress import UserProgress
+from app.models.user import User
+from app.services.progress import compute_streaks, effective_streak, rebuild_progress
+
+DAY = date(2026, 3, 10)
+
+
+async def set_status(client, user, goal, action_id, status):
+    response = await client.patch(
+        f"/api/goals/{goal}/actions/{action_id}", json={"status": status}, headers=user["headers"]
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+async def progress_of(client, user, goal):
+    return (await client.get(f"/api/goals/{goal}/progress", headers=user["headers"])).json()
+
+
+async def streak_of(client, user):
+    return (await client.get("/api/progress/streak", headers=user["headers"])).json()
+
+
+async def action_ids(goal):
+    async with async_session_maker() as db:
+        result = await db.execute(
+            select(Actions.id).join(SubGoal).where(SubGoal.goal_id == goal).order_by(SubGoal.id, Actions.id)
+        )
+        return list(result.scalars().all())
+
+
+@pytest.mark.parametrize("days, streaks", [
+    ([], (0, 0, None)),
+    ([DAY], (1, 1, DAY)),
+    ([DAY, DAY + timedelta(days=1), DAY + timedelta(days=2)], (3, 3, DAY + timedelta(days=2))),
+    # The current streak is the run ending on the last day
+    ([DAY, DAY + timedelta(days=1), DAY + timedelta(days=3)], (1, 2, DAY + timedelta(days=3))),
+])
+def test_compute_streaks(days, streaks):
+    assert compute_streaks(days) == streaks
+
+
+def test_streak_lapses_after_a_missed_day():
+    assert effective_streak(4, DAY, DAY) == 4
+    assert effective_streak(4, DAY, DAY + timedelta(days=1)) == 4
+    assert effective_streak(4, DAY, DAY + timedelta(days=2)) == 0
+    assert effective_streak(4, None, DAY) == 0
+
+
+async def test_toggling_an_action_updates_the_counters(client, user, goal):
+    first = (await action_ids(goal))[0]
+
+    await set_status(client, user, goal, first, "Completed")
+    # Completing it again changes nothing
+    await set_status(client, user, goal, first, "Completed")
+
+    progress = await progress_of(client, user, goal)
+    assert (progress["action_count"], progress["completed_count"], progress["percent_complete"]) == (6, 1, 16.7)
+    assert [subgoal["completed_count"] for subgoal in progress["subgoals"]] == [1, 0]
+    assert progress["subgoals"][0]["last_activity_at"] is not None
+    assert (progress["current_streak"], progress["longest_streak"]) == (1, 1)
+    streak = await streak_of(client, user)
+    assert (streak["current_streak"], streak["actions_completed_today"], streak["minutes_worked_today"]) == (1, 1, 10)
+
+    await set_status(client, user, goal, first, "Pending")
+
+    progress = await progress_of(client, user, goal)
+    assert (progress["completed_count"], progress["percent_complete"]) == (0, 0.0)
+    assert [subgoal["completed_count"] for subgoal in progress["subgoals"]] == [0, 0]
+    streak = await streak_of(client, user)
+    assert (streak["actions_completed_today"], streak["minutes_worked_today"]) == (0, 0)
+
+
+async def test_completions_across_subgoals_add_up(client, user, goal):
+    ids = await action_ids(goal)
+
+    for action_id in (ids[0], ids[1], ids[3]):
+        await set_status(client, user, goal, action_id, "Completed")
+
+    progress = await progress_of(client, user, goal)
+    assert progress["completed_count"] == 3
+    assert [subgoal["completed_count"] for subgoal in progress["subgoals"]] == [2, 1]
+    assert (await streak_of(client, user))["minutes_worked_today"] == 30
+
+
+async def test_rebuild_repairs_drifted_counters(client, user, goal):
+    today = datetime.utcnow().replace(microsecond=0)
+    ids = await action_ids(goal)
+    async with async_session_maker() as db:
+        # Completions on three days in a row, written behind the counters' back
+        for days_ago, action_id in zip((2, 1, 0), ids[:3], strict=True):
+            await db.execute(
+                update(Actions)
+                .where(Actions.id == action_id)
+                .values(status=ActionStatus.completed, completed_at=today - timedelta(days=days_ago))
+            )
+        await db.execute(update(Goal).where(Goal.id == goal).values(completed_count=99, current_streak=7))
+        await db.execute(update(SubGoal).where(SubGoal.goal_id == goal).values(completed_count=5, action_count=0))
+        await db.execute(update(User).where(User.id == user["id"]).values(longest_streak=42))
+        await db.commit()
+
+    assert await rebuild_progress(user["id"]) == 1
+
+    progress = await progress_of(client, user, goal)
+    assert (progress["action_count"], progress["completed_count"]) == (6, 3)
+    assert [(s["action_count"], s["completed_count"]) for s in progress["subgoals"]] == [(3, 3), (3, 0)]
+    assert (progress["current_streak"], progress["longest_streak"]) == (3, 3)
+    streak = await streak_of(client, user)
+    assert (streak["current_streak"], streak["longest_streak"]) == (3, 3)
+    assert (streak["actions_completed_today"], streak["minutes_worked_today"]) == (1, 10)
+    async with async_session_maker() as db:
+        days = await db.scalars(select(UserProgress.date).where(UserProgress.user_id == user["id"]))
+        assert len(list(days)) == 3
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import InvalidRequestError
+
+from app.database import (
+    READ_PRIMARY_COOKIE,
+    Replica,
+    SessionRouter,
+    async_session_maker,
+)
+from app.models.user import User
+
+
+@pytest.fixture
+async def replica(database):
+    # The test database stands in for a replica; what matters is the session class
+    replica = Replica("replica1", database)
+    yield replica
+    await replica.engine.dispose()
+
+
+@pytest.fixture
+async def router(replica):
+    router = SessionRouter(
+        async_session_maker, [replica], max_lag=5, check_interval=5, check_timeout=2, read_your_writes=0.2
+    )
+    await router.check_replicas()
+    return router
+
+
+async def test_replica_sessions_read(replica, user):
+    async with replica.session_maker() as db:
+        assert await db.scalar(select(func.count(User.id)).where(User.id == user["id"])) == 1
+
+
+async def test_replica_sessions_reject_flushes(replica):
+    async with replica.session_maker() as db:
+        db.add(User(user_name="nobody", email="nobody@example.com", hashed_password="x"))
+        with pytest.raises(InvalidRequestError, match="read-only"):
+            await db.flush()
+
+
+async def test_replica_sessions_reject_dml(replica, user):
+    async with replica.session_maker() as db:
+        with pytest.raises(InvalidRequestError, match="read-only"):
+            await db.execute(update(User).where(User.id == user["id"]).values(user_name="renamed"))
+
+
+async def test_reads_follow_the_users_writes(router, replica):
+    assert replica.healthy
+    assert router.for_read(1) is replica.session_maker
+
+    router.record_write(1)
+    assert router.for_read(1) is router.primary
+    assert router.for_read(2) is replica.session_maker
+    # The cookie set on another worker's write response
+    assert router.for_read(None, wrote_recently=True) is router.primary
+
+    await asyncio.sleep(0.3)
+    assert router.for_read(1) is replica.session_maker
+    assert router.read_your_writes_reads == 2
+
+
+async def test_unhealthy_replica_falls_back_to_primary(router, replica):
+    replica.healthy = False
+    assert router.for_read(1) is router.primary
+    assert router.fallback_reads == 1
+
+
+async def test_write_responses_pin_reads_to_primary(client, make_user, make_goal, router, replica, monkeypatch):
+    monkeypatch.setattr("app.database.session_router", router)
+    writer, reader = await make_user(), await make_user()
+    goal, other_goal = await make_goal(writer["id"]), await make_goal(reader["id"])
+    # Registering was a write too
+    client.cookies.clear()
+
+    tree = (await client.get(f"/api/goals/{goal}/tree", headers=writer["headers"])).json()
+    assert replica.reads == 1
+    action = tree["subgoals"][0]["actions"][0]
+    response = await client.patch(
+        f"/api/goals/{goal}/actions/{action['id']}", json={"status": "Completed"}, headers=writer["headers"]
+    )
+    assert response.status_code == 200
+    assert READ_PRIMARY_COOKIE in response.cookies
+
+    # The writer reads their change from the primary, even without the cookie
+    client.cookies.clear()
+    response = await client.get(f"/api/goals/{goal}/tree", headers=writer["headers"])
+    assert response.json()["subgoals"][0]["actions"][0]["status"] == "Completed"
+    assert router.read_your_writes_reads == 1
+    # Other users keep reading from the replica
+    assert (await client.get(f"/api/goals/{other_goal}/tree", headers=reader["headers"])).status_code == 200
+    assert replica.reads == 2
@@ -0,0 +1,105 @@
+from typing import List
+
+from sqlalchemy import delete, update
+
+from app.database import async_session_maker
+from app.models.search import SearchEntry, SearchKind
+
+
+async def describe(client, user, goal, descriptions: List[str]) -> List[int]:
+    """Gives the goal's first actions these descriptions; returns their IDs."""
+    tree = (await client.get(f"/api/goals/{goal}/tree", headers=user["headers"])).json()
+    actions = [action for subgoal in tree["subgoals"] for action in subgoal["actions"]][:len(descriptions)]
+    response = await client.patch(
+        f"/api/goals/{goal}/actions",
+        json={"changes": [
+            {"id": action["id"], "version": action["version"], "description": description}
+            for action, description in zip(actions, descriptions, strict=True)
+        ]},
+        headers=user["headers"],
+    )
+    assert response.status_code == 200
+    return [action["id"] for action in actions]
+
+
+async def search(client, user, q: str, **params):
+    response = await client.get("/api/search", params={"q": q, **params}, headers=user["headers"])
+    assert response.status_code == 200
+    return response.json()
+
+
+async def found_actions(client, user, q: str) -> List[int]:
+    return [hit["id"] for hit in (await search(client, user, q))["items"] if hit["kind"] == "Action"]
+
+
+async def test_best_match_comes_first(client, user, goal):
+    once, often, _ = await describe(client, user, goal, [
+        "Practice the flutter kick along the wall of the pool every morning",
+        "Kick, kick, kick",
+        "Float on your back",
+    ])
+
+    hits = (await search(client, user, "kick"))["items"]
+
+    assert [hit["id"] for hit in hits] == [often, once]
+    assert hits[0]["rank"] > hits[1]["rank"]
+
+
+async def test_every_word_matches_as_a_prefix(client, user, goal):
+    flutter, _ = await describe(client, user, goal, ["Practice the flutter kick", "Float on your back"])
+
+    assert await found_actions(client, user, "flut") == [flutter]
+    assert await found_actions(client, user, "prac FLUTTER") == [flutter]
+    assert await found_actions(client, user, "flutter float") == []
+    # Quotes and operators are plain words, not FTS5 syntax
+    assert await found_actions(client, user, 'flutter "kick') == [flutter]
+    assert await found_actions(client, user, "flutter OR float") == []
+    assert (await search(client, user, "learn swim"))["items"][0]["kind"] == "Goal"
+
+
+async def test_only_the_users_entries_are_found(client, user, goal, make_user, make_goal):
+    other = await make_user()
+    await make_goal(other["id"])
+
+    hits = (await search(client, user, "swim"))["items"]
+
+    assert [(hit["kind"], hit["goal_id"]) for hit in hits] == [("Goal", goal)]
+
+
+async def test_cursor_pages_through_ties(client, user, goal):
+    # Identical entries tie on rank, so only the id orders them
+    await describe(client, user, goal, ["Tread water"] * 3 + ["Tread water with one hand", "Tread"])
+    everything = (await search(client, user, "tread", limit=100))["items"]
+
+    pages, cursor = [], None
+    while True:
+        page = await search(client, user, "tread", limit=2, **({"cursor": cursor} if cursor else {}))
+        pages.extend(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(everything) == 5
+    assert pages == everything
+
+
+async def test_bad_cursor_is_rejected(client, user):
+    response = await client.get("/api/search", params={"q": "swim", "cursor": "nope"}, headers=user["headers"])
+
+    assert response.status_code == 400
+
+
+async def test_index_follows_updates_and_deletes(client, user, goal):
+    edited, removed = await describe(client, user, goal, ["Practice the flutter kick", "Float on your back"])
+
+    async with async_session_maker() as db:
+        actions = SearchEntry.kind == SearchKind.action
+        await db.execute(
+            update(SearchEntry).where(actions, SearchEntry.ref_id == edited).values(content="Tread water")
+        )
+        await db.execute(delete(SearchEntry).where(actions, SearchEntry.ref_id == removed))
+        await db.commit()
+
+    assert await found_actions(client, user, "tread") == [edited]
+    assert await found_actions(client, user, "flutter") == []
+    assert await found_actions(client, user, "float") == []